@@ -0,0 +1,179 @@
+"""Cold/warm startup benchmark for SnipStudio.
+
+Generates synthetic libraries of different sizes and times fresh processes
+starting against them. The first start on a new library is reported as cold
+(it includes the one-time schema migration and search index build); the
+median of the following starts is reported as warm.
+
+By default the benchmark is headless: each launch runs the storage side of
+startup (connect, migrate, settings, last snippet, first list page and its
+count) without creating a window. With --gui it launches the real app with
+--profile-startup --exit-after-startup, which needs a display (xvfb-run works).
+
+    python bench_startup.py --sizes 1000 10000 100000 --runs 5
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CATEGORIES = ["python", "javascript", "sql", "bash", "rust", "go", "css", "html"]
+WORDS = (
+    "retry cache parse fetch load save render queue worker index token stream "
+    "buffer merge split sort filter map reduce client server handler config"
+).split()
+
+
+def generate_library(path, size, seed=0):
+    """Writes a library of `size` snippets using the original, unversioned schema."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """CREATE TABLE snippets
+                      (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       title TEXT NOT NULL,
+                       category TEXT,
+                       code TEXT NOT NULL)"""
+    )
+    conn.execute("CREATE INDEX idx_snippet_title ON snippets (title)")
+    conn.execute("CREATE TABLE settings (key TEXT PRIMARY KEY, value TEXT)")
+
+    def snippet(i):
+        title = " ".join(rng.choice(WORDS) for _ in range(3)) + f" {i}"
+        lines = [
+            f"def {rng.choice(WORDS)}_{j}(x):  # {' '.join(rng.sample(WORDS, 4))}"
+            for j in range(rng.randint(3, 15))
+        ]
+        return title, rng.choice(CATEGORIES), "\n".join(lines)
+
+    with conn:
+        conn.executemany(
+            "INSERT INTO snippets (title, category, code) VALUES (?, ?, ?)",
+            (snippet(i) for i in range(size)),
+        )
+        conn.execute(
+            "INSERT INTO settings (key, value) VALUES ('last_used_snippet', ?)",
+            (str(size // 2 or 1),),
+        )
+    conn.close()
+
+
+def launch_headless(db_path):
+    """Child process: runs the storage side of startup and prints phase timings."""
+    start = time.perf_counter()
+    timings = {}
+
+    def mark(name, since):
+        now = time.perf_counter()
+        timings[name] = round((now - since) * 1000, 2)
+        return now
+
+    sys.path.insert(0, HERE)
+    from settings import Settings
+    from store import SnippetStore
+    from virtuallist import VirtualListbox
+
+    phase = mark("imports", start)
+    store = SnippetStore(db_path)
+    settings = Settings(store)
+    phase = mark("db", phase)
+
+    # Same queries the app runs before the list is complete: the last snippet
+    # by id, the first list page, then the row count. Categories are only
+    # queried when their dropdown opens.
+    last_id = settings.get("last_used_snippet")
+    if last_id:
+        store.get(int(last_id))
+    phase = mark("restore", phase)
+
+    store.list_page(None, 0, VirtualListbox.PAGE_SIZE)
+    store.count()
+    mark("list", phase)
+    store.close()
+    timings["total"] = round((time.perf_counter() - start) * 1000, 2)
+    print("startup-profile: " + json.dumps(timings))
+
+
+def run_once(db_path, gui):
+    """Starts one fresh process and returns (wall ms, phase timings)."""
+    if gui:
+        # The app opens code_snippets.db in its working directory
+        command = [
+            sys.executable,
+            os.path.join(HERE, "snipstudio.py"),
+            "--profile-startup",
+            "--exit-after-startup",
+        ]
+        cwd = os.path.dirname(db_path)
+    else:
+        command = [sys.executable, os.path.abspath(__file__), "--launch", db_path]
+        cwd = None
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=cwd, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    for line in result.stdout.splitlines():
+        if line.startswith("startup-profile: "):
+            return wall_ms, json.loads(line[len("startup-profile: ") :])
+    raise RuntimeError(
+        f"Launch failed (exit {result.returncode}):\n{result.stderr.strip()}"
+    )
+
+
+def format_phases(timings):
+    return "  ".join(f"{name}={ms:.1f}" for name, ms in timings.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--runs", type=int, default=5, help="warm starts per size")
+    parser.add_argument(
+        "--gui", action="store_true", help="launch the real app (needs a display)"
+    )
+    parser.add_argument("--keep", help="generate libraries here and keep them")
+    parser.add_argument("--launch", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.launch:
+        launch_headless(args.launch)
+        return
+
+    workdir = args.keep or tempfile.mkdtemp(prefix="snipstudio-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        for size in args.sizes:
+            library_dir = os.path.join(workdir, str(size))
+            os.makedirs(library_dir, exist_ok=True)
+            db_path = os.path.join(library_dir, "code_snippets.db")
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+
+            start = time.perf_counter()
+            generate_library(db_path, size)
+            print(
+                f"\n{size} snippets (generated in {time.perf_counter() - start:.1f}s)"
+            )
+
+            cold_ms, cold_phases = run_once(db_path, args.gui)
+            print(f"  cold  {cold_ms:8.1f}ms  {format_phases(cold_phases)}")
+            warm = [run_once(db_path, args.gui) for _ in range(args.runs)]
+            warm_ms = statistics.median(wall for wall, _ in warm)
+            median_run = min(warm, key=lambda run: abs(run[0] - warm_ms))
+            print(f"  warm  {warm_ms:8.1f}ms  {format_phases(median_run[1])}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Command line access to the SnipStudio snippet database.
+
+Works without a display: nothing here imports tkinter or pyperclip, so
+scripts and editor integrations get answers without starting the GUI.
+
+    python cli.py search "cat:python retry"
+    python cli.py get 42 | pbcopy
+    python cli.py history 42; python cli.py get 42 --revision 3
+    some-command | python cli.py add --title "Build script" --category bash
+    python cli.py export > snippets.jsonl
+    python cli.py export -o backup.db
+    python cli.py import snippets.jsonl ~/.config/Code/User/snippets ~/scripts
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+from dedupe import DuplicateFinder
+from exporter import FORMATS, Exporter, format_for
+from importer import Importer
+from store import Snippet, SnippetStore
+
+DB_PATH = "code_snippets.db"  # Same default as the app: the working directory
+
+
+def cmd_search(store, args):
+    rows = store.search(args.query, limit=args.limit)
+    if not rows:
+        return 1
+    # Only the listed fields: reading the bodies would unpack every match
+    for row in store.get_summaries(snippet_id for snippet_id, _ in rows):
+        if args.json:
+            print(json.dumps(dict(zip(("id", "title", "category", "language"), row))))
+        else:
+            print("\t".join(str(value) for value in row[:3]))
+    return 0
+
+
+def cmd_get(store, args):
+    if args.revision:
+        snippet = store.get_revision(args.id, args.revision)
+    else:
+        snippet = store.get(args.id)
+    if not snippet:
+        revision = f" revision {args.revision}" if args.revision else ""
+        print(f"No snippet with id {args.id}{revision}.", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(snippet._asdict()))
+    else:
+        sys.stdout.write(snippet.code)
+        if not snippet.code.endswith("\n"):
+            sys.stdout.write("\n")
+    return 0
+
+
+def cmd_add(store, args):
+    code = sys.stdin.read().strip()
+    if not args.title.strip() or not code:
+        print("Title and code (on stdin) cannot be empty.", file=sys.stderr)
+        return 1
+    print(store.upsert(Snippet(None, args.title.strip(), args.category.strip(), code)))
+    return 0
+
+
+def cmd_history(store, args):
+    revisions = store.revisions(args.id)
+    for revision, saved_at, title, size in revisions:
+        print(f"{revision}\t{saved_at or 'before the first edit'}\t{size}\t{title}")
+    return 0 if revisions else 1
+
+
+def cmd_rm(store, args):
+    deleted = store.delete_many(args.ids)
+    if deleted < len(args.ids):
+        print(
+            f"Deleted {deleted} of {len(args.ids)} snippets, the others did not exist.",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+def cmd_dupes(store, args):
+    groups = DuplicateFinder(args.threshold).run(store).groups
+    for group in groups:
+        for snippet_id, title, similarity in group:
+            print(f"{snippet_id}\t{similarity:.2f}\t{title}")
+        print()
+    return 0 if groups else 1
+
+
+def cmd_export(store, args):
+    exporter = Exporter(args.output, args.format or format_for(args.output))
+    if not args.output:
+        if exporter.format == "sqlite":
+            print("A database backup needs --output.", file=sys.stderr)
+            return 1
+        exporter.write(store, sys.stdout)
+        return 0
+    try:
+        exporter.run(store)
+    except OSError as e:
+        print(f"Export failed: {e}", file=sys.stderr)
+        return 1
+    print(exporter.summary(), file=sys.stderr)
+    return 0
+
+
+def cmd_import(store, args):
+    importer = Importer(args.paths)
+    try:
+        importer.run(store)
+    except (OSError, ValueError) as e:
+        print(f"Import failed, nothing was added: {e}", file=sys.stderr)
+        return 1
+    # The app does this in the background; here the result should be complete
+    batch = 500
+    while store.classify_pending(batch) == batch:
+        pass
+    print(importer.summary())
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="snipstudio", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("--db", default=DB_PATH, help="database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="list snippets matching a query")
+    search.add_argument("query", help="search text, same syntax as the app")
+    search.add_argument("--limit", type=int, default=0)
+    search.add_argument("--json", action="store_true", help="one JSON object per line")
+    search.set_defaults(func=cmd_search)
+
+    get = commands.add_parser("get", help="print a snippet's code")
+    get.add_argument("id", type=int)
+    get.add_argument("--json", action="store_true", help="the whole snippet as JSON")
+    get.add_argument("--revision", type=int, help="an earlier version, see history")
+    get.set_defaults(func=cmd_get)
+
+    history = commands.add_parser(
+        "history", help="list the saved versions of a snippet, newest first"
+    )
+    history.add_argument("id", type=int)
+    history.set_defaults(func=cmd_history)
+
+    add = commands.add_parser("add", help="add a snippet, code read from stdin")
+    add.add_argument("--title", required=True)
+    add.add_argument("--category", default="")
+    add.set_defaults(func=cmd_add)
+
+    rm = commands.add_parser("rm", help="delete snippets by id")
+    rm.add_argument("ids", type=int, nargs="+")
+    rm.set_defaults(func=cmd_rm)
+
+    dupes = commands.add_parser(
+        "dupes", help="list groups of duplicate and near-duplicate snippets"
+    )
+    dupes.add_argument(
+        "--threshold",
+        type=float,
+        default=0.8,
+        help="how alike near-duplicates must be, 0-1 (default 0.8)",
+    )
+    dupes.set_defaults(func=cmd_dupes)
+
+    export = commands.add_parser(
+        "export", help="write every snippet as JSON Lines, Markdown or a database copy"
+    )
+    export.add_argument("--output", "-o", help="file to write instead of stdout")
+    export.add_argument(
+        "--format",
+        choices=sorted(set(FORMATS.values())),
+        help="default: from the --output extension, else jsonl",
+    )
+    export.set_defaults(func=cmd_export)
+
+    import_ = commands.add_parser(
+        "import", help="add snippets from files and folders, skipping duplicates"
+    )
+    import_.add_argument(
+        "paths",
+        nargs="+",
+        help="JSON Lines, JSON or VS Code snippet files, folders of source files,"
+        " - for JSON on stdin",
+    )
+    import_.set_defaults(func=cmd_import)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        store = SnippetStore(args.db)
+    except sqlite3.Error as e:
+        print(f"Could not open {args.db}: {e}", file=sys.stderr)
+        return 1
+    try:
+        return args.func(store, args)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # The reader (head, grep -m...) stopped early. Point stdout at devnull
+        # so flushing it at exit doesn't raise again.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+import zlib
+
+# Bodies at least this big (UTF-8 bytes) are stored zlib-compressed, as a
+# BLOB in the code column; smaller ones stay plain TEXT.
+COMPRESS_MIN_BYTES = 4096
+COMPRESS_LEVEL = 6
+
+
+def pack_code(code):
+    """The value to store for code: compressed bytes if that pays off, else the text."""
+    data = code.encode("utf-8", "surrogatepass")
+    if len(data) < COMPRESS_MIN_BYTES:
+        return code
+    packed = zlib.compress(data, COMPRESS_LEVEL)
+    # Not worth a decompression on every read for less than 10% saved
+    return packed if len(packed) < len(data) * 0.9 else code
+
+
+def unpack_code(value):
+    """The code text of a stored value, compressed or not."""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8", "surrogatepass")
+    return value
+
+
+def code_sql(column="code"):
+    """SQL for the text of a code column, calling unpack_code() only for BLOBs.
+
+    Connections using it need register_functions() (configure_connection
+    calls it); plain TEXT values never reach Python.
+    """
+    return (
+        f"CASE typeof({column}) WHEN 'blob' THEN unpack_code({column})"
+        f" ELSE {column} END"
+    )
+
+
+def register_functions(conn):
+    conn.create_function("unpack_code", 1, unpack_code, deterministic=True)
+    conn.create_function("pack_code", 1, pack_code, deterministic=True)
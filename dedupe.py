@@ -0,0 +1,189 @@
+import hashlib
+import re
+from array import array
+
+# Near-duplicates are found with MinHash over token shingles. Each snippet
+# gets a signature of BINS minimum hashes from a single hash per shingle
+# (one permutation hashing), and signatures are split into BANDS bands:
+# snippets sharing any whole band become candidates, so no two snippets are
+# compared unless they are likely similar. 8 bands of 8 bins put the
+# threshold where a pair becomes likely to be compared near 0.77.
+SHINGLE_TOKENS = 4
+BINS = 64
+BANDS = 8
+ROWS_PER_BAND = BINS // BANDS
+BIN_SHIFT = 64 - 6  # Top 6 bits of a shingle hash pick one of the 64 bins
+VALUE_MASK = (1 << 32) - 1
+EMPTY = VALUE_MASK  # Bins no shingle fell into, filled in by densify()
+BUCKET_PAIRS_LIMIT = 50  # Bigger buckets are only compared with their first member
+MIX = 0x9E3779B97F4A7C15  # Spreads Python's hashes over all 64 bits
+MASK64 = (1 << 64) - 1
+TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def normalize_code(code):
+    """Code with indentation, runs of whitespace and blank lines squeezed out."""
+    lines = (" ".join(line.split()) for line in code.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def content_hash(code):
+    """A 64-bit hash of the normalized code, stored with every snippet."""
+    digest = hashlib.blake2b(
+        normalize_code(code).encode("utf-8", "surrogatepass"), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def signature(code):
+    """The BINS-value MinHash signature of code's token shingles."""
+    tokens = TOKEN.findall(code.lower())
+    if len(tokens) <= SHINGLE_TOKENS:
+        shingles = {tuple(tokens)}
+    else:
+        shingles = {
+            tuple(tokens[i : i + SHINGLE_TOKENS])
+            for i in range(len(tokens) - SHINGLE_TOKENS + 1)
+        }
+    bins = [EMPTY] * BINS
+    for shingle in shingles:
+        mixed = (hash(shingle) * MIX) & MASK64
+        index = mixed >> BIN_SHIFT
+        value = mixed & VALUE_MASK
+        if value < bins[index]:
+            bins[index] = value
+    return densify(bins)
+
+
+def densify(bins):
+    """Fills empty bins from the next filled one, so short snippets compare fairly.
+
+    Rotation densification: an empty bin borrows the value of the nearest
+    filled bin to its right, offset by the distance so borrowed values
+    don't collide with real ones by accident.
+    """
+    if EMPTY not in bins:
+        return bins
+    if all(value == EMPTY for value in bins):
+        return bins  # No tokens at all
+    for i in range(BINS):
+        if bins[i] != EMPTY:
+            continue
+        distance = 1
+        while bins[(i + distance) % BINS] == EMPTY:
+            distance += 1
+        borrowed = bins[(i + distance) % BINS]
+        bins[i] = (borrowed + distance * 0x2545F491) & VALUE_MASK
+    return bins
+
+
+class DuplicateFinder:
+    """Groups snippets with the same or nearly the same code.
+
+    Exact duplicates share a content_hash. Near-duplicates are candidates
+    from the MinHash bands whose signatures agree on at least threshold of
+    their bins, an estimate of the Jaccard similarity of their shingles.
+    Work grows with the number of snippets, not pairs of them, so this is
+    fine at 100k snippets.
+
+    Like Importer and Exporter, run() is made for the DB worker and
+    progress() may be called from another thread while it runs. The result
+    is groups: lists of (id, title, similarity to the first member), the
+    most similar groups first.
+    """
+
+    def __init__(self, threshold=0.8):
+        self.threshold = threshold
+        self.total = 0
+        self.done = 0
+        self.groups = []
+
+    def progress(self):
+        if not self.total:
+            return None
+        return min(self.done / self.total, 1.0)
+
+    def summary(self):
+        if not self.groups:
+            return "No duplicates found."
+        snippets = sum(len(group) for group in self.groups)
+        return f"Found {len(self.groups)} groups of duplicates, {snippets} snippets."
+
+    def run(self, store):
+        with store.snapshot():
+            self.total = store.count()
+            ids = array("q")
+            titles = []
+            hashes = array("q")
+            signatures = array("I")
+            for snippet_id, title, code, code_hash in store.iter_code():
+                ids.append(snippet_id)
+                titles.append(title)
+                if code_hash is None:  # Written by another program, not hashed yet
+                    code_hash = content_hash(code)
+                hashes.append(code_hash)
+                signatures.extend(signature(code))
+                self.done += 1
+
+        parent = list(range(len(ids)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        # Exact duplicates need no estimate
+        first_with_hash = {}
+        for i, code_hash in enumerate(hashes):
+            j = first_with_hash.setdefault(code_hash, i)
+            if j != i:
+                parent[find(i)] = find(j)
+
+        def similarity(i, j):
+            a = signatures[i * BINS : (i + 1) * BINS]
+            b = signatures[j * BINS : (j + 1) * BINS]
+            return sum(x == y for x, y in zip(a, b)) / BINS
+
+        for band in range(BANDS):
+            buckets = {}
+            start = band * ROWS_PER_BAND
+            for i in range(len(ids)):
+                offset = i * BINS + start
+                key = tuple(signatures[offset : offset + ROWS_PER_BAND])
+                buckets.setdefault(key, []).append(i)
+            for members in buckets.values():
+                # Compare every pair in small buckets, and only with the first
+                # member in the rare big ones (lots of near-identical snippets)
+                if len(members) > BUCKET_PAIRS_LIMIT:
+                    firsts = members[:1]
+                else:
+                    firsts = members
+                for n, first in enumerate(firsts):
+                    for other in members[n + 1 :]:
+                        if find(other) != find(first) and (
+                            similarity(first, other) >= self.threshold
+                        ):
+                            parent[find(other)] = find(first)
+
+        groups = {}
+        for i in range(len(ids)):
+            groups.setdefault(find(i), []).append(i)
+        result = []
+        for members in groups.values():
+            if len(members) < 2:
+                continue
+            first = members[0]
+            result.append(
+                [
+                    (
+                        ids[i],
+                        titles[i],
+                        1.0 if hashes[i] == hashes[first] else similarity(first, i),
+                    )
+                    for i in members
+                ]
+            )
+        result.sort(key=lambda group: (-min(s for _, _, s in group), -len(group)))
+        self.groups = result
+        return self
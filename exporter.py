@@ -0,0 +1,139 @@
+import datetime
+import json
+import os
+import re
+
+FORMATS = {
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".md": "markdown",
+    ".db": "sqlite",
+    ".sqlite": "sqlite",
+    ".sqlite3": "sqlite",
+}
+BATCH_SIZE = 500  # Snippet bodies held in memory at once by the Markdown export
+BACKUP_PAGES = 256  # Database pages copied per backup step
+FENCE = re.compile(r"`{3,}")
+
+
+def format_for(path, default="jsonl"):
+    """The export format implied by a file name's extension."""
+    return FORMATS.get(os.path.splitext(path or "")[1].lower(), default)
+
+
+def code_fence(code):
+    """A backtick fence longer than any run of backticks inside the code."""
+    longest = max((len(run) for run in FENCE.findall(code)), default=2)
+    return "`" * (longest + 1)
+
+
+def fence_language(category):
+    """The category as a fenced code block language, if it looks like one."""
+    language = category.strip().lower()
+    return language if re.fullmatch(r"[\w+#.-]+", language) else ""
+
+
+def markdown_text(text):
+    """Escapes the characters that would turn a title into Markdown markup."""
+    return re.sub(r"([\\`*_\[\]<>#|])", r"\\\1", text)
+
+
+class Exporter:
+    """Writes every snippet to a file without loading the library into memory.
+
+    Formats are "jsonl" (one snippet per line, what the importer reads
+    back), "markdown" (one document, grouped by category, with a table of
+    contents) and "sqlite" (a consistent copy of the database made with
+    SQLite's online backup API). Files are written under a temporary name
+    and renamed when complete, so a failed export never leaves a partial
+    file behind.
+
+    Like Importer, run() is made for the DB worker and progress() may be
+    called from another thread while it runs.
+    """
+
+    def __init__(self, path, format=None):
+        self.path = path
+        self.format = format or format_for(path)
+        self.done = 0  # Snippets written, or pages copied for a backup
+        self.total = 0
+        self.exported = 0
+
+    def progress(self):
+        """Fraction of the export done, or None before the size is known."""
+        if not self.total:
+            return None
+        return min(self.done / self.total, 1.0)
+
+    def summary(self):
+        if self.format == "sqlite":
+            return f"Backed up the database to {self.path}."
+        return f"Exported {self.exported} snippets to {self.path}."
+
+    def run(self, store):
+        partial = self.path + ".part"
+        try:
+            if self.format == "sqlite":
+                self.exported = store.count()
+                store.backup(partial, pages=BACKUP_PAGES, progress=self._copied)
+            else:
+                with open(partial, "w", encoding="utf-8", newline="\n") as out:
+                    self.write(store, out)
+            os.replace(partial, self.path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        return self
+
+    def write(self, store, out):
+        """Writes the text formats to an open file, e.g. stdout."""
+        # One read transaction, so every pass sees the same snippets
+        with store.snapshot():
+            self.total = store.count()
+            if self.format == "markdown":
+                self._write_markdown(store, out)
+            else:
+                self._write_jsonl(store, out)
+
+    def _copied(self, status, remaining, total):
+        self.total = total
+        self.done = total - remaining
+
+    def _write_jsonl(self, store, out):
+        for snippet in store.iter_snippets():
+            out.write(json.dumps(snippet._asdict()) + "\n")
+            self.done = self.exported = self.exported + 1
+
+    def _write_markdown(self, store, out):
+        today = datetime.date.today().isoformat()
+        out.write("# Snippets\n\n")
+        out.write(f"Exported from SnipStudio on {today}, {self.total} snippets.\n\n")
+
+        # The contents come from titles alone; bodies are read afterwards a
+        # batch at a time, in the same order
+        category = None
+        for snippet_id, title, snippet_category in store.outline():
+            if snippet_category != category:
+                category = snippet_category
+                out.write(f"\n**{markdown_text(category or 'Uncategorized')}**\n\n")
+            out.write(f"- [{markdown_text(title)}](#snippet-{snippet_id})\n")
+
+        category = None
+        outline = store.outline()
+        while True:
+            ids = [row[0] for row in outline.fetchmany(BATCH_SIZE)]
+            if not ids:
+                break
+            for snippet in store.get_many(ids):
+                if snippet.category != category:
+                    category = snippet.category
+                    out.write(f"\n## {markdown_text(category or 'Uncategorized')}\n")
+                fence = code_fence(snippet.code)
+                out.write(
+                    f'\n<a id="snippet-{snippet.id}"></a>\n'
+                    f"### {markdown_text(snippet.title)}\n\n"
+                    f"{fence}{fence_language(snippet.language or snippet.category)}\n"
+                    f"{snippet.code}\n{fence}\n"
+                )
+                self.done = self.exported = self.exported + 1
@@ -0,0 +1,179 @@
+import heapq
+import re
+from array import array
+from bisect import bisect_right
+
+# Match kinds, best first. Each is found with one regex scan over the whole
+# index, and scanning stops once enough rows have been collected.
+TITLE_PREFIX, WORD_START, SUBSTRING, SUBSEQUENCE = range(4)
+KIND_SCORES = (300, 200, 100, 0)
+TITLE_BONUS = 20  # Matches in the title beat matches in the category
+GAP_PENALTY = 2  # Per skipped character in a subsequence match
+RECENCY_BONUS = 10  # Spread linearly from the oldest to the newest row
+
+# Word separators become spaces in the search text, so a word start is just
+# " term" and a title start "\nterm": literal patterns the regex engine finds
+# with a fast substring search, unlike lookbehinds or multiline anchors.
+SEPARATORS = re.compile(r"[\t_\-./:]")
+
+
+def normalize(text):
+    return SEPARATORS.sub(" ", text.lower())
+
+
+def _term_patterns(term):
+    """Compiled regexes for each match kind of one normalized search term."""
+    escaped = re.escape(term)
+    # Each character, then anything up to the next character on the same line.
+    # The negated classes never backtrack, so a failed line costs one pass.
+    subsequence = re.escape(term[0]) + "".join(
+        f"[^\\n{re.escape(char)}]*{re.escape(char)}" for char in term[1:]
+    )
+    return (
+        re.compile("\n" + escaped),
+        re.compile(" " + escaped),
+        re.compile(escaped),
+        re.compile(subsequence),
+    )
+
+
+class FuzzyIndex:
+    """fzf-style ranked matching over the titles and categories of all snippets.
+
+    Rows live in flat parallel arrays, oldest first. Searching scans one
+    normalized string holding a "title category" line per row, newest
+    first, so the first rows found of each match kind are also the most
+    recent ones. Saves and deletes only touch the arrays; the search string
+    is rebuilt on the next search after a change.
+    """
+
+    def __init__(self, rows=()):
+        self.ids = array("q")
+        self.titles = []
+        self.categories = []
+        self.position = {}  # snippet id -> index into the arrays
+        self.dead = 0  # Deleted rows still taking up a slot
+        for snippet_id, title, category in rows:
+            self.upsert(snippet_id, title, category)
+        self.text = None
+        self.line_starts = array("q")
+        self.line_rows = array("q")
+
+    @classmethod
+    def load(cls, store):
+        """Builds the index from a SnippetStore (DB worker side)."""
+        index = cls(store.title_rows())
+        index.prepare()
+        return index
+
+    def __len__(self):
+        return len(self.position)
+
+    def upsert(self, snippet_id, title, category):
+        """Adds or updates a row; updated rows count as the most recent."""
+        self.remove(snippet_id)
+        self.position[snippet_id] = len(self.ids)
+        self.ids.append(snippet_id)
+        self.titles.append(title)
+        self.categories.append(category or "")
+        self.text = None
+
+    def remove(self, snippet_id):
+        index = self.position.pop(snippet_id, None)
+        if index is None:
+            return
+        self.ids[index] = 0
+        self.titles[index] = self.categories[index] = None
+        self.dead += 1
+        self.text = None
+
+    def prepare(self):
+        """Rebuilds the search text if rows changed since the last search."""
+        if self.text is None:
+            self._build()
+
+    def _build(self):
+        if self.dead > len(self.position):
+            self._compact()
+        lines = []
+        rows = array("q")
+        for index in range(len(self.ids) - 1, -1, -1):  # Newest first
+            title = self.titles[index]
+            if title is None:
+                continue
+            line = f"{title} {self.categories[index]}"
+            lines.append(line.replace("\n", " "))
+            rows.append(index)
+        # Normalizing the joined text at once is much cheaper than per row.
+        # The leading newline lets the title prefix pattern match the first line.
+        self.text = text = normalize("\n" + "\n".join(lines))
+        # Offsets are taken after normalizing, since lower() can change the
+        # length of a line ("İ" becomes two characters)
+        starts = array("q")
+        position = text.find("\n")
+        while position != -1:
+            starts.append(position + 1)
+            position = text.find("\n", position + 1)
+        self.line_starts = starts
+        self.line_rows = rows
+
+    def _compact(self):
+        live = [i for i, snippet_id in enumerate(self.ids) if snippet_id]
+        self.ids = array("q", (self.ids[i] for i in live))
+        self.titles = [self.titles[i] for i in live]
+        self.categories = [self.categories[i] for i in live]
+        self.position = {snippet_id: i for i, snippet_id in enumerate(self.ids)}
+        self.dead = 0
+
+    def search(self, query, limit=100):
+        """Returns up to limit (id, title) rows matching every term of query, best first."""
+        terms = normalize(query).split()
+        if not terms or not self.position:
+            return []
+        self.prepare()
+
+        # Scan for the longest term, the others are checked on each hit
+        terms.sort(key=len, reverse=True)
+        patterns = _term_patterns(terms[0])
+        others = [_term_patterns(term)[SUBSEQUENCE] for term in terms[1:]]
+        text = self.text
+        starts = self.line_starts
+        wanted = limit * 2  # A little slack so scoring can reorder within kinds
+        line_count = len(starts)
+        found = {}  # line number -> score
+        # Every kind but the last needs the term verbatim, one quick check
+        # saves scanning for each of them in vain
+        first_kind = TITLE_PREFIX if terms[0] in text else SUBSEQUENCE
+
+        for kind, pattern in enumerate(patterns[first_kind:], first_kind):
+            position = 0
+            while len(found) < wanted:
+                match = pattern.search(text, position)
+                if not match:
+                    break
+                # Title prefix and word start patterns begin with the separator
+                start = match.start() + (kind < SUBSTRING)
+                line = bisect_right(starts, start) - 1
+                line_start = starts[line]
+                line_end = starts[line + 1] - 1 if line + 1 < line_count else len(text)
+                position = line_end + 1  # One hit per line and pattern
+                if line in found:
+                    continue
+                if others:
+                    line_text = text[line_start:line_end]
+                    if any(not other.search(line_text) for other in others):
+                        continue
+                span = match.end() - start
+                score = KIND_SCORES[kind] - GAP_PENALTY * (span - len(terms[0]))
+                title = self.titles[self.line_rows[line]]
+                if match.end() - line_start <= len(normalize(title)):
+                    score += TITLE_BONUS
+                # Lines are newest first, so earlier lines are more recent
+                score += RECENCY_BONUS * (line_count - line) / line_count
+                found[line] = score
+            if len(found) >= wanted:
+                break
+
+        best = heapq.nlargest(limit, found.items(), key=lambda item: item[1])
+        rows = self.line_rows
+        return [(self.ids[rows[line]], self.titles[rows[line]]) for line, _ in best]
@@ -0,0 +1,225 @@
+from bisect import bisect_right
+from collections import OrderedDict
+
+# Pygments token types (by name) -> the editor tag that colors them. A type
+# takes the tag of its longest listed prefix, e.g. Token.Keyword.Constant
+# is a keyword.
+TOKEN_TAGS = {
+    "Token.Comment": "syn_comment",
+    "Token.Literal.String": "syn_string",
+    "Token.Literal.Number": "syn_number",
+    "Token.Keyword": "syn_keyword",
+    "Token.Operator.Word": "syn_keyword",
+    "Token.Name.Builtin": "syn_builtin",
+    "Token.Name.Function": "syn_definition",
+    "Token.Name.Class": "syn_definition",
+    "Token.Name.Decorator": "syn_definition",
+}
+# Tag -> theme color
+TAG_COLORS = {
+    "syn_comment": "overlay1",
+    "syn_string": "accent_green",
+    "syn_number": "accent_peach",
+    "syn_keyword": "accent_mauve",
+    "syn_builtin": "accent_red",
+    "syn_definition": "accent_blue",
+}
+LEXED = "syn_lexed"  # Marks the lines already tokenized
+ALL_TAGS = (*TAG_COLORS, LEXED)
+MARGIN_LINES = 50  # Lines tokenized above and below the visible ones
+CONTEXT_LINES = 20  # Lines lexed before a changed one, so it starts in context
+CACHED_SNIPPETS = 32
+HIGHLIGHT_DELAY_MS = 30  # Scrolls and keystrokes within this share one pass
+
+_lexers = {}  # Language -> lexer, or None when there is none
+_tags_by_type = {}
+
+
+def get_lexer(language):
+    """The Pygments lexer for a language (category) name, or None.
+
+    Pygments is optional and imported on first use, and it loads each
+    lexer's module only when that language is first asked for.
+    """
+    language = (language or "").strip().lower()
+    if language not in _lexers:
+        _lexers[language] = None
+        if language:
+            try:
+                from pygments.lexers import get_lexer_by_name
+                from pygments.util import ClassNotFound
+            except ImportError:
+                return None  # No highlighting without Pygments
+            try:
+                _lexers[language] = get_lexer_by_name(
+                    language, stripnl=False, ensurenl=False
+                )
+            except ClassNotFound:
+                pass
+    return _lexers[language]
+
+
+def tag_for(token_type):
+    """The editor tag for a Pygments token type, or None for plain text."""
+    if token_type not in _tags_by_type:
+        name = str(token_type)
+        while name and name not in TOKEN_TAGS:
+            name = name.rpartition(".")[0]
+        _tags_by_type[token_type] = TOKEN_TAGS.get(name)
+    return _tags_by_type[token_type]
+
+
+def line_of(index):
+    return int(str(index).split(".")[0])
+
+
+class Highlighter:
+    """Syntax highlighting for a Text widget that only tokenizes what is seen.
+
+    Each pass lexes the lines on screen plus MARGIN_LINES around them that
+    aren't lexed yet; lexed lines carry the LEXED tag, and Tk moves tags
+    along with the text, so scrolling back costs nothing. The owner of the
+    widget calls edited() on <<Modified>>, and only the lines an edit
+    touched are lexed again.
+    When the editor switches snippets the tag ranges are kept per snippet
+    id, so coming back to a recent snippet repaints it at once.
+    """
+
+    def __init__(self, text, scrollbar):
+        self.text = text
+        self.scrollbar = scrollbar
+        self.lexer = None
+        self.language = None
+        self.detected = ""  # Language detected when the snippet was stored
+        self.snippet_id = None
+        self.active = False  # False while the editor is being refilled
+        self.line_count = 1
+        self.pass_id = None
+        self.cache = OrderedDict()  # Snippet id -> (text hash, language, ranges)
+        text.configure(yscrollcommand=self._on_scroll)
+        text.bind("<Configure>", lambda event: self.schedule(), add=True)
+
+    def configure_tags(self, colors):
+        for tag, color in TAG_COLORS.items():
+            self.text.tag_configure(tag, foreground=colors[color])
+        self.text.tag_raise("sel")  # Selected text keeps the selection colors
+
+    def leave(self):
+        """Stops following the editor, keeping the current snippet's tags."""
+        if self.active and self.snippet_id is not None and self.lexer:
+            ranges = {tag: self.text.tag_ranges(tag) for tag in ALL_TAGS}
+            self.cache[self.snippet_id] = (
+                hash(self.text.get("1.0", "end-1c")),
+                self.language,
+                {tag: [str(index) for index in spans] for tag, spans in ranges.items()},
+            )
+            self.cache.move_to_end(self.snippet_id)
+            while len(self.cache) > CACHED_SNIPPETS:
+                self.cache.popitem(last=False)
+        self.active = False
+
+    def load(self, snippet_id, category, detected=""):
+        """Starts highlighting the snippet the editor now holds.
+
+        A category that names a language picks the lexer, otherwise the
+        detected language does.
+        """
+        self.snippet_id = snippet_id
+        self.detected = detected
+        self.set_language(category)
+        self._clear("1.0", "end")
+        self.line_count = line_of(self.text.index("end-1c"))
+        self.active = True
+        cached = self.cache.get(snippet_id)
+        if (
+            cached
+            and cached[1] == self.language
+            and cached[0] == hash(self.text.get("1.0", "end-1c"))
+        ):
+            for tag, spans in cached[2].items():
+                if spans:
+                    self.text.tag_add(tag, *spans)
+        self.schedule()
+
+    def set_language(self, category):
+        language = category if get_lexer(category) else self.detected
+        lexer = get_lexer(language)
+        self.language = (language or "").strip().lower()
+        if lexer is self.lexer:
+            return
+        self.lexer = lexer
+        if self.active:
+            self._clear("1.0", "end")
+            self.schedule()
+
+    def schedule(self):
+        if self.pass_id is None and self.active and self.lexer:
+            self.pass_id = self.text.after(HIGHLIGHT_DELAY_MS, self.highlight_visible)
+
+    def highlight_visible(self):
+        """Lexes the lines in and around the view that aren't lexed yet."""
+        self.pass_id = None
+        if not (self.active and self.lexer):
+            return
+        first = line_of(self.text.index("@0,0"))
+        last = line_of(self.text.index(f"@0,{self.text.winfo_height()}"))
+        first = max(1, first - MARGIN_LINES)
+        last = min(self.line_count, last + MARGIN_LINES)
+        # Walk the lexed ranges in the window and lex the gaps between them
+        line = first
+        while line <= last:
+            lexed = self.text.tag_nextrange(LEXED, f"{line}.0", f"{last + 1}.0")
+            if not lexed:
+                self._lex_lines(line, last)
+                break
+            start = line_of(lexed[0])
+            if start > line:
+                self._lex_lines(line, start - 1)
+            line = line_of(lexed[1]) + (not str(lexed[1]).endswith(".0"))
+
+    def _lex_lines(self, first, last):
+        context = max(1, first - CONTEXT_LINES)
+        block = self.text.get(f"{context}.0", f"{last}.end")
+        line_starts = [0]
+        position = block.find("\n")
+        while position != -1:
+            line_starts.append(position + 1)
+            position = block.find("\n", position + 1)
+        skip = line_starts[first - context]  # Context is lexed but not tagged
+
+        def index(offset):
+            i = bisect_right(line_starts, offset) - 1
+            return f"{context + i}.{offset - line_starts[i]}"
+
+        spans = {}
+        for offset, token_type, value in self.lexer.get_tokens_unprocessed(block):
+            end = offset + len(value)
+            tag = tag_for(token_type)
+            if tag is None or end <= skip:
+                continue
+            spans.setdefault(tag, []).extend((index(max(offset, skip)), index(end)))
+        self._clear(f"{first}.0", f"{last + 1}.0")
+        for tag, indices in spans.items():
+            self.text.tag_add(tag, *indices)  # One Tk call per tag
+        self.text.tag_add(LEXED, f"{first}.0", f"{last + 1}.0")
+
+    def _clear(self, start, end):
+        for tag in ALL_TAGS:
+            self.text.tag_remove(tag, start, end)
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.schedule()
+
+    def edited(self):
+        """Re-lexes the lines around the cursor after the user changed the text."""
+        if not self.active:
+            return
+        # Edits happen at the cursor: lines it moved over while inserting,
+        # or the line a deletion joined, are the ones to lex again
+        line_count = line_of(self.text.index("end-1c"))
+        added = max(line_count - self.line_count, 0)
+        self.line_count = line_count
+        cursor = line_of(self.text.index("insert"))
+        self._clear(f"{cursor - added}.0", f"{cursor + 1}.0")
+        self.schedule()
@@ -0,0 +1,111 @@
+import json
+from difflib import SequenceMatcher
+from itertools import accumulate
+
+from compression import pack_code, unpack_code
+
+# Every CHECKPOINT_INTERVAL-th revision of a snippet stores its whole code;
+# the ones between store a delta against the revision before. Rebuilding a
+# revision starts from the checkpoint at or before it, so it applies fewer
+# than CHECKPOINT_INTERVAL deltas.
+CHECKPOINT_INTERVAL = 16
+# Autosaves within this long of the first one go into the same revision
+AUTOSAVE_REVISION_SECONDS = 10 * 60
+# Replaced hunks at least this long are diffed by character, so an edit to
+# a long line doesn't store the whole line again
+CHAR_DIFF_MIN = 256
+# Middles longer than this (after the common start and end are cut off)
+# are stored whole rather than run through SequenceMatcher, which is
+# quadratic at worst
+CHAR_DIFF_MAX = 4096
+
+
+def is_checkpoint(revision):
+    """Revisions 1, 1 + CHECKPOINT_INTERVAL, ... hold the whole code."""
+    return (revision - 1) % CHECKPOINT_INTERVAL == 0
+
+
+def make_delta(old, new):
+    """new as edits to old: ranges kept from old and the text put between.
+
+    Stored as JSON through pack_code, so deltas of big edits are
+    compressed too. [[0, 12], "changed line\\n", [13, 40]] means lines
+    0-11 of old, a new line, then lines 13-39 of old. A three-item range
+    [13, 0, 80] means characters 0-79 of old counted from the start of
+    line 13; long replaced lines are diffed into those.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    matcher = SequenceMatcher(None, old_lines, new_lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:  # replace or insert; a delete just isn't kept
+            replaced = "".join(old_lines[i1:i2])
+            text = "".join(new_lines[j1:j2])
+            if len(replaced) >= CHAR_DIFF_MIN:
+                ops.extend(_char_ops(replaced, text, i1))
+            else:
+                ops.append(text)
+    return pack_code(json.dumps(ops, separators=(",", ":")))
+
+
+def _char_ops(old, new, line):
+    """Ops rebuilding new from old, the text of a hunk starting at line."""
+    limit = min(len(old), len(new))
+    start = _common_length(lambda n: old[:n] == new[:n], limit)
+    end = _common_length(
+        lambda n: old[len(old) - n :] == new[len(new) - n :], limit - start
+    )
+    ops = [[line, 0, start]] if start else []
+    old_middle = old[start : len(old) - end]
+    new_middle = new[start : len(new) - end]
+    small = max(len(old_middle), len(new_middle)) <= CHAR_DIFF_MAX
+    if old_middle and new_middle and small:
+        matcher = SequenceMatcher(None, old_middle, new_middle, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                ops.append([line, start + i1, start + i2])
+            elif j2 > j1:
+                ops.append(new_middle[j1:j2])
+    elif new_middle:
+        ops.append(new_middle)
+    if end:
+        ops.append([line, len(old) - end, len(old)])
+    return ops
+
+
+def _common_length(same, limit):
+    """The largest n <= limit with same(n), by bisection: slices compare in C."""
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if same(middle):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def apply_delta(old, delta):
+    old_lines = old.splitlines(keepends=True)
+    line_starts = [0, *accumulate(len(line) for line in old_lines)]
+    parts = []
+    for op in json.loads(unpack_code(delta)):
+        if isinstance(op, str):
+            parts.append(op)
+        elif len(op) == 3:
+            line_start = line_starts[op[0]]
+            parts.append(old[line_start + op[1] : line_start + op[2]])
+        else:
+            parts.append(old[line_starts[op[0]] : line_starts[op[1]]])
+    return "".join(parts)
+
+
+def rebuild(rows):
+    """The code of the last of rows: (checkpoint, data) from a checkpoint on."""
+    code = ""
+    for checkpoint, data in rows:
+        code = unpack_code(data) if checkpoint else apply_delta(code, data)
+    return code
@@ -0,0 +1,273 @@
+import json
+import os
+import re
+import sys
+
+from dedupe import content_hash
+from store import Snippet
+
+# Source files get their language as the category
+LANGUAGES = {
+    ".py": "python",
+    ".js": "javascript",
+    ".mjs": "javascript",
+    ".ts": "typescript",
+    ".tsx": "typescript",
+    ".jsx": "javascript",
+    ".java": "java",
+    ".kt": "kotlin",
+    ".c": "c",
+    ".h": "c",
+    ".cpp": "cpp",
+    ".cc": "cpp",
+    ".hpp": "cpp",
+    ".cs": "csharp",
+    ".go": "go",
+    ".rs": "rust",
+    ".rb": "ruby",
+    ".php": "php",
+    ".swift": "swift",
+    ".sh": "bash",
+    ".bash": "bash",
+    ".zsh": "bash",
+    ".ps1": "powershell",
+    ".sql": "sql",
+    ".html": "html",
+    ".css": "css",
+    ".scss": "css",
+    ".lua": "lua",
+    ".r": "r",
+    ".yml": "yaml",
+    ".yaml": "yaml",
+    ".toml": "toml",
+    ".md": "markdown",
+}
+SKIP_DIRS = {"node_modules", "__pycache__", "venv", "build", "dist"}
+MAX_FILE_BYTES = 1024 * 1024  # Bigger files in a folder are skipped, not snippets
+
+# JSON with comments and trailing commas, as VS Code writes snippet files.
+# Strings are matched first so "//" inside them is left alone.
+JSON_STRING = r'("(?:\\.|[^"\\])*")'
+JSON_COMMENTS = re.compile(JSON_STRING + r"|//[^\n]*|/\*.*?\*/", re.S)
+TRAILING_COMMAS = re.compile(JSON_STRING + r"|,(\s*[}\]])")
+
+
+def load_jsonc(text):
+    text = JSON_COMMENTS.sub(lambda match: match.group(1) or "", text)
+    text = TRAILING_COMMAS.sub(lambda match: match.group(1) or match.group(2), text)
+    return json.loads(text)
+
+
+def find_sources(paths):
+    """Yields (path, kind, size, title) for every file to read from paths.
+
+    kind is "jsonl" (exported snippets, one per line), "json" (an array of
+    them, or VS Code snippets), or "source" (the file is one snippet).
+    Folders are walked in name order, skipping hidden and build folders.
+    JSON files in them are "folder-json": VS Code snippets if they hold
+    any, else a source file like package.json.
+    """
+    for path in paths:
+        if path == "-":
+            yield path, "stdin", 0, ""
+        elif os.path.isdir(path):
+            for folder, dirs, files in os.walk(path):
+                dirs[:] = sorted(
+                    d for d in dirs if not d.startswith(".") and d not in SKIP_DIRS
+                )
+                for name in sorted(files):
+                    if name.startswith("."):
+                        continue
+                    file_path = os.path.join(folder, name)
+                    title = os.path.relpath(file_path, path).replace(os.sep, "/")
+                    if name.endswith((".json", ".code-snippets")):
+                        kind = "folder-json"
+                    else:
+                        kind = "source"
+                    yield file_path, kind, os.path.getsize(file_path), title
+        else:
+            extension = os.path.splitext(path)[1].lower()
+            if extension in (".jsonl", ".ndjson"):
+                kind = "jsonl"
+            elif extension in (".json", ".code-snippets"):
+                kind = "json"
+            else:
+                kind = "source"
+            yield path, kind, os.path.getsize(path), os.path.basename(path)
+
+
+def record_snippet(record):
+    """A Snippet from an exported record, or None if it has no title or code."""
+    if not isinstance(record, dict):
+        return None
+    title, code = record.get("title"), record.get("code")
+    if not isinstance(title, str) or not isinstance(code, str):
+        return None
+    return Snippet(None, title, record.get("category") or "", code)
+
+
+def is_vscode_snippets(data):
+    return (
+        isinstance(data, dict)
+        and bool(data)
+        and all(isinstance(entry, dict) and "body" in entry for entry in data.values())
+    )
+
+
+def vscode_snippets(data, path):
+    """Yields Snippets from a VS Code snippet file: {name: {prefix, body, scope}}.
+
+    Snippets without a scope get the file's language: VS Code names
+    per-language snippet files after it, e.g. python.json.
+    """
+    name = os.path.basename(path)
+    default_category = name[: -len(".json")] if name.endswith(".json") else ""
+    for name, entry in data.items():
+        if not isinstance(entry, dict) or "body" not in entry:
+            yield None
+            continue
+        body = entry["body"]
+        code = "\n".join(body) if isinstance(body, list) else str(body)
+        scope = str(entry.get("scope") or default_category)
+        yield Snippet(None, name, scope.split(",")[0].strip(), code)
+
+
+class Importer:
+    """Bulk import of snippets from files and folders.
+
+    Reads exported JSON Lines, JSON arrays, VS Code snippet files (.json per
+    language or .code-snippets) and folders of source files, streaming them
+    into SnippetStore.insert_many as one transaction. Snippets whose code is
+    already stored, or appeared earlier in the import, are skipped; code is
+    compared by content hash, so whitespace and indentation don't count.
+
+    run() is made for the DB worker: read_bytes and total_bytes may be read
+    from another thread to show progress while it runs.
+    """
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.total_bytes = 0  # 0 until the sources have been found
+        self.read_bytes = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.skipped = 0  # Files and records that aren't snippets
+
+    def progress(self):
+        """Fraction of the input read so far.
+
+        None while that says nothing: before the sources have been found and
+        after everything is read, while the search index is being filled.
+        """
+        if not self.total_bytes or self.read_bytes >= self.total_bytes:
+            return None
+        return self.read_bytes / self.total_bytes
+
+    def summary(self):
+        text = f"Imported {self.imported} snippets"
+        if self.duplicates:
+            text += f", skipped {self.duplicates} duplicates"
+        if self.skipped:
+            text += f", {self.skipped} unreadable files or records"
+        return text + "."
+
+    def run(self, store):
+        sources = list(find_sources(self.paths))
+        self.total_bytes = sum(size for _, _, size, _ in sources) or 1
+        seen = store.content_hashes()
+
+        def unique():
+            for snippet in self._read(sources):
+                if snippet is None:
+                    self.skipped += 1
+                    continue
+                snippet = snippet._replace(
+                    title=snippet.title.strip(),
+                    category=snippet.category.strip(),
+                    code=snippet.code.strip(),
+                )
+                if not snippet.title or not snippet.code:
+                    self.skipped += 1
+                    continue
+                key = content_hash(snippet.code)
+                if key in seen:
+                    self.duplicates += 1
+                    continue
+                seen.add(key)
+                yield snippet
+
+        self.imported = store.insert_many(unique())
+        return self
+
+    def _read(self, sources):
+        """Yields a Snippet, or None for anything unusable, from every source."""
+        for path, kind, size, title in sources:
+            done = self.read_bytes + size
+            if kind == "stdin":
+                yield from self._read_stdin()
+            elif kind == "jsonl":
+                with open(path, encoding="utf-8") as source:
+                    yield from self._read_lines(source, path)
+            elif kind == "json":
+                with open(path, encoding="utf-8") as source:
+                    yield from self._read_json(source.read(), path)
+            elif kind == "folder-json":
+                yield from self._read_folder_json(path, size, title)
+            else:
+                yield self._read_source(path, size, title)
+            self.read_bytes = done
+
+    def _read_stdin(self):
+        text = sys.stdin.read()
+        if text.lstrip().startswith("["):
+            yield from self._read_json(text, "stdin")
+        else:
+            yield from self._read_lines(text.splitlines(), "stdin")
+
+    def _read_lines(self, lines, name):
+        for line_number, line in enumerate(lines, 1):
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"{name}, line {line_number}: {e}") from None
+                yield record_snippet(record)
+            self.read_bytes += len(line)  # Characters, close enough to bytes
+
+    def _read_json(self, text, name):
+        try:
+            data = load_jsonc(text)
+        except ValueError as e:
+            raise ValueError(f"{name}: {e}") from None
+        if isinstance(data, list):
+            for record in data:
+                yield record_snippet(record)
+        elif isinstance(data, dict):
+            yield from vscode_snippets(data, name)
+        else:
+            yield None
+
+    def _read_folder_json(self, path, size, title):
+        source = self._read_source(path, size, title)
+        if source is None:
+            return [None]
+        try:
+            data = load_jsonc(source.code)
+        except ValueError:
+            return [source]
+        if is_vscode_snippets(data):
+            return vscode_snippets(data, path)
+        return [source]
+
+    def _read_source(self, path, size, title):
+        if size > MAX_FILE_BYTES:
+            return None
+        try:
+            with open(path, encoding="utf-8") as source:
+                code = source.read()
+        except (UnicodeDecodeError, OSError):
+            return None
+        if "\0" in code:
+            return None  # Binary file that happens to decode
+        extension = os.path.splitext(path)[1].lower()
+        return Snippet(None, title, LANGUAGES.get(extension, extension[1:]), code)
@@ -0,0 +1,216 @@
+import re
+from collections import Counter
+
+# Languages are named like the importer's categories and Pygments' lexers
+# (python, javascript, cpp...). "" means unknown.
+ALIASES = {
+    "py": "python",
+    "python3": "python",
+    "js": "javascript",
+    "node": "javascript",
+    "ts": "typescript",
+    "c++": "cpp",
+    "cs": "csharp",
+    "c#": "csharp",
+    "golang": "go",
+    "rs": "rust",
+    "rb": "ruby",
+    "sh": "bash",
+    "shell": "bash",
+    "zsh": "bash",
+    "ps1": "powershell",
+    "yml": "yaml",
+    "md": "markdown",
+    "kt": "kotlin",
+}
+SHEBANGS = {
+    "python": "python",
+    "bash": "bash",
+    "sh": "bash",
+    "zsh": "bash",
+    "node": "javascript",
+    "deno": "typescript",
+    "ruby": "ruby",
+    "php": "php",
+    "perl": "perl",
+    "pwsh": "powershell",
+    "lua": "lua",
+    "Rscript": "r",
+}
+# Constructs that settle the language on their own, checked in order
+SIGNATURES = (
+    ("php", re.compile(r"<\?php")),
+    ("html", re.compile(r"^\s*(<!DOCTYPE html|<html\b)", re.I)),
+    ("go", re.compile(r"^package \w+\s*$", re.M)),
+    ("rust", re.compile(r"\bfn \w+(<[^>]*>)?\(.*\)\s*(->|\{)|\blet mut\b")),
+    ("cpp", re.compile(r"#include\s*<(iostream|vector|string|memory)>|\bstd::")),
+    ("c", re.compile(r"#include\s*[<\"]\w+\.h[>\"]")),
+    ("csharp", re.compile(r"^\s*using System\b|^namespace \w+(\.\w+)*\s*\{?$", re.M)),
+    ("java", re.compile(r"\bpublic (final )?class \w+|System\.out\.print")),
+)
+# Token weights: how much seeing a token makes each language more likely,
+# as weight -> tokens separated by single spaces (so ":\n" is one token).
+# Counts are capped, so one word repeated many times can't decide alone.
+WEIGHTED_TOKENS = {
+    "python": {
+        4: "elif __init__",
+        3: "def None except :\n",
+        2: "self True False lambda pass raise print",
+        1: "import from not in and or is with yield async await return #",
+    },
+    "javascript": {
+        4: "=== !== function",
+        3: "console document window require undefined",
+        2: "const let var => typeof",
+        1: "null this new async await export return // ;",
+    },
+    "typescript": {
+        4: "readonly",
+        3: "interface boolean",
+        2: "=== implements string number any unknown enum",
+        1: "type const let => export private ;",
+    },
+    "bash": {
+        5: "fi esac",
+        4: "-eq -ne",
+        3: "echo then done sudo -z [[",
+        2: "$ grep cd",
+        1: "do elif export local && || | -n",
+    },
+    "c": {
+        4: "printf malloc",
+        3: "#include sizeof NULL unsigned typedef #define",
+        2: "int char void free struct",
+        1: "-> ; static return",
+    },
+    "cpp": {
+        5: "cout nullptr",
+        4: "std",
+        3: "template virtual",
+        2: "#include :: << auto namespace",
+        1: "class public int void const ; ->",
+    },
+    "csharp": {
+        4: "Console",
+        3: "Task",
+        2: "using namespace get set override",
+        1: "public private static void string var async => ; new",
+    },
+    "java": {
+        5: "@Override",
+        4: "throws",
+        3: "System",
+        2: "public private String extends implements final",
+        1: "class static void import new ;",
+    },
+    "go": {
+        5: "defer chan",
+        4: "func := fmt",
+        3: "nil",
+        2: "package err range",
+        1: "go struct interface",
+    },
+    "rust": {
+        4: "fn mut impl unwrap",
+        3: "pub Some println",
+        2: "match Ok Err",
+        1: "let use None & :: -> ! struct enum",
+    },
+    "ruby": {
+        5: "elsif attr_accessor",
+        4: "puts",
+        3: "end unless",
+        2: "def require nil module",
+        1: "do @ =>",
+    },
+    "php": {
+        10: "<?php",
+        2: "$ echo -> array foreach",
+        1: "function public namespace => ;",
+    },
+    "sql": {
+        4: "SELECT INSERT TABLE JOIN",
+        3: "FROM WHERE INTO UPDATE CREATE GROUP VALUES select",
+        2: "DELETE ORDER BY where join",
+        1: "from",
+    },
+    "html": {
+        4: "href",
+        3: "</ div span",
+        2: "body head script />",
+        1: "< class p",
+    },
+    "css": {
+        4: "px margin padding",
+        3: "rem color display background border",
+        2: "em font width",
+        1: "{ } : ; #",
+    },
+    "powershell": {
+        3: "Write param Host",
+        2: "Get -eq -ne Object",
+        1: "$ Set function foreach",
+    },
+    "yaml": {
+        2: ": -",
+        1: "name version true false",
+    },
+}
+WEIGHTS = {
+    language: {
+        token: weight
+        for weight, tokens in weighted.items()
+        for token in tokens.split(" ")
+    }
+    for language, weighted in WEIGHTED_TOKENS.items()
+}
+# Everything canonical() accepts
+NAMES = {*WEIGHTS, *SHEBANGS.values(), *ALIASES.values(), "swift", "toml"}
+MAX_TOKEN_COUNT = 5
+SAMPLE_CHARS = 20000  # Only the start of big snippets is looked at
+MIN_SCORE = 6  # Less evidence than this is "unknown"
+TOKEN = re.compile(
+    r"<\?php|#include|#define|@Override|:=|===|!==|=>|->|::|<<|&&|\|\||\[\[|</|/>|//"
+    r"|-[a-z]{1,2}\b|:\n|[A-Za-z_]\w*|[$@#:;{}<>|&!-]"
+)
+
+
+def canonical(name):
+    """The language a name (a category or search filter) refers to, or ""."""
+    name = (name or "").strip().lower()
+    name = ALIASES.get(name, name)
+    return name if name in NAMES else ""
+
+
+def detect_language(code, category=""):
+    """Guesses the language of a snippet, "" when there is too little to go on.
+
+    A category naming a language wins, then a shebang line, then
+    SIGNATURES, then the language whose WEIGHTS the tokens score highest
+    on.
+    """
+    language = canonical(category)
+    if language:
+        return language
+    sample = code[:SAMPLE_CHARS]
+    if sample.startswith("#!"):
+        first_line = sample.split("\n", 1)[0].split()
+        for word in first_line[:2]:
+            interpreter = word.rsplit("/", 1)[-1].rstrip("0123456789.")
+            if interpreter in SHEBANGS:
+                return SHEBANGS[interpreter]
+    for language, pattern in SIGNATURES:
+        if pattern.search(sample):
+            return language
+
+    counts = Counter(TOKEN.findall(sample))
+    best, best_score = "", MIN_SCORE - 1
+    for language, weights in WEIGHTS.items():
+        score = sum(
+            weight * min(counts[token], MAX_TOKEN_COUNT)
+            for token, weight in weights.items()
+            if token in counts
+        )
+        if score > best_score:
+            best, best_score = language, score
+    return best
@@ -0,0 +1,261 @@
+import sqlite3
+import time
+
+from compression import COMPRESS_MIN_BYTES, register_functions
+from dedupe import content_hash
+
+# Per-connection tuning. WAL lets the UI and worker connections read while
+# the other writes; with WAL, synchronous=NORMAL only syncs at checkpoints.
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -20000),  # Negative means KiB, so about 20 MB
+    ("mmap_size", 256 * 1024 * 1024),
+    ("temp_store", "MEMORY"),
+)
+
+
+def configure_connection(conn):
+    """Applies the standard pragmas and SQL functions to a freshly opened connection."""
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
+    register_functions(conn)  # pack_code() and unpack_code() for compressed bodies
+
+
+def _create_base_tables(conn):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS snippets
+                      (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       title TEXT NOT NULL,
+                       category TEXT,
+                       code TEXT NOT NULL)"""
+    )
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS settings
+                      (key TEXT PRIMARY KEY,
+                       value TEXT)"""
+    )
+
+
+def _create_search_index(conn):
+    existing = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='snippets_fts'"
+    ).fetchone()
+    if not existing:
+        # trigram gives substring matching like the old LIKE search (SQLite 3.34+),
+        # older SQLite builds fall back to word-prefix matching.
+        for tokenizer, extra in (("trigram", ""), ("unicode61", ", prefix='2 3'")):
+            try:
+                conn.execute(
+                    f"""CREATE VIRTUAL TABLE snippets_fts USING fts5(
+                            title, category, code,
+                            content='snippets', content_rowid='id',
+                            tokenize='{tokenizer}'{extra})"""
+                )
+                break
+            except sqlite3.OperationalError:
+                continue
+        else:
+            print("FTS5 not available, falling back to LIKE search.")
+            return
+
+    conn.execute(
+        """CREATE TRIGGER IF NOT EXISTS snippets_fts_ai AFTER INSERT ON snippets BEGIN
+            INSERT INTO snippets_fts (rowid, title, category, code)
+            VALUES (new.id, new.title, new.category, new.code);
+        END"""
+    )
+    conn.execute(
+        """CREATE TRIGGER IF NOT EXISTS snippets_fts_ad AFTER DELETE ON snippets BEGIN
+            INSERT INTO snippets_fts (snippets_fts, rowid, title, category, code)
+            VALUES ('delete', old.id, old.title, old.category, old.code);
+        END"""
+    )
+    conn.execute(
+        """CREATE TRIGGER IF NOT EXISTS snippets_fts_au AFTER UPDATE ON snippets BEGIN
+            INSERT INTO snippets_fts (snippets_fts, rowid, title, category, code)
+            VALUES ('delete', old.id, old.title, old.category, old.code);
+            INSERT INTO snippets_fts (rowid, title, category, code)
+            VALUES (new.id, new.title, new.category, new.code);
+        END"""
+    )
+    if not existing:
+        # Index every snippet already stored
+        conn.execute("INSERT INTO snippets_fts (snippets_fts) VALUES ('rebuild')")
+
+
+def _create_list_indexes(conn):
+    # The title-sorted list pages over (title, id); nothing looks titles up
+    # case-sensitively any more, so the old binary title index only costs writes.
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_snippet_title_nocase"
+        " ON snippets (title COLLATE NOCASE, id)"
+    )
+    conn.execute("DROP INDEX IF EXISTS idx_snippet_title")
+    # The category list walks this index for DISTINCT, leaving only the
+    # distinct values to be sorted case-insensitively
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_snippet_category ON snippets (category)"
+    )
+
+
+def _add_content_hash(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(snippets)")}
+    if "content_hash" not in columns:
+        conn.execute("ALTER TABLE snippets ADD COLUMN content_hash INTEGER")
+    # Re-index a snippet only when its text changes, not when columns like
+    # content_hash are filled in (the backfill below would re-index everything)
+    if fts_tokenizer(conn):
+        conn.execute("DROP TRIGGER IF EXISTS snippets_fts_au")
+        conn.execute(
+            """CREATE TRIGGER snippets_fts_au
+            AFTER UPDATE OF title, category, code ON snippets BEGIN
+                INSERT INTO snippets_fts (snippets_fts, rowid, title, category, code)
+                VALUES ('delete', old.id, old.title, old.category, old.code);
+                INSERT INTO snippets_fts (rowid, title, category, code)
+                VALUES (new.id, new.title, new.category, new.code);
+            END"""
+        )
+    conn.create_function("content_hash", 1, content_hash, deterministic=True)
+    conn.execute(
+        "UPDATE snippets SET content_hash = content_hash(code)"
+        " WHERE content_hash IS NULL"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_snippet_content_hash ON snippets (content_hash)"
+    )
+
+
+def _compress_large_bodies(conn):
+    tokenizer = fts_tokenizer(conn)
+    if tokenizer:
+        for name in ("snippets_fts_ai", "snippets_fts_ad", "snippets_fts_au"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    # With the triggers gone the search index keeps its entries, which still
+    # match: compressing doesn't change the text
+    conn.execute(
+        "UPDATE snippets SET code = pack_code(code)"
+        " WHERE typeof(code) = 'text' AND length(CAST(code AS BLOB)) >= ?",
+        (COMPRESS_MIN_BYTES,),
+    )
+    if not tokenizer:
+        return
+    # Triggers only index plain TEXT bodies. SnippetStore indexes compressed
+    # ones itself, so writes still work on connections without unpack_code(),
+    # like the sqlite3 shell.
+    conn.execute(
+        """CREATE TRIGGER snippets_fts_ai AFTER INSERT ON snippets BEGIN
+            INSERT INTO snippets_fts (rowid, title, category, code)
+            SELECT new.id, new.title, new.category, new.code
+            WHERE typeof(new.code) = 'text';
+        END"""
+    )
+    conn.execute(
+        """CREATE TRIGGER snippets_fts_ad AFTER DELETE ON snippets BEGIN
+            INSERT INTO snippets_fts (snippets_fts, rowid, title, category, code)
+            SELECT 'delete', old.id, old.title, old.category, old.code
+            WHERE typeof(old.code) = 'text';
+        END"""
+    )
+    conn.execute(
+        """CREATE TRIGGER snippets_fts_au
+        AFTER UPDATE OF title, category, code ON snippets BEGIN
+            INSERT INTO snippets_fts (snippets_fts, rowid, title, category, code)
+            SELECT 'delete', old.id, old.title, old.category, old.code
+            WHERE typeof(old.code) = 'text';
+            INSERT INTO snippets_fts (rowid, title, category, code)
+            SELECT new.id, new.title, new.category, new.code
+            WHERE typeof(new.code) = 'text';
+        END"""
+    )
+
+
+def _add_language(conn):
+    # NULL until classified: rows are backfilled in batches after startup
+    # (SnippetStore.classify_pending), so this step stays instant
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(snippets)")}
+    if "language" not in columns:
+        conn.execute("ALTER TABLE snippets ADD COLUMN language TEXT")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_snippet_language ON snippets(language)"
+    )
+
+
+def _create_revisions(conn):
+    # Earlier versions of edited snippets, see history.py. data is the whole
+    # code on checkpoint rows and a delta against the revision before on
+    # the others, either one stored through pack_code.
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS snippet_revisions
+                      (snippet_id INTEGER NOT NULL,
+                       revision INTEGER NOT NULL,
+                       saved_at TEXT,
+                       title TEXT NOT NULL,
+                       category TEXT,
+                       checkpoint INTEGER NOT NULL,
+                       data NOT NULL,
+                       PRIMARY KEY (snippet_id, revision))"""
+    )
+
+
+def _add_revision_autosave_time(conn):
+    # When the autosaves folded into a revision began, NULL for revisions
+    # written by an explicit Save (see SnippetStore._add_revision)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(snippet_revisions)")}
+    if "autosave_since" not in columns:
+        conn.execute("ALTER TABLE snippet_revisions ADD COLUMN autosave_since TEXT")
+
+
+# (version, description, step, startup budget in ms). Steps must be safe to
+# run against databases created before versioning, which report version 0
+# but may already have some of these objects.
+MIGRATIONS = [
+    (1, "base tables", _create_base_tables, 50),
+    (2, "full-text search index", _create_search_index, 2000),
+    (3, "list and category indexes", _create_list_indexes, 1000),
+    (4, "content hashes for duplicate detection", _add_content_hash, 5000),
+    (5, "compressed storage for large snippets", _compress_large_bodies, 5000),
+    (6, "detected language column", _add_language, 1000),
+    (7, "snippet revision history", _create_revisions, 50),
+    (8, "autosaves share a revision", _add_revision_autosave_time, 50),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def migrate(conn):
+    """Brings the database up to SCHEMA_VERSION, one transaction per step.
+
+    The schema version lives in PRAGMA user_version. Steps that take longer
+    than their budget are reported so slow upgrades get noticed.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, description, step, budget_ms in MIGRATIONS:
+        if target <= version:
+            continue
+        start = time.perf_counter()
+        conn.execute("BEGIN")
+        try:
+            step(conn)
+            conn.execute(f"PRAGMA user_version={target}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms > budget_ms:
+            print(
+                f"Migration {target} ({description}) took {elapsed_ms:.0f}ms,"
+                f" over its {budget_ms}ms budget."
+            )
+        version = target
+
+
+def fts_tokenizer(conn):
+    """Returns the tokenizer the search index was built with, or None without FTS."""
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name='snippets_fts'"
+    ).fetchone()
+    if not row:
+        return None
+    return "trigram" if "trigram" in row[0] else "unicode61"
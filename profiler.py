@@ -0,0 +1,52 @@
+import json
+import time
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """Collects wall-clock timings for the named phases of application startup.
+
+    Synchronous phases use the phase() context manager. Phases that finish
+    in a later callback (work done on the DB worker) use start() and stop().
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.timings = {}  # phase name -> seconds, in the order phases finished
+        self.started = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def start(self, name):
+        self.started[name] = time.perf_counter()
+
+    def stop(self, name):
+        start = self.started.pop(name, None)
+        if start is not None:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def report(self):
+        """Returns the timings in ms, plus the total since the profiler was made."""
+        result = {
+            name: round(seconds * 1000, 2) for name, seconds in self.timings.items()
+        }
+        result["total"] = round((time.perf_counter() - self.origin) * 1000, 2)
+        return result
+
+    def print_report(self):
+        report = self.report()
+        print("Startup profile:")
+        for name, elapsed_ms in report.items():
+            print(f"  {name:<10} {elapsed_ms:>9.1f}ms")
+        # Single machine-readable line for bench_startup.py
+        print("startup-profile: " + json.dumps(report))
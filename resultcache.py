@@ -0,0 +1,67 @@
+from collections import OrderedDict
+
+ROW_OVERHEAD = 64  # Rough bytes per cached (id, title) row besides the title
+
+
+def result_size(result):
+    """Approximate memory used by a (total, rows) result, in bytes."""
+    _, rows = result
+    return sum(len(title) for _, title in rows) + ROW_OVERHEAD * len(rows)
+
+
+class ResultCache:
+    """LRU cache of listbox results, query text -> (total, rows in display order).
+
+    Bounded by entry count and by approximate size in bytes. Every snippet
+    write calls invalidate(), which bumps the generation; results of queries
+    started before a write carry the older generation and are not stored,
+    so the cache never holds rows read before the latest write.
+    """
+
+    def __init__(self, max_entries=64, max_bytes=8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # query -> (result, size), oldest first
+        self.bytes = 0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, query):
+        entry = self.entries.get(query)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(query)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, query, result, generation):
+        """Stores a result computed while generation was current."""
+        if generation != self.generation:
+            return  # Snippets changed while the query ran
+        size = result_size(result)
+        if size > self.max_bytes:
+            return
+        old = self.entries.pop(query, None)
+        if old is not None:
+            self.bytes -= old[1]
+        self.entries[query] = (result, size)
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def invalidate(self):
+        self.generation += 1
+        self.entries.clear()
+        self.bytes = 0
+
+    def summary(self):
+        return (
+            f"search cache: {self.hits} hits, {self.misses} misses,"
+            f" {self.evictions} evictions, {len(self.entries)} entries"
+            f" ({self.bytes / 1024:.0f} KiB)"
+        )
@@ -0,0 +1,190 @@
+import re
+
+from compression import code_sql
+from language import canonical
+
+FIELDS = {
+    "title": "title",
+    "cat": "category",
+    "category": "category",
+    "lang": "language",
+    "language": "language",
+}
+ALL_COLUMNS = ("title", "category", "code")
+
+# One search term: an optional "-", an optional field prefix, then a quoted
+# phrase, a /regex/ or a bare word. A /regex/ must end the token, so paths
+# like /usr/bin stay plain words.
+TOKEN = re.compile(
+    r"""(?P<negated>-)?
+        (?:(?P<field>[a-z]+):)?
+        (?: "(?P<phrase>[^"]*)"?
+          | /(?P<regex>(?:\\.|[^/\\])+)/(?=\s|$)
+          | (?P<word>\S+) )""",
+    re.X,
+)
+
+
+class SearchQuery:
+    """A parsed search: terms that must all match, or must not when negated.
+
+    Each term is (columns, kind, value, negated), where kind is "text" for
+    words and phrases (case-insensitive substrings), "regex" for a compiled
+    pattern and "language" for an exact detected language (lang:python). A
+    query without any syntax is "plain" and keeps the whole text as one
+    substring, like the search always did.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.terms = []
+        self.plain = True
+        for match in TOKEN.finditer(text):
+            self._add(match)
+
+    def _add(self, match):
+        token = match.group(0)
+        field = match.group("field")
+        if field and field not in FIELDS:
+            # Not a filter, e.g. "http://"; keep the token as a plain word
+            self.terms.append((ALL_COLUMNS, "text", token, False))
+            return
+        columns = (FIELDS[field],) if field else ALL_COLUMNS
+        negated = bool(match.group("negated"))
+        phrase, regex, word = match.group("phrase", "regex", "word")
+
+        if regex is not None and columns != ("language",):
+            # Smart case: ignore case unless the pattern has capitals
+            flags = 0 if any(char.isupper() for char in regex) else re.I
+            try:
+                pattern = re.compile(regex, flags)
+            except re.error:
+                value = f"/{regex}/"  # Not a valid pattern, search for it literally
+            else:
+                self.terms.append((columns, "regex", pattern, negated))
+                self.plain = False
+                return
+        else:
+            value = phrase if phrase is not None else word
+
+        if not value:
+            # A lone "-", "title:" or '"' typed on the way to a real term
+            self.terms.append((ALL_COLUMNS, "text", token, False))
+            return
+        if columns == ("language",):
+            # Aliases like lang:js name the stored language, javascript
+            language = canonical(value) or value.lower()
+            self.terms.append((columns, "language", language, negated))
+            self.plain = False
+            return
+        if negated or field or phrase is not None:
+            self.plain = False
+        self.terms.append((columns, "text", value, negated))
+
+
+def _like_pattern(value):
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _column_sql(column):
+    # Compressed bodies have to be unpacked before LIKE can look inside them
+    if column == "code":
+        return code_sql("s.code")
+    # A NULL category would make NOT (... LIKE ?) NULL and drop the row
+    return f"COALESCE(s.{column}, '')"
+
+
+def _fts_phrase(columns, value):
+    phrase = '"' + value.replace('"', '""') + '"'
+    if columns == ALL_COLUMNS:
+        return phrase
+    return f"{columns[0]} : {phrase}"
+
+
+def run_search_query(conn, query, tokenizer, limit=None):
+    """Returns (id, title) rows for a parsed query, best matches first.
+
+    Text terms become one FTS MATCH when the trigram index can answer them
+    (3+ characters), so only the matching rows are read. Short terms are
+    LIKE conditions checked on those rows, and /regex/ terms are a final
+    filter over the streamed candidate rows, the only step that needs the
+    snippet bodies in Python. With a limit, reading stops after that many
+    matches.
+    """
+    fts_terms = []  # (columns, value, negated) the search index can answer
+    like_terms = []
+    regexes = []
+    conditions = []
+    params = []
+    for columns, kind, value, negated in query.terms:
+        if kind == "language":
+            # Equality on the indexed column, never a re-classification
+            operator = "IS NOT" if negated else "="
+            conditions.append(f"s.language {operator} ?")
+            params.append(value)
+        elif kind == "regex":
+            regexes.append((columns, value, negated))
+        elif tokenizer == "trigram" and len(value) >= 3:
+            fts_terms.append((columns, value, negated))
+        else:
+            like_terms.append((columns, value, negated))
+    if all(negated for _, _, negated in fts_terms):
+        # FTS5 NOT needs something on its left, check these row by row instead
+        like_terms.extend(fts_terms)
+        fts_terms = []
+
+    for columns, value, negated in like_terms:
+        condition = " OR ".join(
+            f"{_column_sql(column)} LIKE ? ESCAPE '\\'" for column in columns
+        )
+        conditions.append(f"NOT ({condition})" if negated else f"({condition})")
+        params.extend([_like_pattern(value)] * len(columns))
+
+    select = "s.id, s.title"
+    if regexes:
+        select += f", s.category, {code_sql('s.code')}"
+    if fts_terms:
+        positive = " AND ".join(
+            _fts_phrase(columns, value)
+            for columns, value, negated in fts_terms
+            if not negated
+        )
+        match_query = f"({positive})" + "".join(
+            f" NOT {_fts_phrase(columns, value)}"
+            for columns, value, negated in fts_terms
+            if negated
+        )
+        sql = (
+            f"SELECT {select} FROM snippets_fts"
+            " JOIN snippets s ON s.id = snippets_fts.rowid"
+            " WHERE snippets_fts MATCH ?"
+        )
+        params.insert(0, match_query)
+        if conditions:
+            sql += " AND " + " AND ".join(conditions)
+        sql += " ORDER BY bm25(snippets_fts, 10.0, 5.0, 1.0), s.title COLLATE NOCASE"
+    else:
+        sql = f"SELECT {select} FROM snippets s"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY s.title COLLATE NOCASE, s.id"
+
+    if limit and not regexes:
+        sql += " LIMIT ?"
+        params.append(limit)
+    cursor = conn.execute(sql, params)
+    if not regexes:
+        return cursor.fetchall()
+
+    rows = []
+    for snippet_id, title, category, code in cursor:
+        values = {"title": title, "category": category or "", "code": code}
+        if all(
+            any(pattern.search(values[column]) for column in columns) != negated
+            for columns, pattern, negated in regexes
+        ):
+            rows.append((snippet_id, title))
+            if len(rows) == limit:
+                break
+    return rows
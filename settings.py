@@ -0,0 +1,37 @@
+import sqlite3
+
+
+class Settings:
+    """In-memory view of the settings table with buffered writes.
+
+    Every setting is read in one query up front. Changes update the in-memory
+    values right away and are remembered as pending until the owner writes
+    them out in a single transaction with SnippetStore.write_settings().
+    """
+
+    def __init__(self, store):
+        try:
+            self.values = store.load_settings()
+        except sqlite3.Error as e:
+            print(f"Database error loading settings: {e}")
+            self.values = {}
+        self.pending = {}  # key -> new value, or None to delete the key
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def set(self, key, value):
+        if self.values.get(key) == value:
+            return
+        self.values[key] = value
+        self.pending[key] = value
+
+    def delete(self, key):
+        if key in self.values:
+            del self.values[key]
+            self.pending[key] = None
+
+    def take_pending(self):
+        """Returns the buffered changes and starts a new, empty buffer."""
+        pending, self.pending = self.pending, {}
+        return pending
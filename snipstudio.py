@@ -1,30 +1,104 @@
+import time
+
+_IMPORT_START = time.perf_counter()  # For the "imports" startup phase
+
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
+from tkinter import ttk, messagebox, scrolledtext, filedialog
 import sqlite3
 import pyperclip
 import os
 import sys
+import traceback
+from collections import Counter
 from theme import themes
+from worker import DatabaseWorker
+from virtuallist import VirtualListbox
+from fuzzy import FuzzyIndex
+from highlighter import Highlighter
+from importer import Importer
+from exporter import Exporter
+from dedupe import DuplicateFinder
+from searchquery import SearchQuery
+from resultcache import ResultCache
+from settings import Settings
+from store import Snippet, SnippetStore, nocase
+from stylecache import load_theme_specs
+from profiler import StartupProfiler
+
+DB_PATH = "code_snippets.db"
+# Compiled theme styles are cached next to the database
+THEME_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(DB_PATH)), "theme_cache.json"
+)
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
 
 
 class CodeStorageApp:
-    def __init__(self, root):
+    SEARCH_DEBOUNCE_MS = 150  # Quiet time after the last key before searching
+    SEARCH_NARROW_LIMIT = 5000  # Above this, a fresh FTS query beats narrowing
+    FUZZY_LIMIT = 100  # Title/category matches shown ahead of code matches
+    DB_POLL_MS = 10  # How often the Tk thread checks for finished DB work
+    SETTINGS_FLUSH_MS = 2000  # Settings changes are batched into one write this often
+    AUTOSAVE_MS = 2000  # Edits are written at most this often, one transaction each
+    JOB_PROGRESS_MS = 100  # How often the progress bar follows an import or export
+    EDITOR_CHUNK_CHARS = 100_000  # Code inserted per step when loading a big snippet
+    READ_ONLY_CHARS = 1_000_000  # Bigger snippets open read-only and unwrapped
+    BACKFILL_BATCH = 500  # Snippets classified or hashed per DB request
+
+    def __init__(self, root, profiler=None, exit_after_startup=False):
         self.root = root
         self.root.title("SnipStudio")
+        self.profiler = profiler or StartupProfiler()
+        self.profiler.record("imports", IMPORT_SECONDS)
+        self.exit_after_startup = exit_after_startup
 
-        # Define themes
-
-        self.themes = themes
+        # Define themes (compiled and validated once, then served from the cache)
+        with self.profiler.phase("theme"):
+            self.theme_specs = load_theme_specs(themes, THEME_CACHE_PATH)
+            self.themes = {
+                name: spec["colors"] for name, spec in self.theme_specs.items()
+            }
 
         # Set default theme (will be overridden by loaded theme if available)
-        self.current_theme = "catppuccin"
+        self.current_theme = "catppuccin_mocha"
         # Initialize theme_var
         self.theme_var = tk.StringVar(value=self.current_theme)
 
         # Database setup
-        self.conn = sqlite3.connect("code_snippets.db")
-        self.create_table()
-        self.create_settings_table()
+        self.profiler.start("db")
+        self.store = None  # The Tk thread's store, opened by setup_database
+        self.fts_tokenizer = None
+
+        # Search scheduling state
+        self.search_after_id = None
+        self.search_generation = 0
+        self.last_search_query = ""  # Latest query sent to the database
+        self.listbox_query = ""  # Query the last database search results match
+        self.search_result_ids = None  # Ids of those results, None for the full list
+        self.listbox_counting = False  # The full list's length is still being counted
+        self.result_cache = ResultCache()  # Recent results by query, cleared on writes
+        self.fuzzy_index = None  # Titles and categories, loaded after startup
+        self.fuzzy_query = ""  # Query of the fuzzy matches on screen
+        self.setup_database()
+        self.settings = Settings(self.store)  # All settings, read in one query
+        self.settings_flush_id = None
+
+        # Snippet reads and writes run on a worker thread with its own store
+        self.db = DatabaseWorker(lambda: SnippetStore(DB_PATH, migrate_schema=False))
+        self.pending_db_calls = []
+        self.db_poll_id = None
+        self.snippet_request = 0  # Only the latest snippet load may fill the editor
+        self.editor_load_id = None  # Next chunk of a big snippet still being inserted
+        # Autosave state: the snippet the editor's edits belong to (None while
+        # loading and for a new snippet), and a hash of its fields as stored
+        self.editor_snippet_id = None
+        self.editor_saved_hash = None
+        self.editor_dirty = False
+        self.autosave_id = None
+        self.categories_requested = False  # Categories load on first dropdown open
+        self.category_counts = None  # Category -> number of snippets, once loaded
+        self.job = None  # The running import or export, if any
+        self.profiler.stop("db")
 
         # Load last used theme and snippet BEFORE creating widgets
         self.load_last_used_theme()
@@ -32,8 +106,10 @@ class CodeStorageApp:
         self.theme_var.set(self.current_theme)
 
         # Apply theme and configure UI
-        self.configure_theme()  # Apply the loaded or default theme styling
-        self.set_title_bar()
+        with self.profiler.phase("theme"):
+            self.configure_theme()  # Apply the loaded or default theme styling
+            self.set_title_bar()
+        self.profiler.start("widgets")
         self.create_widgets()  # Create widgets AFTER theme is known
 
         # Set application icon
@@ -50,12 +126,24 @@ class CodeStorageApp:
         # Set application title with logo and apply theme
 
         self.root.geometry("1400x700")
-
-        # Populate listbox and categories AFTER widgets are created
-        self.populate_listbox()
-        self.populate_categories()
-        # Load last used snippet AFTER listbox is populated
-        self.load_last_used_snippet()
+        self.profiler.stop("widgets")
+
+        # First paint only needs the last used snippet, loaded straight by id,
+        # and the first page of the list. The list total arrives after that and
+        # the categories wait until their dropdown is first opened.
+        self.profiler.start("restore")
+        self.profiler.start("list")
+        last_snippet_id = self.last_used_snippet_id()
+        if last_snippet_id is not None:
+            self.show_snippet_by_id(
+                last_snippet_id, on_done=lambda: self.profiler.stop("restore")
+            )
+        else:
+            self.profiler.stop("restore")
+        self.populate_listbox(
+            select_first=last_snippet_id is None,
+            on_done=lambda: self.restore_after_startup(last_snippet_id),
+        )
 
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.root.bind("<Control-s>", lambda event: self.save_snippet())
@@ -69,15 +157,14 @@ class CodeStorageApp:
     def set_title_bar(self):
         """Configures the title bar with the logo and title, applying the current theme."""
         # Destroy existing title frame if it exists to prevent stacking
-        for widget in self.root.winfo_children():
-            if isinstance(widget, tk.Frame) and widget.winfo_name() == "!title_frame":
-                widget.destroy()
-                break
+        if getattr(self, "title_frame", None) is not None:
+            self.title_frame.destroy()
 
         theme_colors = self.themes[self.current_theme]
         title_frame = tk.Frame(self.root, bg=theme_colors["base"], name="!title_frame")
         # Pack it at the top, before other widgets
         title_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=5)
+        self.title_frame = title_frame  # Kept for re-coloring on theme switch
 
         try:
             if getattr(sys, "frozen", False):
@@ -95,14 +182,14 @@ class CodeStorageApp:
         except Exception as e:
             print(f"Logo image not found or error loading: {e}")
 
-        title_label = tk.Label(
+        self.title_label = tk.Label(
             title_frame,
             text="SnipStudio",
             font=("Helvetica", 16, "bold"),
             fg=theme_colors["accent_blue"],
             bg=theme_colors["base"],
         )
-        title_label.pack(side=tk.LEFT)
+        self.title_label.pack(side=tk.LEFT)
 
     def go_to_snippet_by_index(self, index):
         if self.listbox.size() > index:
@@ -116,7 +203,7 @@ class CodeStorageApp:
         shortcuts_window = tk.Toplevel(self.root)
         shortcuts_window.title("Keyboard Shortcuts")
         shortcuts_window.geometry(
-            "300x250"
+            "300x270"
         )  # Increased height to accommodate new shortcut
         shortcuts_window.configure(bg=theme_colors["surface0"])
         # Make the shortcuts window transient to the main window
@@ -141,6 +228,7 @@ class CodeStorageApp:
         - Ctrl+C: Copy Snippet
         - Ctrl+T: Clear Fields
         - :<number>: Go to Snippet <number> (in listbox)
+        - :<text>: Open the best title/category match
         - Ctrl+H: Show this help
         - Ctrl+<0-9>: Go to Snippet by index (0-9)
         - j/k: Move selection down/up (in listbox)
@@ -154,92 +242,349 @@ class CodeStorageApp:
         # Ensure focus is set to the text widget initially if needed, though grab_set might handle it
         shortcuts_text.focus_set()
 
-    def create_settings_table(self):
-        cursor = self.conn.cursor()
-        cursor.execute(
-            """CREATE TABLE IF NOT EXISTS settings
-                          (key TEXT PRIMARY KEY,
-                           value TEXT)"""
-        )
-        self.conn.commit()
-
     def save_last_used_snippet(self, snippet_id):
         if snippet_id:
-            try:
-                cursor = self.conn.cursor()
-                cursor.execute(
-                    "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
-                    ("last_used_snippet", str(snippet_id)),
-                )
-                self.conn.commit()
-            except sqlite3.Error as e:
-                print(f"Database error saving last snippet: {e}")
-
-    def load_last_used_snippet(self):
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute(
-                "SELECT value FROM settings WHERE key=?", ("last_used_snippet",)
+            self.settings.set("last_used_snippet", str(snippet_id))
+            self.schedule_settings_flush()
+
+    def schedule_settings_flush(self):
+        """Writes buffered settings on a timer, once Tk is idle, in one transaction."""
+        if self.settings_flush_id is None:
+            self.settings_flush_id = self.root.after(
+                self.SETTINGS_FLUSH_MS,
+                lambda: self.root.after_idle(self.flush_settings),
             )
-            result = cursor.fetchone()
 
-            if result:
+    def flush_settings(self):
+        """Hands buffered settings changes to the DB worker."""
+        if self.settings_flush_id is not None:
+            self.root.after_cancel(self.settings_flush_id)
+            self.settings_flush_id = None
+        pending = self.settings.take_pending()
+        if pending:
+            self.run_db("settings", SnippetStore.write_settings, pending)
+
+    def restore_after_startup(self, last_snippet_id):
+        """Runs once the list is shown: selects the last used snippet in it, then
+        reports the startup profile."""
+        self.profiler.stop("list")
+        if last_snippet_id is None:
+            self.finish_startup()
+            return
+
+        def restore(index):
+            if index is None:
+                print(f"Last used snippet ID {last_snippet_id} not found in listbox.")
+            elif not self.listbox.curselection():  # The user may have picked one
                 try:
-                    last_snippet_id = int(result[0])  # Ensure the ID is an integer
-                    # Check if snippet ID exists before trying to select title
-                    cursor.execute(
-                        "SELECT title FROM snippets WHERE id=?", (last_snippet_id,)
-                    )
-                    title_result = cursor.fetchone()
-
-                    if title_result:
-                        title = title_result[0]
-                        # Find the title in the listbox
-                        listbox_items = self.listbox.get(0, tk.END)
-                        if title in listbox_items:
-                            index = listbox_items.index(title)
-                            self.listbox.selection_set(index)
-                            self.listbox.see(index)
-                            self.show_snippet_by_id(
-                                last_snippet_id
-                            )  # Use the dedicated method
-                        else:
-                            print(
-                                f"Last used snippet title '{title}' not found in listbox."
-                            )
-                    else:
-                        print(
-                            f"Last used snippet ID {last_snippet_id} not found in database."
-                        )
-                        # Optionally clear the setting if the snippet is gone
-                        # cursor.execute("DELETE FROM settings WHERE key=?", ("last_used_snippet",))
-                        # self.conn.commit()
-                except ValueError:
-                    print(
-                        f"Invalid last used snippet ID found in settings: {result[0]}"
-                    )
+                    self.listbox.selection_set(index)
+                    self.listbox.see(index)
                 except tk.TclError as e:
                     print(f"Error interacting with listbox during snippet load: {e}")
-        except sqlite3.Error as e:
-            print(f"Database error loading last snippet: {e}")
+            self.finish_startup()
+
+        self.locate_snippet(last_snippet_id, restore)
+
+    def finish_startup(self):
+        self.run_db("fuzzy_index", FuzzyIndex.load, callback=self.set_fuzzy_index)
+        self.classify_languages()
+        self.hash_unhashed()
+        if self.profiler.enabled:
+            self.profiler.print_report()
+        if self.exit_after_startup:
+            self.root.after_idle(self.on_closing)
+
+    def classify_languages(self):
+        """Detects the language of unclassified snippets, a batch per DB request.
+
+        Snippets saved in the app are classified as they are written; this
+        catches up on older and imported ones without holding up other work.
+        """
+
+        def classified(count):
+            if count == self.BACKFILL_BATCH:
+                self.classify_languages()
+
+        self.run_db(
+            "classify",
+            SnippetStore.classify_pending,
+            self.BACKFILL_BATCH,
+            callback=classified,
+        )
+
+    def hash_unhashed(self):
+        """Hashes snippets written by other programs, a batch per DB request.
+
+        Until they are, saving doesn't warn about duplicates of them.
+        """
+
+        def hashed(count):
+            if count == self.BACKFILL_BATCH:
+                self.hash_unhashed()
+
+        self.run_db(
+            "hash",
+            SnippetStore.hash_pending,
+            self.BACKFILL_BATCH,
+            callback=hashed,
+        )
+
+    def last_used_snippet_id(self):
+        """Returns the id of the last used snippet from settings, or None."""
+        value = self.settings.get("last_used_snippet")
+        if not value:
+            return None
+        try:
+            return int(value)  # Ensure the ID is an integer
+        except ValueError:
+            print(f"Invalid last used snippet ID found in settings: {value}")
+            return None
+
+    def locate_snippet(self, snippet_id, callback):
+        """Finds the listbox index of a snippet id and passes it (or None) to callback.
+
+        Rows already loaded are found directly. On a paged list the position is
+        counted in the database, since the row may not have been fetched yet.
+        """
+        index = self.listbox.find_row(snippet_id)
+        if index is not None or not self.listbox.paged:
+            callback(index)
+            return
+
+        generation = self.listbox.generation
 
-    def show_snippet_by_id(self, snippet_id):
+        def located(position):
+            if generation == self.listbox.generation:
+                callback(position)
+
+        self.run_db("locate", SnippetStore.row_position, snippet_id, callback=located)
+
+    def show_snippet_by_id(self, snippet_id, on_done=None):
         """Show snippet details by ID, ensuring proper type handling."""
+        self.snippet_request += 1
+        request = self.snippet_request
+
+        def show(row):
+            self.fill_editor(row, request)
+            if on_done:
+                on_done()
+
+        self.run_db("show_snippet", SnippetStore.get, snippet_id, callback=show)
+
+    def fill_editor(self, row, request, restored=False):
+        """Shows a loaded snippet row, unless a newer snippet was requested meanwhile.
+
+        Big snippets are inserted EDITOR_CHUNK_CHARS at a time between events,
+        so the window keeps responding, and the editor stays disabled until
+        the last chunk is in. Very big ones stay read-only and unwrapped.
+        A restored row is an old version, an unsaved edit of what is stored.
+        """
+        if not row or request != self.snippet_request:
+            return False
+        self.autosave()  # The edits of the snippet being replaced go first
+        self.editor_snippet_id = None
+        self.cancel_editor_load()
+        self.highlighter.leave()  # Before the category changes under it
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT * FROM snippets WHERE id=?", (snippet_id,))
-            row = cursor.fetchone()
-            cursor.close()  # Close cursor immediately after use
-
-            if row:
-                self.title_var.set(row[1])
-                self.category_var.set(row[2] if row[2] else "")
+            self.title_var.set(row[1])
+            self.category_var.set(row[2] if row[2] else "")
+            code = row[3]
+            # Check if editor content is already the same to avoid unnecessary updates/flicker
+            current_code = self.code_editor.get("1.0", tk.END).strip()
+            if current_code != code:
+                self.set_editor_read_only(len(code) > self.READ_ONLY_CHARS)
+                self.code_editor.configure(state=tk.NORMAL)
                 self.code_editor.delete("1.0", tk.END)
-                self.code_editor.insert("1.0", row[3])
-        except sqlite3.Error as e:
-            print(f"Database error showing snippet by ID {snippet_id}: {e}")
+                self.insert_editor_chunk(code, 0, request, row, restored)
+            else:
+                self.editor_loaded(row, restored)
         except tk.TclError as e:
-            print(f"Error updating UI for snippet ID {snippet_id}: {e}")
+            print(f"Error updating UI for snippet ID {row[0]}: {e}")
+        return True
+
+    def insert_editor_chunk(self, code, start, request, row, restored):
+        if request != self.snippet_request:
+            return  # Another snippet took the editor over
+        end = start + self.EDITOR_CHUNK_CHARS
+        self.code_editor.configure(state=tk.NORMAL)
+        self.code_editor.insert(tk.END, code[start:end])
+        if end < len(code):
+            self.code_editor.configure(state=tk.DISABLED)
+            # A timer, not after_idle, so input and redraws get in between
+            self.editor_load_id = self.root.after(
+                1, self.insert_editor_chunk, code, end, request, row, restored
+            )
+            return
+        self.editor_load_id = None
+        if self.editor_read_only:
+            self.code_editor.configure(state=tk.DISABLED)
+        self.code_editor.mark_set(tk.INSERT, "1.0")
+        self.code_editor.see("1.0")
+        self.editor_loaded(row, restored)
+
+    def editor_loaded(self, row, restored=False):
+        """Starts tracking edits once the editor holds all of row's code."""
+        self.code_editor.edit_modified(False)  # Filling it wasn't an edit
+        self.editor_snippet_id = row.id
+        if restored:
+            # The stored version is still the saved one; autosave writes this
+            self.mark_editor_dirty()
+        else:
+            self.mark_editor_saved(row)
+        self.highlighter.load(row.id, row.category, row.language)
+
+    def mark_editor_saved(self, snippet):
+        """Records snippet as what is stored for the editor's snippet."""
+        self.editor_saved_hash = hash((snippet.title, snippet.category, snippet.code))
+        self.editor_dirty = False
+
+    def on_editor_modified(self, event=None):
+        """Notices edits to the code through the Text modified flag."""
+        if not self.code_editor.edit_modified():
+            return  # The event for resetting the flag below
+        self.code_editor.edit_modified(False)
+        self.highlighter.edited()
+        self.mark_editor_dirty()
+
+    def mark_editor_dirty(self):
+        """Schedules an autosave of the snippet in the editor.
+
+        Edits made before the autosave runs are written with it, so the
+        snippet is written at most once every AUTOSAVE_MS however fast the
+        typing. Changes made while a snippet loads are the loading itself.
+        """
+        if self.editor_snippet_id is None:
+            return  # Loading, or a new snippet that only Save creates
+        self.editor_dirty = True
+        if self.autosave_id is None:
+            self.autosave_id = self.root.after(self.AUTOSAVE_MS, self.autosave)
+
+    def autosave(self):
+        """Writes the editor's unsaved edits to their snippet now, if there are any.
+
+        Skipped when the fields hash the same as when last loaded or saved,
+        e.g. after typing and undoing.
+        """
+        if self.autosave_id is not None:
+            self.root.after_cancel(self.autosave_id)
+            self.autosave_id = None
+        if not self.editor_dirty or self.editor_snippet_id is None:
+            return
+        try:
+            title = self.title_var.get().strip()
+            category = self.category_var.get().strip()
+            code = self.code_editor.get("1.0", tk.END).strip()
+        except tk.TclError as e:
+            print(f"Error reading the editor for autosave: {e}")
+            return
+        if not title or not code:
+            return  # Stays dirty until it can be saved
+        self.editor_dirty = False
+        fields_hash = hash((title, category, code))
+        if fields_hash == self.editor_saved_hash:
+            return
+        self.editor_saved_hash = fields_hash
+        snippet = Snippet(self.editor_snippet_id, title, category, code)
+        self.run_db(
+            "autosave",
+            self.write_snippet,
+            snippet,
+            True,
+            callback=lambda result: self.after_autosave(snippet, *result),
+            error_message="Failed to autosave snippet",
+        )
+
+    def after_autosave(self, snippet, written_id, listed):
+        self.result_cache.invalidate()
+        if written_id is None:
+            # Deleted before the autosave got to it (cli.py rm, or a Delete
+            # still on its way); a later Save stores the code as a new one
+            if self.editor_snippet_id == snippet.id:
+                self.editor_snippet_id = None
+                self.editor_dirty = False
+            return
+        if listed == (snippet.title, snippet.category):
+            return  # Only a changed title or category shows in the list
+        if self.fuzzy_index is not None:
+            self.fuzzy_index.upsert(snippet.id, snippet.title, snippet.category)
+            self.root.after_idle(self.fuzzy_index.prepare)
+        self.count_category(listed and listed[1], snippet.category)
+        if not self.relist_snippet(snippet, listed):
+            self.populate_listbox(self.search_var.get(), select_first=False)
+
+    def cancel_editor_load(self):
+        if self.editor_load_id is not None:
+            self.root.after_cancel(self.editor_load_id)
+            self.editor_load_id = None
+
+    def set_editor_read_only(self, read_only):
+        """Switches the editor between normal and the read-only view for huge code."""
+        self.editor_read_only = read_only
+        if read_only:
+            # Wrapping very long text is what makes Tk's text widget slow
+            self.code_editor.configure(wrap=tk.NONE)
+            self.large_notice.pack(fill=tk.X, pady=(0, 2), before=self.code_editor)
+        else:
+            self.code_editor.configure(wrap=tk.WORD, state=tk.NORMAL)
+            self.large_notice.pack_forget()
+
+    def edit_large_snippet(self):
+        """Makes a huge snippet shown read-only editable, still unwrapped."""
+        self.editor_read_only = False
+        self.large_notice.pack_forget()
+        if self.editor_load_id is None:
+            self.code_editor.configure(state=tk.NORMAL)
+
+    def editor_ready(self, action):
+        """True when the editor holds all of the snippet's code, else says so."""
+        if self.editor_load_id is None:
+            return True
+        messagebox.showinfo(
+            "Still Loading",
+            f"The snippet is still loading, {action} it in a moment.",
+            parent=self.root,
+        )
+        return False
+
+    def run_db(self, operation, func, *args, callback=None, error_message=None):
+        """Runs func(store, *args) on the DB worker and passes the result to callback.
+
+        The callback runs later on the Tk thread. Database errors are shown with
+        error_message when given, and only logged otherwise.
+        """
+        future = self.db.submit(operation, func, *args)
+        self.pending_db_calls.append((future, callback, error_message))
+        if self.db_poll_id is None:
+            self.db_poll_id = self.root.after(self.DB_POLL_MS, self.poll_db_results)
+
+    def poll_db_results(self):
+        """Delivers finished DB worker results to their callbacks, in submission order."""
+        self.db_poll_id = None
+        calls, self.pending_db_calls = self.pending_db_calls, []
+        for i, (future, callback, error_message) in enumerate(calls):
+            if not future.done():
+                # The worker runs requests in order, so everything after this is pending too
+                self.pending_db_calls[:0] = calls[i:]
+                break
+            try:
+                result = future.result()
+            except Exception as e:  # One failed request mustn't hold up the rest
+                title = "Database Error" if isinstance(e, sqlite3.Error) else "Error"
+                if error_message:
+                    messagebox.showerror(
+                        title, f"{error_message}: {e}", parent=self.root
+                    )
+                else:
+                    print(f"{title}: {e!r}")
+                continue
+            if callback:
+                try:
+                    callback(result)
+                except Exception:
+                    traceback.print_exc()
+
+        if self.pending_db_calls and self.db_poll_id is None:
+            self.db_poll_id = self.root.after(self.DB_POLL_MS, self.poll_db_results)
 
     def on_closing(self):
         """Handles application closing cleanly."""
@@ -249,10 +594,18 @@ class CodeStorageApp:
 
         # Save the theme that was active when closing
         self.save_last_used_theme(self.current_theme)
+        self.flush_settings()
+
+        # Let queued saves finish before the connections go away
+        self.autosave()
+        self.db.close()
+        if self.profiler.enabled:  # Only with --profile-startup
+            print(self.db.histogram.summary())
+            print(self.result_cache.summary())
 
-        if hasattr(self, "conn"):
+        if self.store:
             try:
-                self.conn.close()
+                self.store.close()
             except sqlite3.Error as e:
                 print(f"Error closing database on exit: {e}")
 
@@ -264,213 +617,31 @@ class CodeStorageApp:
             print(
                 f"Warning: Theme '{self.current_theme}' not found. Falling back to default."
             )
-            self.current_theme = "catppuccin"  # Fallback to a known theme
+            self.current_theme = "catppuccin_mocha"  # Fallback to a known theme
 
-        theme_colors = self.themes[self.current_theme]
-        self.root.configure(bg=theme_colors["base"])
+        spec = self.theme_specs[self.current_theme]
+        self.root.configure(bg=spec["colors"]["base"])
 
-        # Define or update the custom ttk theme
+        # Each color theme gets its own ttk theme, so switching back to one
+        # that was already built is a single theme_use call
         style = ttk.Style()
-        try:
-            # Check if theme exists to avoid errors on re-configuration
-            style.theme_use("custom_theme")
-        except tk.TclError:
-            # Create the theme if it doesn't exist
-            style.theme_create(
-                "custom_theme",
-                parent="alt",
-                settings={
-                    "TFrame": {"configure": {"background": theme_colors["base"]}},
-                    "TLabel": {
-                        "configure": {
-                            "background": theme_colors["base"],
-                            "foreground": theme_colors["text"],
-                        }
-                    },
-                    "TButton": {
-                        "configure": {
-                            "background": theme_colors["surface1"],
-                            "foreground": theme_colors["text"],
-                            "padding": 6,
-                            "relief": "flat",
-                            "borderwidth": 0,  # Ensure flat look
-                            "font": ("Helvetica", 9),  # Consistent font
-                        },
-                        "map": {
-                            # Use surface0 for hover, base for active press
-                            "background": [
-                                ("active", theme_colors["base"]),
-                                ("hover", theme_colors["surface0"]),
-                            ],
-                            "foreground": [
-                                ("active", theme_colors["text"])
-                            ],  # Keep text color on press
-                        },
-                    },
-                    "TEntry": {
-                        "configure": {
-                            "foreground": theme_colors["text"],
-                            "fieldbackground": theme_colors["surface0"],
-                            "insertcolor": theme_colors["text"],
-                            "borderwidth": 1,  # Keep a subtle border
-                            "relief": "flat",  # Use flat relief
-                        },
-                        "map": {
-                            # Change border color on focus
-                            "bordercolor": [("focus", theme_colors["accent_blue"])],
-                            "relief": [
-                                ("focus", "solid")
-                            ],  # Make border visible on focus
-                        },
-                    },
-                    "TCombobox": {
-                        "configure": {
-                            "foreground": theme_colors["text"],
-                            "fieldbackground": theme_colors["surface0"],
-                            "background": theme_colors[
-                                "surface0"
-                            ],  # Background of the entry part
-                            "arrowcolor": theme_colors["text"],
-                            "selectbackground": theme_colors[
-                                "surface0"
-                            ],  # Keep selection same as field bg
-                            "selectforeground": theme_colors["text"],
-                            "borderwidth": 1,
-                            "relief": "flat",
-                        },
-                        "map": {
-                            "background": [("readonly", theme_colors["surface0"])],
-                            # Change border color on focus like TEntry
-                            "bordercolor": [("focus", theme_colors["accent_blue"])],
-                            "relief": [("focus", "solid")],
-                        },
-                    },
-                    "Vertical.TScrollbar": {  # Style vertical scrollbars
-                        "configure": {
-                            "background": theme_colors["surface0"],
-                            "troughcolor": theme_colors["base"],
-                            "bordercolor": theme_colors["surface0"],
-                            "arrowcolor": theme_colors["text"],
-                            "relief": "flat",
-                        },
-                        "map": {"background": [("active", theme_colors["surface1"])]},
-                    },
-                },
-            )
-            style.theme_use("custom_theme")
-
-        # Re-apply settings if theme already exists (useful if configure_theme is called again)
-        style.configure("TFrame", background=theme_colors["base"])
-        style.configure(
-            "TLabel", background=theme_colors["base"], foreground=theme_colors["text"]
-        )
-        style.configure(
-            "TButton",
-            background=theme_colors["surface1"],
-            foreground=theme_colors["text"],
-        )
-        style.map(
-            "TButton",
-            background=[
-                ("active", theme_colors["base"]),
-                ("hover", theme_colors["surface0"]),
-            ],
-        )
-        style.configure(
-            "TEntry",
-            foreground=theme_colors["text"],
-            fieldbackground=theme_colors["surface0"],
-            insertcolor=theme_colors["text"],
-        )
-        style.map(
-            "TEntry",
-            bordercolor=[("focus", theme_colors["accent_blue"])],
-            relief=[("focus", "solid")],
-        )
-        style.configure(
-            "TCombobox",
-            foreground=theme_colors["text"],
-            fieldbackground=theme_colors["surface0"],
-            background=theme_colors["surface0"],
-            arrowcolor=theme_colors["text"],
-        )
-        style.map(
-            "TCombobox",
-            bordercolor=[("focus", theme_colors["accent_blue"])],
-            relief=[("focus", "solid")],
-        )
-        style.configure(
-            "Vertical.TScrollbar",
-            background=theme_colors["surface0"],
-            troughcolor=theme_colors["base"],
-            bordercolor=theme_colors["surface0"],
-            arrowcolor=theme_colors["text"],
-        )
-        style.map(
-            "Vertical.TScrollbar", background=[("active", theme_colors["surface1"])]
-        )
+        style_name = f"snipstudio_{self.current_theme}"
+        if style_name not in style.theme_names():
+            style.theme_create(style_name, parent="alt", settings=spec["ttk"])
+        style.theme_use(style_name)
 
         # Configure Combobox dropdown list colors (using option_add for listbox part)
         # These need to be set before the Combobox is created ideally, but setting them here works too.
-        self.root.option_add(
-            "*TCombobox*Listbox.background", theme_colors["surface0"], priority=80
-        )
-        self.root.option_add(
-            "*TCombobox*Listbox.foreground", theme_colors["text"], priority=80
-        )
-        self.root.option_add(
-            "*TCombobox*Listbox.selectBackground",
-            theme_colors["accent_blue"],
-            priority=80,
-        )
-        self.root.option_add(
-            "*TCombobox*Listbox.selectForeground", theme_colors["base"], priority=80
-        )
-        self.root.option_add(
-            "*TCombobox*Listbox.font", ("Helvetica", 9), priority=80
-        )  # Consistent font
-        self.root.option_add("*TCombobox*Listbox.relief", "flat", priority=80)
-        self.root.option_add("*TCombobox*Listbox.borderwidth", 0, priority=80)
-        self.root.option_add("*TCombobox*Listbox.highlightthickness", 0, priority=80)
+        for pattern, value in spec["options"]:
+            self.root.option_add(pattern, value, priority=80)
 
     def switch_theme(self, theme_name):
-        """Saves the selected theme and restarts the application to apply it."""
+        """Applies the selected theme in place and remembers it for the next start."""
         if theme_name in self.themes and theme_name != self.current_theme:
-            if messagebox.askyesno(
-                "Restart Required",
-                "Changing the theme requires restarting the application. Restart now?",
-            ):
-                # Save the new theme choice
-                self.save_last_used_theme(theme_name)
-
-                # Perform necessary cleanup before restart
-                snippet_id = self.current_snippet_id()
-                if snippet_id:
-                    self.save_last_used_snippet(snippet_id)
-                if hasattr(self, "conn"):
-                    try:
-                        self.conn.close()
-                    except sqlite3.Error as e:
-                        print(
-                            f"Error closing database before restart: {e}"
-                        )  # Log error but continue
-
-                # Restart the application
-                try:
-                    python = sys.executable
-                    # Ensure sys.argv[0] is the script path, handle potential issues
-                    script_path = os.path.abspath(sys.argv[0])
-                    os.execv(python, [python, script_path] + sys.argv[1:])
-                except Exception as e:
-                    messagebox.showerror(
-                        "Restart Error",
-                        f"Failed to restart the application: {e}\nPlease restart manually.",
-                    )
-                    # Fallback: destroy the current window if restart fails
-                    self.root.destroy()
-            else:
-                # User cancelled restart, revert the combobox selection back to the current theme
-                self.theme_var.set(self.current_theme)
+            self.current_theme = theme_name
+            self.configure_theme()
+            self.apply_widget_colors()
+            self.save_last_used_theme(theme_name)
         elif theme_name == self.current_theme:
             # If the selected theme is already the current one, do nothing.
             pass
@@ -479,30 +650,66 @@ class CodeStorageApp:
             messagebox.showwarning("Theme Error", f"Theme '{theme_name}' not found.")
             self.theme_var.set(self.current_theme)  # Reset combobox
 
-    # refresh_ui_with_theme is no longer needed as theme changes require restart
-    # def refresh_ui_with_theme(self):
-    #     ...
+    def apply_widget_colors(self):
+        """Re-colors the plain tk widgets, which ttk styles don't reach.
+
+        Widgets are updated in place, so scroll position, selection and
+        unsaved edits survive a theme switch.
+        """
+        theme_colors = self.themes[self.current_theme]
+        self.title_frame.configure(bg=theme_colors["base"])
+        for label in self.title_frame.winfo_children():
+            label.configure(bg=theme_colors["base"])
+        self.title_label.configure(fg=theme_colors["accent_blue"])
 
-    def create_table(self):
+        self.listbox.configure(
+            bg=theme_colors["surface0"],
+            fg=theme_colors["text"],
+            selectbackground=theme_colors["accent_blue"],
+            selectforeground=theme_colors["base"],
+            highlightcolor=theme_colors["accent_blue"],
+            highlightbackground=theme_colors["surface0"],
+        )
+        self.code_editor.configure(
+            bg=theme_colors["surface0"],
+            fg=theme_colors["text"],
+            insertbackground=theme_colors["text"],
+            selectbackground=theme_colors["accent_blue"],
+            selectforeground=theme_colors["base"],
+            highlightcolor=theme_colors["accent_blue"],
+            highlightbackground=theme_colors["surface0"],
+        )
+        self.highlighter.configure_tags(theme_colors)
+
+        # Dropdown lists that were already opened keep the colors they were
+        # created with, option_add only affects new ones
+        for combo in (self.theme_combo, self.category_combo):
+            try:
+                popdown = combo.tk.call("ttk::combobox::PopdownWindow", combo)
+                combo.tk.call(
+                    f"{popdown}.f.l",
+                    "configure",
+                    "-background",
+                    theme_colors["surface0"],
+                    "-foreground",
+                    theme_colors["text"],
+                    "-selectbackground",
+                    theme_colors["accent_blue"],
+                    "-selectforeground",
+                    theme_colors["base"],
+                )
+            except tk.TclError as e:
+                print(f"Error re-coloring combobox dropdown: {e}")
+
+    def setup_database(self):
+        """Opens the Tk thread's store, migrating the schema to the current version."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(
-                """CREATE TABLE IF NOT EXISTS snippets
-                              (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                               title TEXT NOT NULL,
-                               category TEXT,
-                               code TEXT NOT NULL)"""
-            )
-            # Add index for faster title lookups if it doesn't exist
-            cursor.execute(
-                "CREATE INDEX IF NOT EXISTS idx_snippet_title ON snippets (title)"
-            )
-            self.conn.commit()
+            self.store = SnippetStore(DB_PATH)
+            self.fts_tokenizer = self.store.tokenizer
         except sqlite3.Error as e:
-            messagebox.showerror(
-                "Database Error", f"Failed to create snippets table: {e}"
-            )
-            self.root.destroy()  # Exit if table creation fails
+            messagebox.showerror("Database Error", f"Failed to set up database: {e}")
+            self.root.destroy()  # Exit if the schema can't be created
+            sys.exit(1)
 
     def focus_input(self, widget):
         widget.focus_set()
@@ -538,15 +745,15 @@ class CodeStorageApp:
         theme_label = ttk.Label(top_left_frame, text="Theme:")
         theme_label.grid(row=0, column=2, sticky=tk.W, padx=(0, 5))
 
-        theme_combo = ttk.Combobox(
+        self.theme_combo = ttk.Combobox(
             top_left_frame,
             textvariable=self.theme_var,
             values=list(self.themes.keys()),
             width=12,  # Adjust width
             state="readonly",  # Prevent typing custom themes
         )
-        theme_combo.grid(row=0, column=3, sticky=tk.E)
-        theme_combo.bind(
+        self.theme_combo.grid(row=0, column=3, sticky=tk.E)
+        self.theme_combo.bind(
             "<<ComboboxSelected>>", lambda e: self.switch_theme(self.theme_var.get())
         )
 
@@ -561,8 +768,10 @@ class CodeStorageApp:
 
         # Snippets Label removed, implied by the listbox
 
-        self.listbox = tk.Listbox(
+        # Only the visible rows are materialized, pages load as the list scrolls
+        self.listbox = VirtualListbox(
             listbox_frame,
+            page_loader=self.load_listbox_page,
             width=25,  # Keep width reasonable
             bg=theme_colors["surface0"],
             fg=theme_colors["text"],
@@ -623,8 +832,12 @@ class CodeStorageApp:
             row=1, column=0, sticky=tk.W, padx=(0, 5), pady=(0, 5)
         )
         self.category_var = tk.StringVar()
-        self.category_combo = ttk.Combobox(form_frame, textvariable=self.category_var)
-        # Populate values later in populate_categories
+        self.category_combo = ttk.Combobox(
+            form_frame,
+            textvariable=self.category_var,
+            postcommand=self.load_categories_on_open,
+        )
+        # Values are queried the first time the dropdown opens
         self.category_combo.grid(row=1, column=1, sticky=tk.EW, pady=(0, 5))
 
         form_frame.columnconfigure(1, weight=1)  # Allow entry/combo to expand
@@ -653,6 +866,27 @@ class CodeStorageApp:
         self.code_editor.pack(
             fill=tk.BOTH, expand=True, pady=(0, 10)
         )  # Pad below editor
+        # Colors the visible code, lexed by the snippet's category as language
+        self.highlighter = Highlighter(self.code_editor, self.code_editor.vbar)
+        self.highlighter.configure_tags(theme_colors)
+        self.category_var.trace_add(
+            "write",
+            lambda *args: self.highlighter.set_language(self.category_var.get()),
+        )
+        # Edits to any field are autosaved
+        self.code_editor.bind("<<Modified>>", self.on_editor_modified)
+        self.title_var.trace_add("write", lambda *args: self.mark_editor_dirty())
+        self.category_var.trace_add("write", lambda *args: self.mark_editor_dirty())
+        self.editor_read_only = False
+
+        # Shown above the editor while a huge snippet is open read-only
+        self.large_notice = ttk.Frame(details_frame)
+        ttk.Label(
+            self.large_notice, text="Large snippet, opened read-only for speed."
+        ).pack(side=tk.LEFT)
+        ttk.Button(
+            self.large_notice, text="Edit Anyway", command=self.edit_large_snippet
+        ).pack(side=tk.RIGHT)
 
         # Buttons Frame
         button_frame = ttk.Frame(details_frame, name="!button_frame")
@@ -680,6 +914,11 @@ class CodeStorageApp:
         copy_btn.pack(side=tk.LEFT, padx=5)
         self.root.bind("<Control-c>", lambda event: self.copy_snippet())
 
+        history_btn = ttk.Button(
+            button_frame, text="History", command=self.show_history
+        )
+        history_btn.pack(side=tk.LEFT, padx=5)
+
         # Move shortcuts button to the right
         shortcuts_btn = ttk.Button(
             button_frame,
@@ -688,6 +927,30 @@ class CodeStorageApp:
         )
         shortcuts_btn.pack(side=tk.RIGHT, padx=5)
 
+        duplicates_btn = ttk.Button(
+            button_frame, text="Find Duplicates", command=self.find_duplicates
+        )
+        duplicates_btn.pack(side=tk.RIGHT, padx=5)
+        export_btn = ttk.Button(
+            button_frame, text="Export...", command=self.export_snippets
+        )
+        export_btn.pack(side=tk.RIGHT, padx=5)
+        import_folder_btn = ttk.Button(
+            button_frame,
+            text="Import Folder...",
+            command=lambda: self.import_snippets(folder=True),
+        )
+        import_folder_btn.pack(side=tk.RIGHT, padx=5)
+        import_btn = ttk.Button(
+            button_frame, text="Import...", command=self.import_snippets
+        )
+        import_btn.pack(side=tk.RIGHT, padx=5)
+        # Disabled, and a progress bar shown next to them, while a job runs
+        self.job_buttons = (import_btn, import_folder_btn, export_btn, duplicates_btn)
+        self.job_progress = ttk.Progressbar(
+            button_frame, orient=tk.HORIZONTAL, length=160, maximum=1.0
+        )
+
         # Vim-like command entry (initially hidden, placed at bottom of main_frame)
         self.vim_command_entry = ttk.Entry(main_frame, name="!vim_command_entry")
         # Don't pack initially, use place or pack when needed
@@ -696,14 +959,9 @@ class CodeStorageApp:
 
         self.vim_command_entry.bind("<FocusOut>", self.hide_vim_command)
         # Alt-v binding might conflict, consider changing or removing if problematic
-        # self.root.bind("<Alt-v>", lambda event: self.focus_input(self.vim_command_entry))
-
-
-
-        self.vim_command_entry.bind("<FocusOut>", self.hide_vim_command) # Hide if focus is lost
-        self.root.bind('<Alt-v>',lambda event: self.focus_input(vim_command_entry)))
-
-
+        self.root.bind(
+            "<Alt-v>", lambda event: self.focus_input(self.vim_command_entry)
+        )
 
     def initiate_vim_command(self, event):
         """Shows and focuses the Vim-like command entry at the bottom."""
@@ -754,8 +1012,11 @@ class CodeStorageApp:
 
         if command.startswith(":") and len(command) > 1:
             try:
-                snippet_number = int(command[1:])
-                self.go_to_snippet_by_number(snippet_number)
+                argument = command[1:].strip()
+                if argument.isdigit():
+                    self.go_to_snippet_by_number(int(argument))
+                else:
+                    self.go_to_best_match(argument)
             except ValueError:
                 messagebox.showerror(
                     "Command Error",
@@ -774,6 +1035,29 @@ class CodeStorageApp:
             )
         return "break"  # Prevent further processing
 
+    def go_to_best_match(self, text):
+        """Opens the best fuzzy title/category match, selecting it if it is listed."""
+        matches = self.fuzzy_index.search(text, 1) if self.fuzzy_index else []
+        if not matches:
+            messagebox.showerror(
+                "Navigation Error", f"No snippet matches '{text}'.", parent=self.root
+            )
+            return
+        self.open_snippet(matches[0][0])
+
+    def open_snippet(self, snippet_id):
+        """Shows a snippet by id, selecting it in the list if it is listed."""
+
+        def select(index):
+            if index is not None:
+                self.listbox.selection_clear(0, tk.END)
+                self.listbox.selection_set(index)
+                self.listbox.see(index)
+
+        self.show_snippet_by_id(snippet_id)
+        self.locate_snippet(snippet_id, select)
+        self.save_last_used_snippet(snippet_id)
+
     def hide_vim_command(self, event=None):
         """Hides the Vim-like command entry."""
         self.vim_command_entry.place_forget()  # Remove from layout
@@ -795,76 +1079,268 @@ class CodeStorageApp:
                 parent=self.root,
             )
 
-    def populate_listbox(self, search_query=None):
-        """Populates the listbox with snippet titles, optionally filtered by search."""
+    def populate_listbox(
+        self,
+        search_query=None,
+        candidate_ids=None,
+        generation=None,
+        on_done=None,
+        select_first=True,
+    ):
+        """Populates the listbox with snippet titles, optionally filtered by search.
+
+        When candidate_ids is given, only those snippets are checked (in their
+        current order) instead of searching the whole table. Results for a
+        generation older than the latest scheduled search are dropped. The
+        query runs on the DB worker; on_done is called once the rows are shown.
+        With select_first, an unfiltered list without a selection shows its
+        first snippet.
+        """
+        cache_key = self.last_search_query = search_query or ""
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            self.apply_listbox_rows(
+                cached, search_query, generation, on_done, select_first
+            )
+            return
+
+        cache_generation = self.result_cache.generation
+
+        def show(result):
+            if result[0] is not None:  # The unfiltered list is cached once counted
+                self.result_cache.put(cache_key, result, cache_generation)
+            self.apply_listbox_rows(
+                result, search_query, generation, on_done, select_first
+            )
+
+        self.run_db(
+            "search",
+            self.query_listbox_rows,
+            search_query,
+            candidate_ids,
+            callback=show,
+            error_message="Failed to populate snippets",
+        )
+
+    def query_listbox_rows(self, store, search_query, candidate_ids):
+        """Worker side: returns (total, rows) for the listbox, rows in display order.
+
+        Searches return every match. The unfiltered list only returns its first
+        page, with a total of None when more rows follow: counting them scans
+        the whole title index, so that is left to a later count. The rest is
+        fetched by load_listbox_page as the user scrolls.
+        """
+        if not search_query and candidate_ids is None:
+            first_page = store.list_page(None, 0, VirtualListbox.PAGE_SIZE)
+            if len(first_page) < VirtualListbox.PAGE_SIZE:
+                return len(first_page), first_page
+            return None, first_page
+        rows = store.search(search_query, candidate_ids)
+        return len(rows), rows
+
+    def load_listbox_page(self, after_key, offset, limit, callback):
+        """Page loader for the virtual listbox, runs the page query on the DB worker."""
+        self.run_db(
+            "list_page",
+            SnippetStore.list_page,
+            after_key,
+            offset,
+            limit,
+            callback=callback,
+        )
+
+    def apply_listbox_rows(
+        self, result, search_query, generation, on_done, select_first=True
+    ):
+        """Tk side: replaces the listbox contents with freshly queried rows.
+
+        A first page without a total is shown straight away and sized once the
+        count comes back; the selection is restored after that.
+        """
+        if generation is not None and generation != self.search_generation:
+            return  # A newer search was scheduled, these results are stale
+        total, rows = result
+        if search_query:
+            self.search_result_ids = [row[0] for row in rows]
+            rows = self.merge_fuzzy_rows(search_query, rows)
+            total = len(rows)
+        else:
+            self.search_result_ids = None
+        selected_id = None
         try:
             # Store current selection if any
             current_selection_index = self.listbox.curselection()
-            selected_title = (
-                self.listbox.get(current_selection_index[0])
+            selected_id = (
+                self.listbox.row_id(current_selection_index[0])
                 if current_selection_index
                 else None
             )
 
-            self.listbox.delete(0, tk.END)
-            cursor = self.conn.cursor()
-            query = "SELECT id, title FROM snippets"
-            params = []
-
-            if search_query:
-                query += " WHERE title LIKE ? OR category LIKE ? OR code LIKE ?"
-                like_query = f"%{search_query}%"
-                params.extend([like_query, like_query, like_query])
-
-            query += " ORDER BY title COLLATE NOCASE"  # Case-insensitive sorting
-
-            cursor.execute(query, params)
-
-            new_selection_index = -1
-            count = 0
-            for i, row in enumerate(cursor.fetchall()):
-                self.listbox.insert(tk.END, row[1])
-                if selected_title and row[1] == selected_title:
-                    new_selection_index = i
-                count += 1
-
-            cursor.close()
-
-            # Restore selection if the item still exists
-            if new_selection_index != -1:
-                self.listbox.selection_set(new_selection_index)
-                self.listbox.see(new_selection_index)
-            elif (
-                count > 0 and not search_query
-            ):  # If no search and previous selection gone, select first
-                self.listbox.selection_set(0)
-                self.listbox.see(0)
-                self.show_snippet(None)  # Show the first item's details
+            if total is None or total > len(rows):
+                self.listbox.set_paged(len(rows) if total is None else total, rows)
+            else:
+                self.listbox.set_rows(rows)
+            self.listbox_query = search_query or ""
+            self.listbox_counting = total is None
+        except tk.TclError as e:
+            print(f"Error updating listbox: {e}")  # Log non-critical UI errors
 
-        except sqlite3.Error as e:
-            messagebox.showerror(
-                "Database Error", f"Failed to populate snippets: {e}", parent=self.root
+        def restore_selection(index):
+            try:
+                # Restore selection if the item still exists
+                if index is not None:
+                    self.listbox.selection_set(index)
+                    self.listbox.see(index)
+                elif (
+                    select_first
+                    and self.listbox.size() > 0
+                    and not search_query
+                    and not self.listbox.curselection()
+                ):  # If no search and previous selection gone, select first
+                    self.listbox.selection_set(0)
+                    self.listbox.see(0)
+                    self.show_snippet(None)  # Show the first item's details
+            except tk.TclError as e:
+                print(f"Error updating listbox: {e}")
+            if on_done:
+                on_done()
+
+        def restore():
+            if selected_id is None:
+                restore_selection(None)
+            else:
+                self.locate_snippet(selected_id, restore_selection)
+
+        if total is None:
+            list_generation = self.listbox.generation
+            cache_generation = self.result_cache.generation
+
+            def counted(count):
+                self.result_cache.put("", (count, rows), cache_generation)
+                if list_generation != self.listbox.generation:
+                    return  # Replaced by a newer list while counting
+                self.listbox_counting = False
+                self.listbox.set_total(count)
+                restore()
+
+            self.run_db(
+                "count",
+                SnippetStore.count,
+                callback=counted,
+                error_message="Failed to populate snippets",
+            )
+        else:
+            restore()
+
+    def load_categories_on_open(self):
+        """postcommand of the category combobox, loads the categories on first open."""
+        if not self.categories_requested:
+            self.populate_categories()
+
+    def refresh_categories(self):
+        """Reloads the categories after a write, once the dropdown has been used."""
+        if self.categories_requested:
+            self.populate_categories()
+
+    def set_fuzzy_index(self, index):
+        self.fuzzy_index = index
+
+    def merge_fuzzy_rows(self, search_query, rows):
+        """Puts the fuzzy title/category matches first, then the remaining search rows."""
+        if self.fuzzy_index is None or not SearchQuery(search_query).plain:
+            return rows
+        fuzzy_rows = self.fuzzy_index.search(search_query, self.FUZZY_LIMIT)
+        shown = {row[0] for row in fuzzy_rows}
+        return fuzzy_rows + [row for row in rows if row[0] not in shown]
+
+    def show_fuzzy_results(self):
+        """Shows the fuzzy title/category matches for the search text right away.
+
+        The full search still runs after the debounce and adds the snippets
+        that only match in their code.
+        """
+        search_query = self.search_var.get()
+        if not search_query.strip():
+            self.fuzzy_query = ""
+            return
+        if self.fuzzy_index is None or search_query == self.fuzzy_query:
+            return
+        if not SearchQuery(search_query).plain:
+            return  # Filters and regexes only make sense to the full search
+        self.fuzzy_query = search_query
+        # Database results still on their way are for an older query
+        self.search_generation += 1
+        self.last_search_query = None
+        try:
+            selection = self.listbox.curselection()
+            selected_id = self.listbox.row_id(selection[0]) if selection else None
+            self.listbox.set_rows(
+                self.fuzzy_index.search(search_query, self.FUZZY_LIMIT)
             )
+            index = self.listbox.find_row(selected_id)
+            if index is not None:
+                self.listbox.selection_set(index)
+                self.listbox.see(index)
         except tk.TclError as e:
-            print(f"Error updating listbox: {e}")  # Log non-critical UI errors
+            print(f"Error updating listbox: {e}")
 
     def populate_categories(self):
-        """Populates the category combobox with distinct categories from the database."""
+        """Loads the category counts from the database into the category combobox."""
+        self.categories_requested = True
+        self.run_db(
+            "categories",
+            SnippetStore.category_counts,
+            callback=self.set_category_counts,
+            error_message="Failed to load categories",
+        )
+
+    def set_category_counts(self, counts):
+        self.category_counts = Counter(counts)
+        self.apply_categories()
+
+    def count_category(self, old, new):
+        """Moves one snippet from category old to new; either may be empty.
+
+        The dropdown only changes when a category gains its first snippet or
+        loses its last one.
+        """
+        counts = self.category_counts
+        if counts is None:
+            return  # Not loaded yet; loading them will include this write
+        if old == new:
+            return
+        changed = False
+        if old:
+            counts[old] -= 1
+            if counts[old] <= 0:
+                del counts[old]
+                changed = True
+        if new:
+            counts[new] += 1
+            changed = changed or counts[new] == 1
+        if changed:
+            self.apply_categories()
+
+    def apply_categories(self):
+        categories = sorted(self.category_counts, key=nocase)
+        self.category_combo.configure(values=categories)
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(
-                "SELECT DISTINCT category FROM snippets WHERE category IS NOT NULL AND category != '' ORDER BY category COLLATE NOCASE"
-            )
-            categories = [row[0] for row in cursor.fetchall()]
-            self.category_combo["values"] = categories
-            cursor.close()
-        except sqlite3.Error as e:
-            messagebox.showerror(
-                "Database Error", f"Failed to load categories: {e}", parent=self.root
+            # The first query finishes after the dropdown has opened empty,
+            # so refill it in place if it is still showing
+            popdown = self.category_combo.tk.call(
+                "ttk::combobox::PopdownWindow", self.category_combo
             )
+            if self.category_combo.tk.call("winfo", "ismapped", popdown):
+                self.category_combo.tk.call(
+                    "ttk::combobox::ConfigureListbox", self.category_combo
+                )
+        except tk.TclError as e:
+            print(f"Error refreshing category dropdown: {e}")
 
     def copy_snippet(self):
         """Copies the content of the code editor to the clipboard."""
+        if not self.editor_ready("copy"):
+            return
         try:
             code_content = self.code_editor.get("1.0", tk.END).strip()
             if code_content:
@@ -889,9 +1365,15 @@ class CodeStorageApp:
 
     def save_snippet(self):
         """Saves the current snippet (new or update)."""
-        title = self.title_var.get().strip()
-        category = self.category_var.get().strip()
-        code = self.code_editor.get("1.0", tk.END).strip()
+        if not self.editor_ready("save"):
+            return
+        try:
+            title = self.title_var.get().strip()
+            category = self.category_var.get().strip()
+            code = self.code_editor.get("1.0", tk.END).strip()
+        except tk.TclError as e:
+            print(f"Error getting text from editor during save: {e}")
+            return
 
         if not title or not code:
             messagebox.showwarning(
@@ -901,64 +1383,163 @@ class CodeStorageApp:
             )
             return
 
-        current_id = self.current_snippet_id()
-        message = ""
-        new_id = None
+        snippet = Snippet(self.current_snippet_id(), title, category, code)
+        # One lookup in the content hash index before writing
+        self.run_db(
+            "find_duplicate",
+            SnippetStore.find_duplicate,
+            snippet.code,
+            snippet.id,
+            callback=lambda duplicate: self.confirm_save(snippet, duplicate),
+            error_message="Failed to save snippet",
+        )
 
-        try:
-            cursor = self.conn.cursor()
-            if current_id:
-                # Update existing snippet
-                cursor.execute(
-                    """UPDATE snippets SET title=?, category=?, code=? WHERE id=?""",
-                    (title, category, code, current_id),
-                )
-                message = f"Snippet '{title}' updated successfully."
-                new_id = current_id  # Keep track of the ID
+    def confirm_save(self, snippet, duplicate):
+        """Writes the snippet, asking first if another one has the same code."""
+        if duplicate is not None:
+            duplicate_id, duplicate_title = duplicate
+            answer = messagebox.askyesnocancel(
+                "Duplicate Snippet",
+                f"'{duplicate_title}' already has this code (ignoring whitespace)."
+                "\n\nSave anyway? Choose No to open the existing snippet.",
+                parent=self.root,
+            )
+            if answer is None:
+                return
+            if not answer:
+                self.open_snippet(duplicate_id)
+                return
+
+        if snippet.id is not None and snippet.id == self.editor_snippet_id:
+            # Saved as it is now, so there is nothing left to autosave
+            self.mark_editor_saved(snippet)
+        # A new snippet becomes the editor's once it has an id, unless the
+        # editor has moved on by then
+        new_in_editor = snippet.id is None and self.editor_snippet_id is None
+        request = self.snippet_request if new_in_editor else None
+
+        def written(result):
+            new_id, listed = result
+            if new_id is None:
+                self.snippet_gone(snippet)
             else:
-                # Insert new snippet
-                cursor.execute(
-                    """INSERT INTO snippets (title, category, code) VALUES (?, ?, ?)""",
-                    (title, category, code),
-                )
-                new_id = cursor.lastrowid  # Get the ID of the newly inserted row
-                message = f"Snippet '{title}' saved successfully."
+                self.after_snippet_saved(snippet._replace(id=new_id), listed, request)
+
+        self.run_db(
+            "save",
+            self.write_snippet,
+            snippet,
+            callback=written,
+            error_message="Failed to save snippet",
+        )
 
-            self.conn.commit()
-            cursor.close()
+    def write_snippet(self, store, snippet, autosave=False):
+        """Worker side: saves snippet and returns its id and its old listing.
 
-            # Refresh UI
-            self.populate_listbox(
-                self.search_var.get()
-            )  # Repopulate with current search
-            self.populate_categories()
+        The listing is the (title, category) it had before, None for a new
+        snippet, so the list and categories can be updated from it.
+        """
+        listed = None if snippet.id is None else store.listing(snippet.id)
+        return store.upsert(snippet, autosave), listed
+
+    def full_list_shown(self):
+        """Whether the listbox holds the whole title-sorted list, with its length."""
+        return (
+            self.last_search_query == ""
+            and self.listbox_query == ""
+            and not self.listbox_counting
+        )
 
-            # Reselect the saved/updated snippet in the listbox
-            if new_id:
-                cursor = self.conn.cursor()
-                cursor.execute("SELECT title FROM snippets WHERE id=?", (new_id,))
-                title_result = cursor.fetchone()
-                cursor.close()
-                if title_result:
-                    new_title = title_result[0]
-                    listbox_items = self.listbox.get(0, tk.END)
-                    if new_title in listbox_items:
-                        index = listbox_items.index(new_title)
-                        self.listbox.selection_clear(0, tk.END)
-                        self.listbox.selection_set(index)
-                        self.listbox.see(index)
-                        # Update last used snippet only if it's a new one or explicitly selected
-                        self.save_last_used_snippet(new_id)
-
-            # Show success feedback (optional, could use status bar later)
-            # messagebox.showinfo("Success", message, parent=self.root)
+    def search_shown(self):
+        """Whether the listbox holds the current search's results, all in memory."""
+        return (
+            bool(self.listbox_query)
+            and self.listbox_query == self.last_search_query
+            and not self.listbox.paged
+        )
 
-        except sqlite3.Error as e:
-            messagebox.showerror(
-                "Database Error", f"Failed to save snippet: {e}", parent=self.root
-            )
+    def relist_snippet(self, snippet, listed):
+        """Puts a saved snippet's row at its place in the list, without a query.
+
+        listed is what the snippet was listed as before, None if it is new.
+        Returns False when the list has to be queried again instead: while a
+        search is shown (the snippet may have started or stopped matching),
+        while the list is still being counted, or when the row's old or new
+        place is in a page that isn't loaded.
+        """
+        if not self.full_list_shown():
+            return False
+        if listed is not None and listed[0] == snippet.title:
+            return True  # Same title, same place
+        try:
+            if listed is None:
+                index = self.listbox.insert_row(snippet.id, snippet.title)
+            else:
+                index = self.listbox.move_row(snippet.id, snippet.title)
         except tk.TclError as e:
-            print(f"Error getting text from editor during save: {e}")
+            print(f"Error updating listbox: {e}")
+            return False
+        return index is not None
+
+    def after_snippet_saved(self, saved, listed, editor_request=None):
+        """Updates the list and categories, then reselects the saved Snippet.
+
+        editor_request is the snippet_request a new snippet was saved at; if
+        the editor still holds it, its later edits are autosaved to it.
+        """
+        new_id = saved.id
+        if (
+            editor_request is not None
+            and editor_request == self.snippet_request
+            and self.editor_snippet_id is None
+        ):
+            self.editor_snippet_id = new_id
+            self.mark_editor_saved(saved)
+            # Edits made while it was being saved; autosave skips it if none
+            self.mark_editor_dirty()
+        self.result_cache.invalidate()
+        if self.fuzzy_index is not None:
+            self.fuzzy_index.upsert(new_id, saved.title, saved.category)
+            # Rebuild the search text now rather than on the next keystroke
+            self.root.after_idle(self.fuzzy_index.prepare)
+        self.count_category(listed and listed[1], saved.category)
+
+        def reselect(index):
+            if index is None:
+                return
+            try:
+                self.listbox.selection_clear(0, tk.END)
+                self.listbox.selection_set(index)
+                self.listbox.see(index)
+                # Update last used snippet only if it's a new one or explicitly selected
+                self.save_last_used_snippet(new_id)
+            except tk.TclError as e:
+                print(f"Error reselecting saved snippet: {e}")
+
+        if self.relist_snippet(saved, listed):
+            self.locate_snippet(new_id, reselect)
+            return
+        # Repopulate with current search
+        self.populate_listbox(
+            self.search_var.get(),
+            on_done=lambda: self.locate_snippet(new_id, reselect),
+        )
+
+        # Show success feedback (optional, could use status bar later)
+        # messagebox.showinfo("Success", f"Snippet '{saved.title}' saved.", parent=self.root)
+
+    def snippet_gone(self, snippet):
+        """Handles a Save to a snippet that was deleted before it was written."""
+        if self.editor_snippet_id == snippet.id:
+            self.editor_snippet_id = None
+        self.listbox.selection_clear(0, tk.END)
+        self.populate_listbox(self.search_var.get(), select_first=False)
+        messagebox.showwarning(
+            "Not Saved",
+            f"'{snippet.title}' was deleted before it could be saved."
+            " Save again to keep the code as a new snippet.",
+            parent=self.root,
+        )
 
     def delete_snippet(self):
         """Deletes the currently selected snippet."""
@@ -977,40 +1558,361 @@ class CodeStorageApp:
             f"Are you sure you want to delete the snippet '{selected_title}'?",
             parent=self.root,
         ):
+            if snippet_id == self.editor_snippet_id:
+                self.editor_dirty = False  # Nothing to autosave into a deleted snippet
+            self.run_db(
+                "delete",
+                self.remove_snippet,
+                snippet_id,
+                callback=lambda listed: self.after_snippet_deleted(snippet_id, listed),
+                error_message="Failed to delete snippet",
+            )
+
+    def remove_snippet(self, store, snippet_id):
+        """Worker side: deletes a snippet and returns the (title, category) it had."""
+        listed = store.listing(snippet_id)
+        store.delete(snippet_id)
+        return listed
+
+    def after_snippet_deleted(self, snippet_id, listed):
+        """Clears the editor and takes the snippet out of the list after a delete."""
+        self.result_cache.invalidate()
+        if self.fuzzy_index is not None:
+            self.fuzzy_index.remove(snippet_id)
+            self.root.after_idle(self.fuzzy_index.prepare)
+        self.count_category(listed and listed[1], None)
+
+        # Clear fields and refresh list
+        self.clear_fields()  # Clear details first
+        if self.search_shown():
+            # A deleted snippet matches nothing, so the results only lose its row
+            self.listbox.remove_row(snippet_id)
+            self.search_result_ids = [
+                result_id
+                for result_id in self.search_result_ids
+                if result_id != snippet_id
+            ]
+        elif self.full_list_shown() and self.listbox.remove_row(snippet_id):
             try:
-                cursor = self.conn.cursor()
-                cursor.execute("DELETE FROM snippets WHERE id=?", (snippet_id,))
-                self.conn.commit()
-                cursor.close()
-
-                # Clear fields and refresh list
-                self.clear_fields()  # Clear details first
-                self.populate_listbox(
-                    self.search_var.get()
-                )  # Refresh list with current search
-                self.populate_categories()  # Refresh categories
-
-                # Optionally show success message
-                # messagebox.showinfo("Success", f"Snippet '{selected_title}' deleted.", parent=self.root)
-
-                # Check if the deleted snippet was the last used one and clear setting if so
-                cursor = self.conn.cursor()
-                cursor.execute(
-                    "SELECT value FROM settings WHERE key=?", ("last_used_snippet",)
+                if self.listbox.size() and not self.listbox.curselection():
+                    # Like a reload, show the first snippet in its place
+                    self.listbox.selection_set(0)
+                    self.listbox.see(0)
+                    self.show_snippet(None)
+            except tk.TclError as e:
+                print(f"Error updating listbox: {e}")
+        else:
+            self.populate_listbox(self.search_var.get())  # Refresh with current search
+
+        # Optionally show success message
+        # messagebox.showinfo("Success", "Snippet deleted.", parent=self.root)
+
+        # Check if the deleted snippet was the last used one and clear setting if so
+        if self.settings.get("last_used_snippet") == str(snippet_id):
+            self.settings.delete("last_used_snippet")
+            self.schedule_settings_flush()
+
+    def import_snippets(self, folder=False):
+        """Imports snippet files, or a folder of source files, chosen by the user."""
+        if self.job is not None:
+            return  # One import or export at a time
+        if folder:
+            path = filedialog.askdirectory(parent=self.root, title="Import Folder")
+            paths = [path] if path else []
+        else:
+            paths = list(
+                filedialog.askopenfilenames(
+                    parent=self.root,
+                    title="Import Snippets",
+                    filetypes=[
+                        ("Snippet files", "*.jsonl *.json *.code-snippets"),
+                        ("All files", "*"),
+                    ],
                 )
-                result = cursor.fetchone()
-                if result and int(result[0]) == snippet_id:
-                    cursor.execute(
-                        "DELETE FROM settings WHERE key=?", ("last_used_snippet",)
-                    )
-                    self.conn.commit()
-                cursor.close()
+            )
+        if paths:
+            self.start_job(
+                "import", Importer(paths), self.after_import, "Nothing was imported"
+            )
 
-            except sqlite3.Error as e:
-                messagebox.showerror(
-                    "Database Error", f"Failed to delete snippet: {e}", parent=self.root
+    def after_import(self, importer):
+        """Refreshes the list, categories and fuzzy index once, after the whole import."""
+        if importer.imported:
+            self.result_cache.invalidate()
+            self.run_db("fuzzy_index", FuzzyIndex.load, callback=self.set_fuzzy_index)
+            self.populate_listbox(self.search_var.get())
+            self.refresh_categories()
+            self.classify_languages()
+        messagebox.showinfo("Import", importer.summary(), parent=self.root)
+
+    def export_snippets(self):
+        """Exports every snippet to a file chosen by the user; the format follows its extension."""
+        if self.job is not None:
+            return
+        path = filedialog.asksaveasfilename(
+            parent=self.root,
+            title="Export Snippets",
+            defaultextension=".jsonl",
+            filetypes=[
+                ("JSON Lines", "*.jsonl"),
+                ("Markdown", "*.md"),
+                ("Database backup", "*.db"),
+            ],
+        )
+        if path:
+            self.start_job(
+                "export",
+                Exporter(path),
+                lambda exporter: messagebox.showinfo(
+                    "Export", exporter.summary(), parent=self.root
+                ),
+                "Export failed",
+            )
+
+    def find_duplicates(self):
+        """Looks for snippets with the same or nearly the same code and lists them."""
+        if self.job is None:
+            self.start_job(
+                "find_duplicates",
+                DuplicateFinder(),
+                self.show_duplicates,
+                "Could not look for duplicates",
+            )
+
+    def show_duplicates(self, finder):
+        if not finder.groups:
+            messagebox.showinfo("Duplicates", finder.summary(), parent=self.root)
+            return
+        theme_colors = self.themes[self.current_theme]
+        window = tk.Toplevel(self.root)
+        window.title("Duplicates")
+        window.geometry("520x420")
+        window.configure(bg=theme_colors["surface0"])
+        window.transient(self.root)
+
+        ttk.Label(
+            window, text=finder.summary() + " Double-click a snippet to open it."
+        ).pack(anchor=tk.W, padx=10, pady=(10, 5))
+        frame = ttk.Frame(window)
+        frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        listbox = tk.Listbox(
+            frame,
+            bg=theme_colors["surface0"],
+            fg=theme_colors["text"],
+            selectbackground=theme_colors["accent_blue"],
+            selectforeground=theme_colors["base"],
+            borderwidth=0,
+            highlightthickness=0,
+            activestyle="none",
+            font=("Helvetica", 10),
+        )
+        scrollbar = ttk.Scrollbar(
+            frame, orient="vertical", command=listbox.yview, style="Vertical.TScrollbar"
+        )
+        listbox.config(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        lines = []
+        row_ids = []  # Snippet id of each line, None for group headers
+        for number, group in enumerate(finder.groups, 1):
+            lowest = min(similarity for _, _, similarity in group)
+            lines.append(f"Group {number}: {len(group)} snippets, {lowest:.0%} alike")
+            row_ids.append(None)
+            for snippet_id, title, similarity in group:
+                lines.append(f"    {title}  (#{snippet_id}, {similarity:.0%})")
+                row_ids.append(snippet_id)
+        listbox.insert(tk.END, *lines)
+
+        def open_selected(event=None):
+            selection = listbox.curselection()
+            if selection and row_ids[selection[0]] is not None:
+                self.open_snippet(row_ids[selection[0]])
+
+        listbox.bind("<Double-Button-1>", open_selected)
+        listbox.bind("<Return>", open_selected)
+        window.bind("<Escape>", lambda e: window.destroy())
+        listbox.focus_set()
+
+    def show_history(self):
+        """Lists the saved versions of the selected snippet in a window."""
+        snippet_id = self.current_snippet_id()
+        if not snippet_id:
+            messagebox.showinfo(
+                "History", "Select a snippet to see its history.", parent=self.root
+            )
+            return
+        self.run_db(
+            "history",
+            SnippetStore.revisions,
+            snippet_id,
+            callback=lambda revisions: self.open_history_window(snippet_id, revisions),
+            error_message="Failed to load history",
+        )
+
+    def open_history_window(self, snippet_id, revisions):
+        """The history window: versions on the left, the picked one's code on the right.
+
+        Each version is rebuilt on the DB worker when picked. Restore puts it
+        in the editor, where saving it makes it the newest version.
+        """
+        if not revisions:
+            messagebox.showinfo(
+                "History",
+                "This snippet has no earlier versions yet. They are kept from"
+                " its first edit on.",
+                parent=self.root,
+            )
+            return
+        theme_colors = self.themes[self.current_theme]
+        window = tk.Toplevel(self.root)
+        window.title("History")
+        window.geometry("900x520")
+        window.configure(bg=theme_colors["surface0"])
+        window.transient(self.root)
+
+        frame = ttk.Frame(window)
+        frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        listbox = tk.Listbox(
+            frame,
+            width=34,
+            bg=theme_colors["surface0"],
+            fg=theme_colors["text"],
+            selectbackground=theme_colors["accent_blue"],
+            selectforeground=theme_colors["base"],
+            borderwidth=0,
+            highlightthickness=0,
+            activestyle="none",
+            exportselection=False,
+            font=("Helvetica", 10),
+        )
+        listbox.pack(side=tk.LEFT, fill=tk.Y, padx=(0, 10))
+        listbox.insert(
+            tk.END,
+            *(
+                f"#{revision}  {saved_at or 'before the first edit'}"
+                for revision, saved_at, _, _ in revisions
+            ),
+        )
+        right = ttk.Frame(frame)
+        right.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        title_label = ttk.Label(right, text="")
+        title_label.pack(anchor=tk.W, pady=(0, 5))
+        viewer = scrolledtext.ScrolledText(
+            right,
+            wrap=tk.NONE,
+            bg=theme_colors["surface0"],
+            fg=theme_colors["text"],
+            font=("Consolas", 10),
+            borderwidth=0,
+            highlightthickness=0,
+            state=tk.DISABLED,
+        )
+        viewer.pack(fill=tk.BOTH, expand=True)
+        shown = []  # The Snippet in the viewer
+
+        def show(snippet):
+            if not snippet or not window.winfo_exists():
+                return
+            shown[:] = [snippet]
+            title_label.configure(text=f"{snippet.title}  [{snippet.category}]")
+            viewer.configure(state=tk.NORMAL)
+            viewer.delete("1.0", tk.END)
+            viewer.insert("1.0", snippet.code)
+            viewer.configure(state=tk.DISABLED)
+
+        def select(event=None):
+            selection = listbox.curselection()
+            if selection:
+                self.run_db(
+                    "revision",
+                    SnippetStore.get_revision,
+                    snippet_id,
+                    revisions[selection[0]][0],
+                    callback=show,
+                    error_message="Failed to load that version",
                 )
 
+        def restore():
+            if not shown:
+                return
+            if self.current_snippet_id() != snippet_id:
+                messagebox.showinfo(
+                    "History",
+                    "Select this snippet in the list again to restore a version.",
+                    parent=window,
+                )
+                return
+            self.snippet_request += 1
+            self.fill_editor(shown[0], self.snippet_request, restored=True)
+            window.destroy()
+
+        ttk.Button(right, text="Restore to Editor", command=restore).pack(
+            anchor=tk.E, pady=(5, 0)
+        )
+        listbox.bind("<<ListboxSelect>>", select)
+        window.bind("<Escape>", lambda e: window.destroy())
+        listbox.selection_set(0)
+        select()
+        listbox.focus_set()
+
+    def start_job(self, operation, job, on_done, error_message):
+        """Runs a long job (Importer, Exporter...) on the DB worker with a progress bar.
+
+        The whole job is one request, so other database work waits for it and
+        an import commits at once. on_done(job) runs when it succeeds, and
+        error_message is shown with the error when it doesn't.
+        """
+        self.job = job
+        for button in self.job_buttons:
+            button.state(["disabled"])
+        self.job_progress.configure(mode="indeterminate", value=0)
+        self.job_progress.pack(side=tk.RIGHT, padx=5)
+        self.job_progress.start()
+        self.run_db(
+            operation,
+            self.run_job,
+            job,
+            callback=lambda error: self.finish_job(error, on_done, error_message),
+        )
+        self.root.after(self.JOB_PROGRESS_MS, self.follow_job_progress)
+
+    @staticmethod
+    def run_job(store, job):
+        """Worker side of a job; returns the error that stopped it, if any."""
+        try:
+            job.run(store)
+        except Exception as e:  # Reported by finish_job, which re-enables the buttons
+            return e
+        return None
+
+    def follow_job_progress(self):
+        if self.job is None:
+            return
+        progress = self.job.progress()  # Read while the worker updates it
+        determinate = str(self.job_progress.cget("mode")) == "determinate"
+        if progress is None:
+            if determinate:
+                self.job_progress.configure(mode="indeterminate")
+                self.job_progress.start()
+        else:
+            if not determinate:
+                self.job_progress.stop()
+                self.job_progress.configure(mode="determinate")
+            self.job_progress.configure(value=progress)
+        self.root.after(self.JOB_PROGRESS_MS, self.follow_job_progress)
+
+    def finish_job(self, error, on_done, error_message):
+        job, self.job = self.job, None
+        self.job_progress.stop()
+        self.job_progress.pack_forget()
+        for button in self.job_buttons:
+            button.state(["!disabled"])
+        if error is not None:
+            messagebox.showerror("Error", f"{error_message}: {error}", parent=self.root)
+            return
+        on_done(job)
+
     def show_snippet(self, event):
         """Displays the selected snippet's details in the editor."""
         selection = self.listbox.curselection()
@@ -1019,142 +1921,159 @@ class CodeStorageApp:
             # self.clear_fields() # Avoid clearing if selection lost focus temporarily
             return
 
-        selected_title = self.listbox.get(selection[0])
-        try:
-            cursor = self.conn.cursor()
-            # Fetch by title, assuming titles are unique enough for selection context
-            cursor.execute("SELECT * FROM snippets WHERE title=?", (selected_title,))
-            row = cursor.fetchone()
-            cursor.close()
-
-            if row:
-                snippet_id = row[0]
-                self.title_var.set(row[1])
-                self.category_var.set(row[2] if row[2] else "")
-                # Check if editor content is already the same to avoid unnecessary updates/flicker
-                current_code = self.code_editor.get("1.0", tk.END).strip()
-                new_code = row[3]
-                if current_code != new_code:
-                    self.code_editor.delete("1.0", tk.END)
-                    self.code_editor.insert("1.0", new_code)
-                # Save this as the last used snippet upon selection
-                self.save_last_used_snippet(snippet_id)
-            else:
-                # Snippet title exists in listbox but not found in DB (should not happen with proper refresh)
-                messagebox.showerror(
-                    "Error",
-                    f"Could not find details for snippet '{selected_title}'.",
-                    parent=self.root,
-                )
-                self.populate_listbox(self.search_var.get())  # Refresh listbox
+        row = self.listbox.row(selection[0])
+        if row is None:
+            return  # Row still loading, the listbox reselects once it arrives
+        snippet_id, selected_title = row
+        self.snippet_request += 1
+        request = self.snippet_request
+        self.run_db(
+            "show_snippet",
+            SnippetStore.get,
+            snippet_id,
+            callback=lambda row: self.after_snippet_loaded(
+                row, request, selected_title
+            ),
+            error_message="Failed to load snippet details",
+        )
 
-        except sqlite3.Error as e:
+    def after_snippet_loaded(self, row, request, selected_title):
+        """Shows a snippet picked in the listbox and remembers it as last used."""
+        if request != self.snippet_request:
+            return  # The selection moved on while this one was loading
+        if row:
+            self.fill_editor(row, request)
+            # Save this as the last used snippet upon selection
+            self.save_last_used_snippet(row[0])
+        else:
+            # Snippet title exists in listbox but not found in DB (should not happen with proper refresh)
             messagebox.showerror(
-                "Database Error",
-                f"Failed to load snippet details: {e}",
+                "Error",
+                f"Could not find details for snippet '{selected_title}'.",
                 parent=self.root,
             )
-        except tk.TclError as e:
-            print(f"Error updating UI for snippet '{selected_title}': {e}")
+            self.populate_listbox(self.search_var.get())  # Refresh listbox
 
     def current_snippet_id(self):
         """Gets the database ID of the currently selected snippet in the listbox."""
         selection = self.listbox.curselection()
         if not selection:
             return None
-
-        selected_title = self.listbox.get(selection[0])
-        try:
-            cursor = self.conn.cursor()
-            # Fetch ID based on the selected title
-            cursor.execute("SELECT id FROM snippets WHERE title=?", (selected_title,))
-            row = cursor.fetchone()
-            cursor.close()
-            return row[0] if row else None
-        except sqlite3.Error as e:
-            print(f"Database error getting current snippet ID: {e}")
-            return None
+        return self.listbox.row_id(selection[0])
 
     def clear_fields(self):
         """Clears the title, category, and code editor fields."""
+        self.autosave()
+        self.snippet_request += 1  # Snippets still loading mustn't fill it now
+        self.editor_snippet_id = None
+        self.cancel_editor_load()
+        self.highlighter.leave()
         self.title_var.set("")
         self.category_var.set("")
+        self.set_editor_read_only(False)
         self.code_editor.delete("1.0", tk.END)
+        self.code_editor.edit_modified(False)
+        self.highlighter.load(None, "")
         self.listbox.selection_clear(0, tk.END)  # Deselect item in listbox
         # Optionally set focus to title or search
         # self.title_entry.focus_set() # Assuming self.title_entry exists
 
-    def search_snippets(self, event):
+    def search_snippets(self, event=None):
+        """Schedules a search, coalescing bursts of keystrokes into a single query."""
+        self.show_fuzzy_results()
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        if not self.search_var.get():
+            # Clearing the box brings back the full list, usually from the cache
+            self.run_scheduled_search()
+            return
+        self.search_after_id = self.root.after(
+            self.SEARCH_DEBOUNCE_MS, self.run_scheduled_search
+        )
+
+    def run_scheduled_search(self):
         """Filters the listbox based on the search entry content."""
+        self.search_after_id = None
         search_query = self.search_var.get()
-        self.populate_listbox(search_query)
+        if search_query == self.last_search_query:
+            return  # Shift, arrow keys and the like don't change the query
+
+        self.search_generation += 1
+        candidate_ids = None
+        # Extending the previous query can only remove matches, so narrow the
+        # current results instead of searching everything again. Prefix-token FTS
+        # isn't plain substring matching, so it always re-runs the full search,
+        # and so do queries using the search syntax.
+        if (
+            self.listbox_query
+            and search_query.startswith(self.listbox_query)
+            and SearchQuery(self.listbox_query).plain
+            and SearchQuery(search_query).plain
+            and self.fts_tokenizer != "unicode61"
+            and self.search_result_ids is not None
+            and len(self.search_result_ids) <= self.SEARCH_NARROW_LIMIT
+        ):
+            candidate_ids = self.search_result_ids
+        self.populate_listbox(search_query, candidate_ids, self.search_generation)
 
     def __del__(self):
         """Ensures database connection is closed when the object is destroyed."""
-        if hasattr(self, "conn") and self.conn:
+        if hasattr(self, "db"):
+            self.db.close(timeout=1)
+        if getattr(self, "store", None):
             try:
-                self.conn.close()
+                self.store.close()
             except sqlite3.Error as e:
                 # Might be called during interpreter shutdown, print might not work reliably
                 # print(f"Error closing database in __del__: {e}")
                 pass
 
     def save_last_used_theme(self, theme_name):
-        """Saves the last used theme name and prompts user to restart."""
+        """Saves the last used theme name so the next start uses it."""
         if theme_name:
-            try:
-                cursor = self.conn.cursor()
-                cursor.execute(
-                    "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
-                    ("last_used_theme", theme_name),
-                )
-                self.conn.commit()
-                cursor.close()
-                # Inform user that a restart is required for the theme change
-                messagebox.showinfo(
-                    "Theme Changed",
-                    f"Theme set to '{theme_name}'. Please restart the application for the change to take full effect.",
-                    parent=self.root,
-                )
-            except sqlite3.Error as e:
-                print(f"Database error saving last theme: {e}")
-                messagebox.showerror(
-                    "Database Error",
-                    f"Failed to save theme setting: {e}",
-                    parent=self.root,
-                )
+            self.settings.set("last_used_theme", theme_name)
+            self.schedule_settings_flush()
 
     def load_last_used_theme(self):
         """Loads the last used theme name from settings and sets it as current for startup."""
         # This function ensures the theme selected in the previous session is loaded when the app starts.
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute(
-                "SELECT value FROM settings WHERE key=?", ("last_used_theme",)
-            )
-            result = cursor.fetchone()
-            cursor.close()
-            if result:
-                last_theme_name = result[0]
-                if last_theme_name in self.themes:
-                    self.current_theme = last_theme_name
-                    # The actual theme application happens during initialization using self.current_theme
-                    # self.theme_var is updated in __init__ after this call
-                else:
-                    print(
-                        f"Warning: Last used theme '{last_theme_name}' not found. Using default."
-                    )
-                    # Keep the default self.current_theme set in __init__
-        except sqlite3.Error as e:
-            print(f"Database error loading last theme: {e}")
-            # Keep the default theme if loading fails
+        last_theme_name = self.settings.get("last_used_theme")
+        if last_theme_name:
+            if last_theme_name in self.themes:
+                self.current_theme = last_theme_name
+                # The actual theme application happens during initialization using self.current_theme
+                # self.theme_var is updated in __init__ after this call
+            else:
+                print(
+                    f"Warning: Last used theme '{last_theme_name}' not found. Using default."
+                )
+                # Keep the default self.current_theme set in __init__
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="SnipStudio code snippet manager")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="print how long each startup phase took, and query stats on exit",
+    )
+    parser.add_argument(
+        "--exit-after-startup",
+        action="store_true",
+        help="quit as soon as startup has finished (used by bench_startup.py)",
+    )
+    args = parser.parse_args()
+
     root = tk.Tk()
     # Prevent the window from flashing before theme is applied
     root.withdraw()
-    app = CodeStorageApp(root)
+    app = CodeStorageApp(
+        root,
+        profiler=StartupProfiler(enabled=args.profile_startup),
+        exit_after_startup=args.exit_after_startup,
+    )
     # Make window visible after setup
     root.deiconify()
     root.mainloop()
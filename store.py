@@ -0,0 +1,583 @@
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from itertools import islice
+from typing import NamedTuple, Optional
+
+from compression import code_sql, pack_code
+from dedupe import content_hash
+from history import AUTOSAVE_REVISION_SECONDS, is_checkpoint, make_delta, rebuild
+from language import detect_language
+from migrations import configure_connection, fts_tokenizer, migrate
+from searchquery import SearchQuery, run_search_query
+
+
+class Snippet(NamedTuple):
+    id: Optional[int]  # None for a snippet that hasn't been stored yet
+    title: str
+    category: str
+    code: str
+    language: str = ""  # Detected when stored, "" if unknown or not yet classified
+
+
+# Statements are fixed strings, so sqlite3's per-connection statement cache
+# prepares each one once and reuses it. Lists of ids are passed as one JSON
+# parameter instead of a varying number of placeholders for the same reason.
+GET_MANY = (
+    f"SELECT s.id, s.title, COALESCE(s.category, ''), {code_sql('s.code')},"
+    " COALESCE(s.language, '')"
+    " FROM json_each(?) AS wanted JOIN snippets s ON s.id = wanted.value"
+    " ORDER BY wanted.key"
+)
+GET_SUMMARIES = (
+    "SELECT s.id, s.title, COALESCE(s.category, ''), COALESCE(s.language, '')"
+    " FROM json_each(?) AS wanted JOIN snippets s ON s.id = wanted.value"
+    " ORDER BY wanted.key"
+)
+INSERT = (
+    "INSERT INTO snippets (title, category, code, content_hash, language)"
+    " VALUES (?, ?, ?, ?, ?)"
+)
+UPDATE = (
+    "UPDATE snippets SET title=?, category=?, code=?, content_hash=?, language=?"
+    " WHERE id=?"
+)
+FIND_DUPLICATE = (
+    "SELECT id, title FROM snippets"
+    " WHERE content_hash = ? AND id IS NOT ? ORDER BY id LIMIT 1"
+)
+DELETE_MANY = "DELETE FROM snippets WHERE id IN (SELECT value FROM json_each(?))"
+LIST_PAGE_AFTER = (
+    "SELECT id, title FROM snippets"
+    " WHERE (title, id) > (? COLLATE NOCASE, ?)"
+    " ORDER BY title COLLATE NOCASE, id LIMIT ?"
+)
+LIST_PAGE_OFFSET = (
+    "SELECT id, title FROM snippets ORDER BY title COLLATE NOCASE, id LIMIT ? OFFSET ?"
+)
+POSITION = "SELECT COUNT(*) FROM snippets WHERE (title, id) < (? COLLATE NOCASE, ?)"
+CATEGORY_COUNTS = (
+    "SELECT category, COUNT(*) FROM snippets"
+    " WHERE category IS NOT NULL AND category != ''"
+    " GROUP BY category"
+)
+NARROW = (
+    "SELECT id, title FROM snippets"
+    " WHERE id IN (SELECT value FROM json_each(?))"
+    f" AND (title LIKE ? OR category LIKE ? OR {code_sql()} LIKE ?)"
+)
+FTS_SEARCH = (
+    "SELECT s.id, s.title FROM snippets_fts"
+    " JOIN snippets s ON s.id = snippets_fts.rowid"
+    " WHERE snippets_fts MATCH ?"
+    " ORDER BY bm25(snippets_fts, 10.0, 5.0, 1.0), s.title COLLATE NOCASE"
+)
+LIKE_SEARCH = (
+    "SELECT id, title FROM snippets"
+    f" WHERE title LIKE ? OR category LIKE ? OR {code_sql()} LIKE ?"
+    " ORDER BY title COLLATE NOCASE, id"
+)
+OUTLINE = (
+    "SELECT id, title, COALESCE(category, '') FROM snippets"
+    " ORDER BY COALESCE(category, '') COLLATE NOCASE, title COLLATE NOCASE, id"
+)
+STORED_VERSION = (
+    f"SELECT s.title, COALESCE(s.category, ''), {code_sql('s.code')},"
+    " (SELECT MAX(revision) FROM snippet_revisions r WHERE r.snippet_id = s.id)"
+    " FROM snippets s WHERE s.id = ?"
+)
+INSERT_REVISION = (
+    "INSERT OR REPLACE INTO snippet_revisions"
+    " (snippet_id, revision, saved_at, title, category, checkpoint, data,"
+    " autosave_since)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+AUTOSAVE_SINCE = (
+    "SELECT autosave_since FROM snippet_revisions WHERE snippet_id = ? AND revision = ?"
+)
+REVISIONS = (
+    "SELECT revision, saved_at, title, length(data) FROM snippet_revisions"
+    " WHERE snippet_id = ? ORDER BY revision DESC"
+)
+REVISION = (
+    "SELECT title, COALESCE(category, '') FROM snippet_revisions"
+    " WHERE snippet_id = ? AND revision = ?"
+)
+# The rows to rebuild a revision from: its checkpoint and the deltas after it
+REVISION_CHAIN = (
+    "SELECT checkpoint, data FROM snippet_revisions"
+    " WHERE snippet_id = ?1 AND revision <= ?2 AND revision >= ("
+    "  SELECT MAX(revision) FROM snippet_revisions"
+    "  WHERE snippet_id = ?1 AND revision <= ?2 AND checkpoint)"
+    " ORDER BY revision"
+)
+DELETE_REVISIONS = (
+    "DELETE FROM snippet_revisions WHERE snippet_id IN (SELECT value FROM json_each(?))"
+)
+UNCLASSIFIED = (
+    f"SELECT id, COALESCE(category, ''), {code_sql()} FROM snippets"
+    " WHERE language IS NULL LIMIT ?"
+)
+SET_LANGUAGE = "UPDATE snippets SET language=? WHERE id=? AND language IS NULL"
+UNHASHED = f"SELECT id, {code_sql()} FROM snippets WHERE content_hash IS NULL LIMIT ?"
+SET_CONTENT_HASH = (
+    "UPDATE snippets SET content_hash=? WHERE id=? AND content_hash IS NULL"
+)
+FTS_INSERT_TRIGGER = (
+    "SELECT sql FROM sqlite_master WHERE type='trigger' AND name='snippets_fts_ai'"
+)
+FTS_INDEX_NEW = (
+    "INSERT INTO snippets_fts (rowid, title, category, code)"
+    f" SELECT id, title, category, {code_sql()} FROM snippets WHERE id > ?"
+)
+# The search index triggers skip compressed bodies (see compression), so the
+# store indexes them itself, and unindexes them before they change
+FTS_INDEX_PACKED = (
+    "INSERT INTO snippets_fts (rowid, title, category, code)"
+    " SELECT id, title, category, unpack_code(code) FROM snippets"
+    " WHERE id IN (SELECT value FROM json_each(?)) AND typeof(code) = 'blob'"
+)
+FTS_UNINDEX_PACKED = (
+    "INSERT INTO snippets_fts (snippets_fts, rowid, title, category, code)"
+    " SELECT 'delete', id, title, category, unpack_code(code) FROM snippets"
+    " WHERE id IN (SELECT value FROM json_each(?)) AND typeof(code) = 'blob'"
+)
+# SQLite's NOCASE collation only folds ASCII letters
+_NOCASE = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def nocase(text):
+    """text as COLLATE NOCASE compares it, so Python can sort like the queries do."""
+    return text.translate(_NOCASE)
+
+
+class SnippetStore:
+    """Snippet and settings storage on one SQLite connection, with no UI.
+
+    Opening a store tunes the connection and, unless told otherwise,
+    migrates the schema. A store belongs to the thread that opened it: the
+    app keeps one for startup and gives its DB worker another.
+    """
+
+    def __init__(self, path, migrate_schema=True):
+        self.path = path
+        self.conn = sqlite3.connect(path, cached_statements=256)
+        try:
+            configure_connection(self.conn)
+            if migrate_schema:
+                migrate(self.conn)
+            # Tokenizer of the search index, None when FTS5 is unavailable
+            self.tokenizer = fts_tokenizer(self.conn)
+        except sqlite3.Error:
+            self.conn.close()
+            raise
+
+    def close(self):
+        self.conn.close()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @contextmanager
+    def snapshot(self):
+        """Runs the reads inside in one transaction, so they all see the same data."""
+        self.conn.execute("BEGIN")
+        try:
+            yield self
+        finally:
+            self.conn.rollback()  # Nothing was written
+
+    def backup(self, path, pages=-1, progress=None):
+        """Copies the whole database to path with SQLite's online backup API.
+
+        The copy is consistent even while other connections write: SQLite
+        restarts the copy if the source changes between steps of pages.
+        progress(status, remaining, total) is called after each step.
+        """
+        target = sqlite3.connect(path)
+        try:
+            self.conn.backup(target, pages=pages, progress=progress)
+        finally:
+            target.close()
+
+    # --- Reading snippets ---
+
+    def get(self, snippet_id):
+        """Returns one Snippet, or None if the id doesn't exist."""
+        snippets = self.get_many([snippet_id])
+        return snippets[0] if snippets else None
+
+    def listing(self, snippet_id):
+        """Returns the (title, category) a snippet is listed with, or None."""
+        return self.conn.execute(
+            "SELECT title, category FROM snippets WHERE id=?", (snippet_id,)
+        ).fetchone()
+
+    def get_many(self, ids):
+        """Returns the Snippets for ids, in the order given; missing ids are skipped."""
+        return [
+            Snippet._make(row)
+            for row in self.conn.execute(GET_MANY, (json.dumps(list(ids)),))
+        ]
+
+    def get_summaries(self, ids):
+        """Like get_many, but (id, title, category, language) rows without the code."""
+        return self.conn.execute(GET_SUMMARIES, (json.dumps(list(ids)),)).fetchall()
+
+    def iter_snippets(self):
+        """Yields every Snippet in id order, streaming from the database."""
+        cursor = self.conn.execute(
+            f"SELECT id, title, COALESCE(category, ''), {code_sql()},"
+            " COALESCE(language, '') FROM snippets ORDER BY id"
+        )
+        for row in cursor:
+            yield Snippet._make(row)
+
+    def title_rows(self):
+        """Yields (id, title, category) for every snippet, oldest first."""
+        return self.conn.execute(
+            "SELECT id, title, COALESCE(category, '') FROM snippets ORDER BY id"
+        )
+
+    def outline(self):
+        """Yields (id, title, category) for every snippet, grouped by category."""
+        return self.conn.execute(OUTLINE)
+
+    def iter_code(self):
+        """Yields (id, title, code, content_hash) for every snippet, in id order."""
+        return self.conn.execute(
+            f"SELECT id, title, {code_sql()}, content_hash FROM snippets ORDER BY id"
+        )
+
+    def content_hashes(self):
+        """Returns the set of content hashes of all snippets, read from their index."""
+        cursor = self.conn.execute("SELECT content_hash FROM snippets")
+        return {row[0] for row in cursor}
+
+    def find_duplicate(self, code, exclude_id=None):
+        """Returns (id, title) of a snippet with the same normalized code, or None.
+
+        One lookup in the content hash index, so it is cheap enough for
+        every save. exclude_id leaves out the snippet being saved.
+        """
+        return self.conn.execute(
+            FIND_DUPLICATE, (content_hash(code), exclude_id)
+        ).fetchone()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM snippets").fetchone()[0]
+
+    def category_counts(self):
+        """Returns {category: number of snippets} for the non-empty categories."""
+        return dict(self.conn.execute(CATEGORY_COUNTS).fetchall())
+
+    # --- The title-sorted list ---
+
+    def list_page(self, after_key, offset, limit):
+        """One page of (id, title) rows of the list sorted by title.
+
+        Continues after the (title, id) key of the previous page when it is
+        known, so paging walks the title index instead of skipping rows.
+        """
+        if after_key:
+            return self.conn.execute(LIST_PAGE_AFTER, (*after_key, limit)).fetchall()
+        return self.conn.execute(LIST_PAGE_OFFSET, (limit, offset)).fetchall()
+
+    def row_position(self, snippet_id):
+        """Index of a snippet in the title-sorted list, or None if it doesn't exist."""
+        row = self.conn.execute(
+            "SELECT title, id FROM snippets WHERE id=?", (snippet_id,)
+        ).fetchone()
+        if not row:
+            return None
+        return self.conn.execute(POSITION, row).fetchone()[0]
+
+    # --- Searching ---
+
+    def match_query(self, text):
+        """Turns free text into an FTS5 MATCH expression, or None if FTS can't serve it."""
+        if not self.tokenizer:
+            return None
+        if self.tokenizer == "trigram":
+            # Trigrams need at least 3 characters to match anything
+            if len(text) < 3:
+                return None
+            return '"' + text.replace('"', '""') + '"'
+        terms = text.split()
+        if not terms:
+            return None
+        return " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+
+    def search(self, text, candidate_ids=None, limit=None):
+        """Returns (id, title) rows matching a search, best first.
+
+        Plain text is matched as one substring of the title, category or code,
+        using the full-text index when it can. Text using the search syntax
+        (see searchquery) is compiled by run_search_query. With candidate_ids,
+        only those snippets are checked and their order is kept.
+        """
+        like = f"%{text}%"
+        if candidate_ids is not None:
+            rows = self.conn.execute(
+                NARROW, (json.dumps(candidate_ids), like, like, like)
+            ).fetchall()
+            position = {snippet_id: i for i, snippet_id in enumerate(candidate_ids)}
+            rows.sort(key=lambda row: position[row[0]])
+            return rows[:limit] if limit else rows
+
+        query = SearchQuery(text)
+        if not query.plain:
+            return run_search_query(self.conn, query, self.tokenizer, limit)
+        match_query = self.match_query(text)
+        if match_query:
+            cursor = self.conn.execute(FTS_SEARCH, (match_query,))
+        else:
+            cursor = self.conn.execute(LIKE_SEARCH, (like, like, like))
+        return cursor.fetchmany(limit) if limit else cursor.fetchall()
+
+    # --- Writing snippets ---
+
+    def upsert(self, snippet, autosave=False):
+        """Stores one Snippet and returns its id, None if it was deleted meanwhile."""
+        return self.upsert_many([snippet], autosave)[0]
+
+    def upsert_many(self, snippets, autosave=False):
+        """Inserts snippets without an id and updates the others, in one transaction.
+
+        Returns the ids in the order given, None for an update to an id that
+        doesn't exist (deleted meanwhile). autosave is for writes the user
+        didn't ask for, which share a revision while they come in quick
+        succession (see _add_revision).
+        """
+        ids = []
+        with self.conn:
+            for snippet in snippets:
+                code = pack_code(snippet.code)
+                values = (
+                    snippet.title,
+                    snippet.category,
+                    code,
+                    content_hash(snippet.code),
+                    detect_language(snippet.code, snippet.category),
+                )
+                if snippet.id:
+                    self._unindex_packed([snippet.id])
+                    self._add_revision(snippet, autosave)
+                    cursor = self.conn.execute(UPDATE, (*values, snippet.id))
+                    ids.append(snippet.id if cursor.rowcount else None)
+                else:
+                    ids.append(self.conn.execute(INSERT, values).lastrowid)
+                if isinstance(code, bytes) and ids[-1] is not None:
+                    self._index_packed(ids[-1:])
+        return ids
+
+    def _add_revision(self, snippet, autosave=False):
+        """Records an update to snippet as the next revision of its history.
+
+        History starts at a snippet's first edit, with the version being
+        replaced as revision 1, so snippets that are never edited cost
+        nothing. Revisions are deltas except every CHECKPOINT_INTERVAL-th
+        one, and any whose delta wouldn't be smaller than the whole code.
+        An autosave replaces the newest revision instead when that one was
+        also autosaved, starting less than AUTOSAVE_REVISION_SECONDS ago,
+        so only explicit saves and pauses in editing add revisions.
+        """
+        stored = self.conn.execute(STORED_VERSION, (snippet.id,)).fetchone()
+        if not stored:
+            return
+        title, category, code, last = stored
+        if (title, category, code) == (snippet.title, snippet.category, snippet.code):
+            return
+        now = time.time()
+        saved_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+        autosave_since = saved_at if autosave else None
+        revision = (last or 1) + 1
+        if last is None:
+            # Saved before history was kept, or never edited: no time known
+            self.conn.execute(
+                INSERT_REVISION,
+                (snippet.id, 1, None, title, category, True, pack_code(code), None),
+            )
+        elif autosave and last > 1:
+            since = self.conn.execute(AUTOSAVE_SINCE, (snippet.id, last)).fetchone()[0]
+            cutoff = time.strftime(
+                "%Y-%m-%d %H:%M:%S",
+                time.localtime(now - AUTOSAVE_REVISION_SECONDS),
+            )
+            if since is not None and since >= cutoff:
+                revision, autosave_since = last, since
+                chain = self.conn.execute(REVISION_CHAIN, (snippet.id, last - 1))
+                code = rebuild(chain)
+        data = pack_code(snippet.code)
+        checkpoint = is_checkpoint(revision)
+        if not checkpoint:
+            delta = make_delta(code, snippet.code)
+            if len(delta) < len(data):
+                data = delta
+            else:
+                checkpoint = True
+        self.conn.execute(
+            INSERT_REVISION,
+            (
+                snippet.id,
+                revision,
+                saved_at,
+                snippet.title,
+                snippet.category,
+                checkpoint,
+                data,
+                autosave_since,
+            ),
+        )
+
+    def insert_many(self, snippets, batch_size=5000, on_batch=None):
+        """Inserts new Snippets from an iterable in one transaction, returns how many.
+
+        Made for imports. Rows go in with executemany a batch at a time, and
+        the search index is filled once at the end with one INSERT ... SELECT
+        instead of by the insert trigger row by row, which takes about half
+        the time on large imports. on_batch(count) runs after every batch.
+        Languages are left for classify_pending().
+        """
+        conn = self.conn
+        conn.execute("BEGIN")
+        try:
+            # Dropping the trigger is part of the transaction, so other
+            # connections never see the table without it
+            trigger = conn.execute(FTS_INSERT_TRIGGER).fetchone()
+            if trigger:
+                conn.execute("DROP TRIGGER snippets_fts_ai")
+            # AUTOINCREMENT ids only grow, so everything above this is new
+            last_id = conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM snippets"
+            ).fetchone()[0]
+            count = 0
+            snippets = iter(snippets)
+            while True:
+                batch = [
+                    (
+                        snippet.title,
+                        snippet.category,
+                        pack_code(snippet.code),
+                        content_hash(snippet.code),
+                        None,
+                    )
+                    for snippet in islice(snippets, batch_size)
+                ]
+                if not batch:
+                    break
+                conn.executemany(INSERT, batch)
+                count += len(batch)
+                if on_batch:
+                    on_batch(count)
+            if trigger:
+                conn.execute(FTS_INDEX_NEW, (last_id,))
+                conn.execute(trigger[0])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return count
+
+    def classify_pending(self, limit=500):
+        """Detects the language of up to limit unclassified snippets; returns how many.
+
+        Snippets stored before languages were detected, or by insert_many,
+        have none yet. Callers repeat this until it returns less than limit,
+        a batch per call, so other database work gets in between.
+        """
+        rows = self.conn.execute(UNCLASSIFIED, (limit,)).fetchall()
+        with self.conn:
+            # A snippet saved meanwhile already has its language; it's kept
+            self.conn.executemany(
+                SET_LANGUAGE,
+                [
+                    (detect_language(code, category), snippet_id)
+                    for snippet_id, category, code in rows
+                ],
+            )
+        return len(rows)
+
+    def hash_pending(self, limit=500):
+        """Hashes up to limit snippets that have no content hash; returns how many.
+
+        SnippetStore hashes everything it writes, but rows written by other
+        programs (the sqlite3 shell, say) have none, and find_duplicate()
+        can't see them until they do. Called in batches like
+        classify_pending().
+        """
+        rows = self.conn.execute(UNHASHED, (limit,)).fetchall()
+        with self.conn:
+            self.conn.executemany(
+                SET_CONTENT_HASH,
+                [(content_hash(code), snippet_id) for snippet_id, code in rows],
+            )
+        return len(rows)
+
+    def delete(self, snippet_id):
+        return self.delete_many([snippet_id])
+
+    def delete_many(self, ids):
+        """Deletes snippets by id in one statement and returns how many existed."""
+        ids = list(ids)
+        with self.conn:
+            self._unindex_packed(ids)
+            self.conn.execute(DELETE_REVISIONS, (json.dumps(ids),))
+            return self.conn.execute(DELETE_MANY, (json.dumps(ids),)).rowcount
+
+    def _index_packed(self, ids):
+        if self.tokenizer:
+            self.conn.execute(FTS_INDEX_PACKED, (json.dumps(ids),))
+
+    def _unindex_packed(self, ids):
+        if self.tokenizer:
+            self.conn.execute(FTS_UNINDEX_PACKED, (json.dumps(ids),))
+
+    # --- History ---
+
+    def revisions(self, snippet_id):
+        """Returns (revision, saved_at, title, stored bytes) of a snippet, newest first.
+
+        saved_at is None for revision 1 when it is the version from before
+        the first edit.
+        """
+        return self.conn.execute(REVISIONS, (snippet_id,)).fetchall()
+
+    def get_revision(self, snippet_id, revision):
+        """Returns one revision of a snippet as a Snippet, or None if it doesn't exist.
+
+        Rebuilt from its checkpoint, so it reads and applies fewer than
+        CHECKPOINT_INTERVAL deltas however long the history is.
+        """
+        row = self.conn.execute(REVISION, (snippet_id, revision)).fetchone()
+        if not row:
+            return None
+        chain = self.conn.execute(REVISION_CHAIN, (snippet_id, revision))
+        return Snippet(snippet_id, *row, rebuild(chain))
+
+    # --- Settings ---
+
+    def load_settings(self):
+        """Returns every setting as a dict, read in one query."""
+        return dict(self.conn.execute("SELECT key, value FROM settings"))
+
+    def write_settings(self, changes):
+        """Writes {key: value} changes in one transaction; a None value deletes the key."""
+        if not changes:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                [(key, value) for key, value in changes.items() if value is not None],
+            )
+            self.conn.executemany(
+                "DELETE FROM settings WHERE key=?",
+                [(key,) for key, value in changes.items() if value is None],
+            )
@@ -0,0 +1,166 @@
+import hashlib
+import json
+
+# Bump when compile_theme changes shape, so old cache files get rebuilt
+CACHE_VERSION = 3
+
+# Colors the UI reads from every theme, with the keys tried in order when a
+# theme doesn't define one (dracula, for instance, has no accent_blue).
+REQUIRED_COLORS = {
+    "base": (),
+    "surface0": (),
+    "surface1": ("surface2", "surface0"),
+    "text": ("foreground",),
+    "accent_blue": ("accent_sapphire", "accent_cyan", "accent_purple", "text"),
+    # Syntax highlighting colors (highlighter.TAG_COLORS)
+    "overlay1": ("comment", "code_comment", "subtext0", "text"),
+    "accent_green": ("code_string", "text"),
+    "accent_peach": ("accent_orange", "code_number", "accent_yellow", "text"),
+    "accent_mauve": ("accent_purple", "accent_keyword", "code_keyword", "text"),
+    "accent_red": ("accent_pink", "accent_orange", "text"),
+}
+
+
+def resolve_colors(name, colors):
+    """Returns the theme colors with required keys filled in, or None if unusable."""
+    resolved = dict(colors)
+    for key, fallbacks in REQUIRED_COLORS.items():
+        if key in resolved:
+            continue
+        for fallback in fallbacks:
+            if fallback in resolved:
+                print(f"Theme '{name}' has no '{key}', using '{fallback}' instead.")
+                resolved[key] = resolved[fallback]
+                break
+        else:
+            print(f"Theme '{name}' is missing required color '{key}', skipping it.")
+            return None
+    return resolved
+
+
+def compile_theme(colors):
+    """Builds the ttk theme settings and option database entries for one theme."""
+    ttk_settings = {
+        "TFrame": {"configure": {"background": colors["base"]}},
+        "TLabel": {
+            "configure": {
+                "background": colors["base"],
+                "foreground": colors["text"],
+            }
+        },
+        "TButton": {
+            "configure": {
+                "background": colors["surface1"],
+                "foreground": colors["text"],
+                "padding": 6,
+                "relief": "flat",
+                "borderwidth": 0,  # Ensure flat look
+                "font": ["Helvetica", 9],  # Consistent font
+            },
+            "map": {
+                # Use surface0 for hover, base for active press
+                "background": [
+                    ["active", colors["base"]],
+                    ["hover", colors["surface0"]],
+                ],
+                "foreground": [["active", colors["text"]]],  # Keep text color on press
+            },
+        },
+        "TEntry": {
+            "configure": {
+                "foreground": colors["text"],
+                "fieldbackground": colors["surface0"],
+                "insertcolor": colors["text"],
+                "borderwidth": 1,  # Keep a subtle border
+                "relief": "flat",  # Use flat relief
+            },
+            "map": {
+                # Change border color on focus
+                "bordercolor": [["focus", colors["accent_blue"]]],
+                "relief": [["focus", "solid"]],  # Make border visible on focus
+            },
+        },
+        "TCombobox": {
+            "configure": {
+                "foreground": colors["text"],
+                "fieldbackground": colors["surface0"],
+                "background": colors["surface0"],  # Background of the entry part
+                "arrowcolor": colors["text"],
+                # Keep the selection the same as the field background
+                "selectbackground": colors["surface0"],
+                "selectforeground": colors["text"],
+                "borderwidth": 1,
+                "relief": "flat",
+            },
+            "map": {
+                "background": [["readonly", colors["surface0"]]],
+                # Change border color on focus like TEntry
+                "bordercolor": [["focus", colors["accent_blue"]]],
+                "relief": [["focus", "solid"]],
+            },
+        },
+        "Vertical.TScrollbar": {  # Style vertical scrollbars
+            "configure": {
+                "background": colors["surface0"],
+                "troughcolor": colors["base"],
+                "bordercolor": colors["surface0"],
+                "arrowcolor": colors["text"],
+                "relief": "flat",
+            },
+            "map": {"background": [["active", colors["surface1"]]]},
+        },
+        "Horizontal.TProgressbar": {
+            "configure": {
+                "background": colors["accent_blue"],
+                "troughcolor": colors["surface0"],
+                "bordercolor": colors["surface0"],
+                "lightcolor": colors["accent_blue"],
+                "darkcolor": colors["accent_blue"],
+            }
+        },
+    }
+    # Combobox dropdown list colors, set through the option database
+    options = [
+        ["*TCombobox*Listbox.background", colors["surface0"]],
+        ["*TCombobox*Listbox.foreground", colors["text"]],
+        ["*TCombobox*Listbox.selectBackground", colors["accent_blue"]],
+        ["*TCombobox*Listbox.selectForeground", colors["base"]],
+        ["*TCombobox*Listbox.font", "Helvetica 9"],
+        ["*TCombobox*Listbox.relief", "flat"],
+        ["*TCombobox*Listbox.borderwidth", 0],
+        ["*TCombobox*Listbox.highlightThickness", 0],
+    ]
+    return {"colors": colors, "ttk": ttk_settings, "options": options}
+
+
+def _source_hash(themes):
+    source = json.dumps([CACHE_VERSION, themes], sort_keys=True)
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+def load_theme_specs(themes, cache_path):
+    """Returns {theme name: compiled spec}, reusing cache_path when it is current.
+
+    The cache is keyed by a hash of the theme definitions, so editing
+    theme.py rebuilds it on the next start. Invalid themes are left out.
+    """
+    source_hash = _source_hash(themes)
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("source_hash") == source_hash:
+            return cached["themes"]
+    except (OSError, ValueError, KeyError):
+        pass  # Missing or unreadable cache, rebuild it below
+
+    specs = {}
+    for name, colors in themes.items():
+        resolved = resolve_colors(name, colors)
+        if resolved is not None:
+            specs[name] = compile_theme(resolved)
+    try:
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump({"source_hash": source_hash, "themes": specs}, f)
+    except OSError as e:
+        print(f"Could not write theme cache: {e}")
+    return specs
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository, next to snipstudio.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from store import SnippetStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SnippetStore(str(tmp_path / "snippets.db"))
+    yield store
+    store.close()
@@ -0,0 +1,58 @@
+from dedupe import DuplicateFinder, content_hash, normalize_code, signature
+from store import Snippet
+
+LONG = "\n".join(
+    f"total_{n} = compute(values[{n}], weight={n} * scale)" for n in range(40)
+)
+
+
+def add(store, title, code):
+    return store.upsert(Snippet(None, title, "", code))
+
+
+def titles(groups):
+    return [[title for _, title, _ in group] for group in groups]
+
+
+def test_content_hash_ignores_whitespace_only():
+    assert normalize_code("  a  b\n\n\tc \n") == "a b\nc"
+    assert content_hash("a b\nc") == content_hash("  a   b\n\n c")
+    assert content_hash("a b\nc") != content_hash("a b c")
+
+
+def test_groups_exact_and_near_duplicates(store):
+    add(store, "Original", LONG)
+    add(store, "Reindented", LONG.replace("\n", "\n    "))
+    add(store, "Tweaked", LONG.replace("values[7]", "values[8]"))
+    add(store, "Unrelated", "print('hello')\n" * 5)
+    add(store, "Also unrelated", "SELECT * FROM snippets WHERE id = 1")
+
+    finder = DuplicateFinder().run(store)
+    assert titles(finder.groups) == [["Original", "Reindented", "Tweaked"]]
+    similarities = [similarity for _, _, similarity in finder.groups[0]]
+    assert similarities[:2] == [1.0, 1.0]
+    assert 0.8 <= similarities[2] <= 1.0  # An estimate
+    assert finder.progress() == 1.0
+    assert finder.summary() == "Found 1 groups of duplicates, 3 snippets."
+
+
+def test_exact_duplicates_need_no_threshold(store):
+    add(store, "Original", LONG)
+    add(store, "Reindented", LONG.replace("\n", "\n    "))
+    add(store, "Tweaked", LONG.replace("values[7]", "values[8]"))
+    finder = DuplicateFinder(threshold=1.01).run(store)
+    assert titles(finder.groups) == [["Original", "Reindented"]]
+
+
+def test_nothing_to_find(store):
+    finder = DuplicateFinder().run(store)
+    assert finder.groups == []
+    assert finder.progress() is None
+    assert finder.summary() == "No duplicates found."
+    add(store, "Only", "x = 1")
+    assert DuplicateFinder().run(store).groups == []
+
+
+def test_signatures_are_stable_and_full():
+    assert signature(LONG) == signature(LONG)
+    assert len(signature("x")) == len(signature(LONG))
@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from exporter import Exporter, code_fence, format_for
+from importer import Importer
+from store import Snippet, SnippetStore
+
+SNIPPETS = [
+    Snippet(None, "Retry", "python", "while True:\n    retry()"),
+    Snippet(None, "Fenced", "markdown", "```py\nx = 1\n```"),
+    Snippet(None, "Loose", "", "echo *stars* and `ticks`"),
+]
+
+
+@pytest.fixture
+def filled(store):
+    for snippet in SNIPPETS:
+        store.upsert(snippet)
+    return store
+
+
+def contents(store):
+    return sorted(
+        (snippet.title, snippet.category, snippet.code)
+        for snippet in store.iter_snippets()
+    )
+
+
+def test_jsonl_round_trips_through_the_importer(filled, tmp_path):
+    path = str(tmp_path / "export.jsonl")
+    exporter = Exporter(path).run(filled)
+    assert exporter.exported == len(SNIPPETS)
+    assert exporter.progress() == 1.0
+
+    copy = SnippetStore(str(tmp_path / "copy.db"))
+    try:
+        assert Importer([path]).run(copy).imported == len(SNIPPETS)
+        assert contents(copy) == contents(filled)
+    finally:
+        copy.close()
+
+
+def test_markdown_fences_outlast_backticks_in_the_code(filled, tmp_path):
+    path = str(tmp_path / "export.md")
+    Exporter(path).run(filled)
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    assert "````markdown\n```py\nx = 1\n```\n````\n" in text
+    assert "```python\nwhile True:\n    retry()\n```\n" in text
+    assert "**Uncategorized**" in text
+    assert "## python" in text
+    assert code_fence("no ticks") == "```"
+
+
+def test_sqlite_backup_is_a_working_copy(filled, tmp_path):
+    path = str(tmp_path / "backup.db")
+    Exporter(path).run(filled)
+    copy = SnippetStore(path)
+    try:
+        assert contents(copy) == contents(filled)
+    finally:
+        copy.close()
+
+
+def test_failed_export_leaves_no_file(filled, tmp_path, monkeypatch):
+    def failing():
+        yield filled.get(1)
+        raise OSError("disk full")
+
+    monkeypatch.setattr(filled, "iter_snippets", failing)
+    path = str(tmp_path / "export.jsonl")
+    with pytest.raises(OSError):
+        Exporter(path).run(filled)
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + ".part")
+
+
+def test_format_follows_the_extension():
+    assert format_for("a.MD") == "markdown"
+    assert format_for("a.sqlite3") == "sqlite"
+    assert format_for("a.txt") == "jsonl"
+    assert format_for(None) == "jsonl"
@@ -0,0 +1,124 @@
+import json
+
+from importer import Importer, load_jsonc
+from store import Snippet
+
+
+def write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def stored(store):
+    return sorted((row[1], row[2]) for row in store.title_rows())
+
+
+def test_imports_jsonl_and_json_arrays(store, tmp_path):
+    jsonl = write(
+        tmp_path / "a.jsonl",
+        json.dumps({"title": "Retry", "category": "python", "code": "retry()"})
+        + "\n\n"
+        + json.dumps({"title": "No code"})
+        + "\n",
+    )
+    array = write(
+        tmp_path / "b.json",
+        json.dumps([{"title": "Greet", "code": "echo hi", "category": None}]),
+    )
+    importer = Importer([jsonl, array]).run(store)
+    assert (importer.imported, importer.skipped) == (2, 1)
+    assert stored(store) == [("Greet", ""), ("Retry", "python")]
+
+
+def test_imports_vscode_snippets(store, tmp_path):
+    path = write(
+        tmp_path / "python.json",
+        """{
+            // Comments and trailing commas, as VS Code allows
+            "Main guard": {
+                "prefix": "main",
+                "body": ["if __name__ == '__main__':", "    main()"],
+            },
+            "Shell": {"body": "echo $1", "scope": "shellscript,bash"},
+        }""",
+    )
+    assert Importer([path]).run(store).imported == 2
+    assert stored(store) == [("Main guard", "python"), ("Shell", "shellscript")]
+    main_guard = store.search("main()")[0][0]
+    assert store.get(main_guard).code == "if __name__ == '__main__':\n    main()"
+
+
+def test_imports_a_folder_of_source_files(store, tmp_path):
+    folder = tmp_path / "project"
+    folder.mkdir()
+    write(folder / "util.py", "def util():\n    pass\n")
+    (folder / "web").mkdir()
+    write(folder / "web" / "app.js", "console.log(1)")
+    write(folder / "web" / "package.json", '{"name": "web"}')
+    (folder / "node_modules").mkdir()
+    write(folder / "node_modules" / "dep.js", "skipped()")
+    write(folder / ".hidden.py", "skipped()")
+    (folder / "blob.bin").write_bytes(b"\0\1\2")
+
+    importer = Importer([str(folder)]).run(store)
+    assert (importer.imported, importer.skipped) == (3, 1)
+    assert stored(store) == [
+        ("util.py", "python"),
+        ("web/app.js", "javascript"),
+        ("web/package.json", "json"),
+    ]
+
+
+def test_skips_code_already_stored_or_imported(store, tmp_path):
+    store.upsert(Snippet(None, "Stored", "", "def f():\n    return 1"))
+    path = write(
+        tmp_path / "dupes.jsonl",
+        "\n".join(
+            json.dumps({"title": title, "code": code})
+            for title, code in [
+                ("Reindented", "def f():\n  return 1\n"),
+                ("New", "print(1)"),
+                ("New again", "print(1)   "),
+            ]
+        ),
+    )
+    importer = Importer([path]).run(store)
+    assert (importer.imported, importer.duplicates) == (1, 2)
+    assert "skipped 2 duplicates" in importer.summary()
+
+
+def test_search_index_and_trigger_survive_the_import(store, tmp_path):
+    path = write(
+        tmp_path / "a.jsonl",
+        "\n".join(
+            json.dumps({"title": f"Snippet {n}", "code": f"call_{n}()"})
+            for n in range(20)
+        ),
+    )
+    Importer([path]).run(store)
+    assert [row[1] for row in store.search("call_7")] == ["Snippet 7"]
+    # The insert trigger is back, so later writes are indexed as before
+    trigger = store.conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='snippets_fts_ai'"
+    ).fetchone()
+    assert trigger
+    store.upsert(Snippet(None, "Later", "", "later_call()"))
+    assert [row[1] for row in store.search("later_call")] == ["Later"]
+
+
+def test_bad_json_names_the_line(store, tmp_path):
+    path = write(tmp_path / "bad.jsonl", '{"title": "a", "code": "b"}\n{oops\n')
+    try:
+        Importer([path]).run(store)
+    except ValueError as e:
+        assert "line 2" in str(e)
+    else:
+        raise AssertionError("expected a ValueError")
+    assert store.count() == 0  # One transaction, so nothing was added
+
+
+def test_load_jsonc_leaves_strings_alone():
+    assert load_jsonc('{"url": "http://x//y", /* c */ "a": [1,],}') == {
+        "url": "http://x//y",
+        "a": [1],
+    }
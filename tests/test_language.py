@@ -0,0 +1,45 @@
+import pytest
+
+from language import canonical, detect_language
+
+# Small snippets of the kind people keep, one or more per language
+SAMPLES = [
+    ("python", "def f(x):\n    return x\n"),
+    ("python", "for item in items:\n    print(item)\n"),
+    ("python", "class Point:\n    def __init__(self, x):\n        self.x = x\n"),
+    ("python", "import os\nfor name in os.listdir():\n    print(name)\n"),
+    ("python", "try:\n    run()\nexcept ValueError:\n    pass\n"),
+    ("javascript", "function add(a, b) {\n  return a + b;\n}\n"),
+    ("javascript", "const xs = items.map((x) => x * 2);\nconsole.log(xs);\n"),
+    ("typescript", "interface User {\n  name: string;\n  age: number;\n}\n"),
+    ("bash", 'if [ -z "$1" ]; then\n  echo usage\nfi\n'),
+    ("bash", 'for f in *.txt; do\n  grep -n TODO "$f"\ndone\n'),
+    ("c", '#include <stdio.h>\nint main(void) {\n  printf("hi\\n");\n  return 0;\n}\n'),
+    ("cpp", "#include <vector>\nstd::vector<int> v;\n"),
+    ("go", "package main\n\nfunc main() {}\n"),
+    ("go", "x := compute()\nif err != nil {\n\treturn err\n}\n"),
+    ("rust", 'fn main() {\n    println!("hi");\n}\n'),
+    ("ruby", 'def greet(name)\n  puts "hi #{name}"\nend\n'),
+    ("php", "<?php echo $x;"),
+    ("sql", "SELECT id, title FROM snippets WHERE id = 1;"),
+    ("html", '<div class="box"><span>hi</span></div>'),
+    ("css", ".box {\n  margin: 0;\n  padding: 4px;\n}\n"),
+    ("java", "public class Main {\n  public static void main(String[] args) {}\n}\n"),
+    ("csharp", 'using System;\nConsole.WriteLine("hi");\n'),
+    ("yaml", "name: app\nversion: 1\nitems:\n  - a\n  - b\n"),
+    ("", "hello world"),
+    ("", "x = 1"),
+]
+
+
+@pytest.mark.parametrize("language, code", SAMPLES)
+def test_detects_small_snippets(language, code):
+    assert detect_language(code) == language
+
+
+def test_category_and_shebang_come_first():
+    assert detect_language("SELECT 1", "py") == "python"
+    assert detect_language("x", "Utilities") == ""
+    assert detect_language("#!/usr/bin/env python3\nx = 1") == "python"
+    assert detect_language("#!/bin/sh\nls") == "bash"
+    assert canonical(" JS ") == "javascript"
@@ -0,0 +1,191 @@
+import sqlite3
+
+from compression import COMPRESS_MIN_BYTES
+from dedupe import DuplicateFinder
+from history import CHECKPOINT_INTERVAL, apply_delta, make_delta, rebuild
+from migrations import SCHEMA_VERSION
+from searchquery import ALL_COLUMNS, SearchQuery
+from store import Snippet, SnippetStore
+
+# The table the app created before schema versions existed
+BASELINE_SCHEMA = """
+CREATE TABLE snippets (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       title TEXT NOT NULL,
+                       category TEXT,
+                       code TEXT NOT NULL);
+CREATE TABLE settings (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def add(store, title, category="", code="pass"):
+    return store.upsert(Snippet(None, title, category, code))
+
+
+def test_upsert_get_and_delete(store):
+    snippet_id = add(store, "Retry loop", "python", "while True:\n    retry()")
+    snippet = store.get(snippet_id)
+    assert snippet.title == "Retry loop"
+    assert snippet.language == "python"
+
+    store.upsert(snippet._replace(title="Retry with backoff"))
+    assert store.get(snippet_id).title == "Retry with backoff"
+    assert store.listing(snippet_id) == ("Retry with backoff", "python")
+
+    assert store.delete_many([snippet_id, snippet_id + 1]) == 1
+    assert store.get(snippet_id) is None
+    # An update to a snippet deleted meanwhile doesn't bring it back
+    assert store.upsert(snippet) is None
+    assert store.count() == 0
+
+
+def test_big_bodies_round_trip_compressed(store):
+    code = "print('hello world')\n" * (COMPRESS_MIN_BYTES // 10)
+    snippet_id = add(store, "Big", code=code)
+    stored = store.conn.execute(
+        "SELECT typeof(code) FROM snippets WHERE id=?", (snippet_id,)
+    ).fetchone()[0]
+    assert stored == "blob"
+    assert store.get(snippet_id).code == code
+    assert [row[0] for row in store.search("hello world")] == [snippet_id]
+
+
+def test_list_pages_follow_title_order(store):
+    ids = {title: add(store, title) for title in ("b", "A", "c", "a")}
+    first = store.list_page(None, 0, 2)
+    assert [title for _, title in first] == ["A", "a"]
+    last_id, last_title = first[-1]
+    rest = store.list_page((last_title, last_id), 2, 10)
+    assert [title for _, title in rest] == ["b", "c"]
+    assert store.row_position(ids["c"]) == 3
+
+
+def test_search_filters_and_negation(store):
+    retry = add(store, "Retry loop", None, "retry()")
+    other = add(store, "Unrelated", None, "print(1)")
+    shell = add(store, "Deploy", "bash", "echo deploy")
+
+    assert {row[0] for row in store.search("retry")} == {retry}
+    assert {row[0] for row in store.search("cat:bash")} == {shell}
+    # Snippets without a category still count as not matching
+    assert {row[0] for row in store.search("-retry")} == {other, shell}
+    assert {row[0] for row in store.search("-cat:bash")} == {retry, other}
+    assert {row[0] for row in store.search("/^echo/")} == {shell}
+
+
+def test_search_query_parsing():
+    query = SearchQuery('cat:py -"two words" /re+try/ lang:js')
+    columns, kind, value, negated = query.terms[0]
+    assert (columns, kind, value, negated) == (("category",), "text", "py", False)
+    assert query.terms[1] == (ALL_COLUMNS, "text", "two words", True)
+    assert query.terms[2][1] == "regex"
+    assert query.terms[3][1:] == ("language", "javascript", False)
+    assert not query.plain
+    assert SearchQuery("just words").plain
+
+
+def test_revisions_rebuild_every_version(store):
+    snippet_id = add(store, "Versioned", code="line 0\n")
+    versions = ["line 0\n"]
+    for number in range(1, CHECKPOINT_INTERVAL + 3):
+        code = versions[-1] + f"line {number}\n"
+        store.upsert(Snippet(snippet_id, "Versioned", "", code))
+        versions.append(code)
+
+    revisions = store.revisions(snippet_id)
+    assert len(revisions) == len(versions)
+    for revision, code in enumerate(versions, 1):
+        assert store.get_revision(snippet_id, revision).code == code
+
+
+def test_deltas_round_trip():
+    old = "a\nb\nc\nd\n"
+    for new in ("a\nb\nc\nd\n", "a\nB\nc\nd\ne\n", "", "x", old[::-1]):
+        assert apply_delta(old, make_delta(old, new)) == new
+    delta = make_delta(old, "a\nc\n")
+    assert rebuild([(1, old), (0, delta)]) == "a\nc\n"
+
+    long_line = "word " * 1000
+    for new in (long_line + "!", "!" + long_line, long_line.replace("word", "w", 3)):
+        delta = make_delta(long_line, new)
+        assert apply_delta(long_line, delta) == new
+        assert len(delta) < 100
+
+
+def history_bytes(store, snippet_id):
+    return sum(row[3] for row in store.revisions(snippet_id))
+
+
+def test_small_edits_keep_history_small(store):
+    # One long line, so a line diff would store it again with every edit
+    code = "".join(f"{number:x}" for number in range(20000))
+    snippet_id = add(store, "Minified", code=code)
+    stored = store.conn.execute(
+        "SELECT length(code) FROM snippets WHERE id = ?", (snippet_id,)
+    ).fetchone()[0]
+
+    for _ in range(30):
+        code += "x"
+        store.upsert(Snippet(snippet_id, "Minified", "", code), autosave=True)
+    # The version before the edits, plus one revision for all the autosaves
+    assert len(store.revisions(snippet_id)) == 2
+    assert history_bytes(store, snippet_id) < stored * 1.1
+    assert store.get_revision(snippet_id, 2).code == code
+
+    for _ in range(30):
+        code += "y"
+        store.upsert(Snippet(snippet_id, "Minified", "", code))
+    # Every explicit save is kept, each one as a small delta
+    assert len(store.revisions(snippet_id)) == 32
+    assert history_bytes(store, snippet_id) < stored * 3
+    assert store.get_revision(snippet_id, 32).code == code
+
+
+def test_autosaves_do_not_replace_a_saved_revision(store):
+    snippet_id = add(store, "Notes", code="one\n")
+    store.upsert(Snippet(snippet_id, "Notes", "", "one\ntwo\n"))
+    store.upsert(Snippet(snippet_id, "Notes", "", "one\ntwo\n3\n"), autosave=True)
+    store.upsert(Snippet(snippet_id, "Notes", "", "one\ntwo\nthree\n"), autosave=True)
+    codes = [store.get_revision(snippet_id, revision).code for revision in (1, 2, 3)]
+    assert codes == ["one\n", "one\ntwo\n", "one\ntwo\nthree\n"]
+    assert len(store.revisions(snippet_id)) == 3
+
+
+def test_rows_written_by_other_programs_get_hashed(store):
+    snippet_id = add(store, "Retry loop", code="while True:\n    retry()")
+    # Like a row added in the sqlite3 shell, without a content hash
+    store.conn.execute(
+        "INSERT INTO snippets (title, category, code)"
+        " VALUES ('Copy', '', 'while True:\n  retry()')"
+    )
+    store.conn.commit()
+    finder = DuplicateFinder().run(store)
+    assert [[row[1] for row in group] for group in finder.groups] == [
+        ["Retry loop", "Copy"]
+    ]
+
+    assert store.find_duplicate("while True:\n retry()", snippet_id) is None
+    assert store.hash_pending() == 1
+    assert store.hash_pending() == 0
+    assert store.find_duplicate("while True:\n retry()", snippet_id)[1] == "Copy"
+
+
+def test_migrates_a_baseline_database(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.executemany(
+        "INSERT INTO snippets (title, category, code) VALUES (?, ?, ?)",
+        [("Retry loop", None, "retry()"), ("Deploy", "bash", "echo x" * 2000)],
+    )
+    conn.commit()
+    conn.close()
+
+    store = SnippetStore(path)
+    try:
+        version = store.conn.execute("PRAGMA user_version").fetchone()[0]
+        assert version == SCHEMA_VERSION
+        assert [row[1] for row in store.search("retry")] == ["Retry loop"]
+        assert store.get(2).code == "echo x" * 2000
+        assert store.category_counts() == {"bash": 1}
+    finally:
+        store.close()
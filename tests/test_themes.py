@@ -0,0 +1,25 @@
+from highlighter import TAG_COLORS
+from stylecache import REQUIRED_COLORS, compile_theme, load_theme_specs, resolve_colors
+from theme import themes
+
+
+def test_every_theme_compiles():
+    for name, colors in themes.items():
+        resolved = resolve_colors(name, colors)
+        assert resolved is not None, name
+        compile_theme(resolved)
+
+
+def test_every_theme_has_the_highlighting_colors():
+    assert set(TAG_COLORS.values()) <= set(REQUIRED_COLORS)
+    for name, colors in themes.items():
+        resolved = resolve_colors(name, colors)
+        for tag, color in TAG_COLORS.items():
+            assert resolved[color].startswith("#"), (name, tag)
+
+
+def test_theme_cache_keeps_every_theme(tmp_path):
+    cache_path = str(tmp_path / "themes.json")
+    specs = load_theme_specs(themes, cache_path)
+    assert set(specs) == set(themes)
+    assert load_theme_specs(themes, cache_path) == specs
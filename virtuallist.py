@@ -0,0 +1,451 @@
+import tkinter as tk
+import tkinter.font as tkfont
+from bisect import bisect_left
+
+from store import nocase
+
+
+class VirtualListbox:
+    """A Listbox stand-in that only materializes the rows currently on screen.
+
+    Rows are (id, title) pairs addressed by virtual index. They either come
+    from an in-memory list (set_rows) or are fetched a page at a time through
+    page_loader as the user scrolls (set_paged). The methods mirror the parts
+    of tk.Listbox the app uses, so every index the app sees is virtual.
+
+    Ids are kept in an array parallel to the titles, with an id -> index map
+    over every loaded row, so mapping between rows and snippets is O(1).
+    When the rows are in title order, single rows can be added, moved and
+    removed in place; their places are found by bisecting the loaded rows.
+    """
+
+    PAGE_SIZE = 200
+    MAX_CACHED_PAGES = 20  # Paged mode drops the pages farthest from view beyond this
+
+    def __init__(self, master, page_loader=None, **options):
+        # page_loader(after_key, offset, limit, callback) must eventually call
+        # callback(rows). after_key is the (title, id) of the row before the
+        # page when known, so the loader can use keyset pagination.
+        self.page_loader = page_loader
+        self.listbox = tk.Listbox(master, **options)
+        self.yscrollcommand = None
+        self.select_callbacks = []
+
+        self.total = 0
+        self.top = 0  # Virtual index of the first visible row
+        self.visible_rows = 1
+        self.selected = None  # Virtual index of the selected row
+        self.select_pending = False  # Selected row is still loading
+        self.ids = None  # In-memory mode: every id, parallel to titles
+        self.titles = None
+        self.pages = {}  # Paged mode: page number -> rows
+        self.index_by_id = {}  # Snippet id -> virtual index, for loaded rows
+        self.requested = set()
+        self.generation = 0  # Bumped whenever the data set is replaced
+
+        self.listbox.bind("<<ListboxSelect>>", self._on_listbox_select)
+        self.listbox.bind("<Configure>", self._on_configure)
+        self.listbox.bind("<MouseWheel>", self._on_mousewheel)
+        self.listbox.bind("<Button-4>", lambda event: self._scroll_by(-3))
+        self.listbox.bind("<Button-5>", lambda event: self._scroll_by(3))
+        self.listbox.bind("<Up>", lambda event: self._move_selection(-1))
+        self.listbox.bind("<Down>", lambda event: self._move_selection(1))
+        self.listbox.bind(
+            "<Prior>", lambda event: self._move_selection(-self.visible_rows)
+        )
+        self.listbox.bind(
+            "<Next>", lambda event: self._move_selection(self.visible_rows)
+        )
+        self.listbox.bind("<Home>", lambda event: self._move_selection(-self.total))
+        self.listbox.bind("<End>", lambda event: self._move_selection(self.total))
+
+    def __getattr__(self, name):
+        # pack, focus_set, cget and friends go straight to the real listbox
+        return getattr(self.listbox, name)
+
+    @property
+    def paged(self):
+        return self.ids is None
+
+    # --- Data ---
+
+    def set_rows(self, rows):
+        """Shows a fully loaded list of (id, title) rows."""
+        self._reset(len(rows))
+        self.ids = [row[0] for row in rows]
+        self.titles = [row[1] for row in rows]
+        self.index_by_id = {snippet_id: i for i, snippet_id in enumerate(self.ids)}
+        self._render()
+
+    def set_paged(self, total, first_page):
+        """Shows total rows, of which only the first page is loaded so far."""
+        self._reset(total)
+        self._store_page(0, list(first_page))
+        self._render()
+
+    def set_total(self, total):
+        """Resizes a paged list once its full length is known, keeping loaded pages."""
+        self.total = total
+        self._render()
+
+    def _reset(self, total):
+        self.generation += 1
+        self.total = total
+        self.top = 0
+        self.selected = None
+        self.select_pending = False
+        self.ids = None
+        self.titles = None
+        self.pages = {}
+        self.index_by_id = {}
+        self.requested = set()
+
+    def row(self, index):
+        """Returns the (id, title) at a virtual index, or None if it isn't loaded yet."""
+        if not 0 <= index < self.total:
+            return None
+        if self.ids is not None:
+            return self.ids[index], self.titles[index]
+        page = self.pages.get(index // self.PAGE_SIZE)
+        offset = index % self.PAGE_SIZE
+        if page is None or offset >= len(page):
+            return None
+        return page[offset]
+
+    def row_id(self, index):
+        row = self.row(index)
+        return row[0] if row else None
+
+    def find_row(self, snippet_id):
+        """Returns the virtual index of a snippet id among the loaded rows, or None."""
+        return self.index_by_id.get(snippet_id)
+
+    # --- Single row edits of a title-sorted list ---
+
+    def insert_row(self, snippet_id, title):
+        """Adds a row at its place in the title order and returns its index.
+
+        Returns None, changing nothing, when that place is in a page that
+        isn't loaded; the caller then has to reload the list.
+        """
+        index = self._position(snippet_id, title)
+        if index is not None:
+            self._insert(index, (snippet_id, title))
+            self._changed()
+        return index
+
+    def move_row(self, snippet_id, title):
+        """Moves a renamed row to its new place, keeping it selected if it was.
+
+        Returns the new index, or None (changing nothing) when the row or its
+        new place isn't loaded.
+        """
+        old_index = self.index_by_id.get(snippet_id)
+        index = self._position(snippet_id, title)
+        if old_index is None or index is None:
+            return None
+        # The place was found with the old row still in the list
+        index -= old_index < index
+        was_selected = self.selected == old_index
+        self._remove(old_index)
+        self._insert(index, (snippet_id, title))
+        if was_selected:
+            self.selected = index
+        self._changed()
+        return index
+
+    def remove_row(self, snippet_id):
+        """Takes a row out of the list; False, changing nothing, if it isn't loaded."""
+        index = self.index_by_id.get(snippet_id)
+        if index is None:
+            return False
+        self._remove(index)
+        self._changed()
+        return True
+
+    def _position(self, snippet_id, title):
+        """Index a row sorts at, found by bisecting the loaded rows, or None.
+
+        Only a place inside a loaded page, or right after a loaded page whose
+        next rows are known too, is certain.
+        """
+        key = (nocase(title), snippet_id)
+        if self.ids is not None:
+            return bisect_left(self._keys(zip(self.ids, self.titles)), key)
+        for page_number in sorted(self.pages):
+            page = self.pages[page_number]
+            first = page_number * self.PAGE_SIZE
+            final = first + len(page) >= self.total
+            if not page or (key > self._keys(page[-1:])[0] and not final):
+                continue
+            keys = self._keys(page)
+            if key < keys[0] and page_number and page_number - 1 not in self.pages:
+                return None  # Belongs somewhere in the unloaded page before
+            return first + bisect_left(keys, key)
+        return None
+
+    @staticmethod
+    def _keys(rows):
+        return [(nocase(title), snippet_id) for snippet_id, title in rows]
+
+    def _insert(self, index, row):
+        if index < self.top:
+            self.top += 1  # Keep the rows on screen where they are
+        if self.selected is not None and self.selected >= index:
+            self.selected += 1
+        self.total += 1
+        if self.ids is not None:
+            self.ids.insert(index, row[0])
+            self.titles.insert(index, row[1])
+            return
+        # Each loaded page from here on passes its last row to the next one
+        page_number, offset = divmod(index, self.PAGE_SIZE)
+        carry = row
+        while carry is not None and page_number in self.pages:
+            page = self.pages[page_number]
+            page.insert(offset, carry)
+            carry = page.pop() if len(page) > self.PAGE_SIZE else None
+            page_number += 1
+            offset = 0
+        # Pages past an unloaded one have moved by a row nobody has seen
+        for number in [number for number in self.pages if number >= page_number]:
+            del self.pages[number]
+
+    def _remove(self, index):
+        if index < self.top:
+            self.top -= 1
+        if self.selected == index:
+            self.selected = None
+            self.select_pending = False
+        elif self.selected is not None and self.selected > index:
+            self.selected -= 1
+        self.total -= 1
+        if self.ids is not None:
+            del self.ids[index]
+            del self.titles[index]
+            return
+        # Each loaded page from here on takes the first row of the next one
+        page_number, offset = divmod(index, self.PAGE_SIZE)
+        del self.pages[page_number][offset]
+        while page_number + 1 in self.pages:
+            self.pages[page_number].append(self.pages[page_number + 1].pop(0))
+            page_number += 1
+        # The last page touched is a row short unless it ends the list; it
+        # and the pages after it are loaded again when they are shown
+        last = self.pages[page_number]
+        if not last or page_number * self.PAGE_SIZE + len(last) < self.total:
+            page_number -= 1
+        for number in [number for number in self.pages if number > page_number]:
+            del self.pages[number]
+
+    def _changed(self):
+        # Page loads still on their way are for the old offsets
+        self.generation += 1
+        self.requested = set()
+        if self.ids is not None:
+            self.index_by_id = {snippet_id: i for i, snippet_id in enumerate(self.ids)}
+        else:
+            self.index_by_id = {}
+            for page_number, rows in self.pages.items():
+                self._store_page(page_number, rows)
+        self._render()
+
+    def _store_page(self, page_number, rows):
+        self.pages[page_number] = rows
+        first = page_number * self.PAGE_SIZE
+        for offset, row in enumerate(rows):
+            self.index_by_id[row[0]] = first + offset
+
+    def _drop_page(self, page_number):
+        for row in self.pages.pop(page_number):
+            self.index_by_id.pop(row[0], None)
+
+    def page_loaded(self, generation, page_number, rows):
+        """Stores a page delivered by page_loader and repaints if it is on screen."""
+        self.requested.discard(page_number)
+        if generation != self.generation:
+            return  # Loaded for a data set that has since been replaced
+        self._store_page(page_number, rows)
+        self._evict_pages()
+        self._render()
+        if (
+            self.select_pending
+            and self.selected is not None
+            and self.row(self.selected) is not None
+        ):
+            self.select_pending = False
+            self._notify_select(None)
+
+    def _request_page(self, page_number):
+        if (
+            self.page_loader is None
+            or page_number in self.pages
+            or page_number in self.requested
+        ):
+            return
+        self.requested.add(page_number)
+        previous = self.pages.get(page_number - 1)
+        after_key = None
+        if previous and len(previous) == self.PAGE_SIZE:
+            last_id, last_title = previous[-1]
+            after_key = (last_title, last_id)
+        generation = self.generation
+        self.page_loader(
+            after_key,
+            page_number * self.PAGE_SIZE,
+            self.PAGE_SIZE,
+            lambda rows: self.page_loaded(generation, page_number, rows),
+        )
+
+    def _evict_pages(self):
+        if len(self.pages) <= self.MAX_CACHED_PAGES:
+            return
+        current = self.top // self.PAGE_SIZE
+        by_distance = sorted(self.pages, key=lambda page: abs(page - current))
+        for page_number in by_distance[self.MAX_CACHED_PAGES :]:
+            self._drop_page(page_number)
+
+    # --- tk.Listbox compatible API ---
+
+    def size(self):
+        return self.total
+
+    def get(self, first, last=None):
+        if last is None:
+            row = self.row(first)
+            return row[1] if row else None
+        last = self.total - 1 if last == tk.END else last
+        # Only loaded rows can be returned; avoid this on paged lists
+        return tuple(
+            row[1]
+            for row in (self.row(index) for index in range(first, last + 1))
+            if row
+        )
+
+    def curselection(self):
+        return () if self.selected is None else (self.selected,)
+
+    def selection_set(self, index):
+        if 0 <= index < self.total:
+            self.selected = index
+            self.select_pending = self.row(index) is None
+            self._render()
+
+    def selection_clear(self, first, last=None):
+        self.selected = None
+        self.select_pending = False
+        self.listbox.selection_clear(0, tk.END)
+
+    def see(self, index):
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + self.visible_rows:
+            self.top = index - self.visible_rows + 1
+        self._render()
+
+    def bind(self, sequence, func=None, add=None):
+        if sequence == "<<ListboxSelect>>":
+            # Dispatched by this class once the virtual selection is known
+            self.select_callbacks.append(func)
+            return None
+        return self.listbox.bind(sequence, func, add)
+
+    def configure(self, cnf=None, **options):
+        if "yscrollcommand" in options:
+            self.yscrollcommand = options.pop("yscrollcommand")
+            self._update_scrollbar()
+        if cnf or options:
+            return self.listbox.configure(cnf, **options)
+
+    config = configure
+
+    def yview(self, *args):
+        if not args:
+            return self._fractions()
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * self.total)
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self.top += step * self.visible_rows if args[2] == "pages" else step
+        self._render()
+
+    # --- Rendering ---
+
+    def _render(self):
+        self.top = max(0, min(self.top, self.total - self.visible_rows))
+        end = min(self.total, self.top + self.visible_rows + 1)
+        values = []
+        for index in range(self.top, end):
+            row = self.row(index)
+            values.append(row[1] if row else "…")
+
+        self.listbox.delete(0, tk.END)
+        if values:
+            self.listbox.insert(0, *values)
+        if self.selected is not None and self.top <= self.selected < end:
+            self.listbox.selection_set(self.selected - self.top)
+        self.listbox.yview_moveto(0)
+        self._update_scrollbar()
+
+        if self.paged and self.total:
+            # Load what is on screen, plus a page of slack in both directions
+            first_page = max(0, self.top - self.PAGE_SIZE) // self.PAGE_SIZE
+            last_page = min(self.total - 1, end + self.PAGE_SIZE) // self.PAGE_SIZE
+            for page_number in range(first_page, last_page + 1):
+                self._request_page(page_number)
+
+    def _fractions(self):
+        if not self.total:
+            return 0.0, 1.0
+        return (
+            self.top / self.total,
+            min(1.0, (self.top + self.visible_rows) / self.total),
+        )
+
+    def _update_scrollbar(self):
+        if self.yscrollcommand:
+            self.yscrollcommand(*self._fractions())
+
+    # --- Events ---
+
+    def _notify_select(self, event):
+        for callback in self.select_callbacks:
+            callback(event)
+
+    def _on_listbox_select(self, event):
+        selection = self.listbox.curselection()
+        if not selection:
+            return
+        self.selected = self.top + selection[0]
+        self.select_pending = self.row(self.selected) is None
+        self._notify_select(event)
+
+    def _on_configure(self, event):
+        font = tkfont.Font(font=self.listbox.cget("font"))
+        border = int(self.listbox.cget("selectborderwidth"))
+        line_height = font.metrics("linespace") + 1 + 2 * border
+        visible_rows = max(1, event.height // line_height)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self._render()
+
+    def _on_mousewheel(self, event):
+        # Windows reports multiples of 120, macOS reports small deltas
+        step = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self._scroll_by(-step * 3)
+        return "break"
+
+    def _scroll_by(self, rows):
+        self.top += rows
+        self._render()
+        return "break"
+
+    def _move_selection(self, step):
+        if not self.total:
+            return "break"
+        current = self.selected if self.selected is not None else -1
+        self.selection_set(max(0, min(self.total - 1, current + step)))
+        self.see(self.selected)
+        if not self.select_pending:
+            self._notify_select(None)
+        return "break"
@@ -0,0 +1,116 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+
+class LatencyHistogram:
+    """Counts how long each kind of database operation takes, bucketed in milliseconds."""
+
+    BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}  # operation -> one count per bucket, plus an overflow bucket
+        self.totals = {}  # operation -> total seconds spent
+
+    def record(self, operation, seconds):
+        elapsed_ms = seconds * 1000
+        bucket = len(self.BUCKETS_MS)
+        for i, limit in enumerate(self.BUCKETS_MS):
+            if elapsed_ms <= limit:
+                bucket = i
+                break
+        with self.lock:
+            counts = self.counts.setdefault(operation, [0] * (len(self.BUCKETS_MS) + 1))
+            counts[bucket] += 1
+            self.totals[operation] = self.totals.get(operation, 0.0) + seconds
+
+    def summary(self):
+        """Returns a printable table with one line per operation."""
+        labels = [f"<={limit}ms" for limit in self.BUCKETS_MS] + [
+            f">{self.BUCKETS_MS[-1]}ms"
+        ]
+        lines = []
+        with self.lock:
+            for operation in sorted(self.counts):
+                counts = self.counts[operation]
+                calls = sum(counts)
+                average_ms = self.totals[operation] / calls * 1000
+                buckets = ", ".join(
+                    f"{label}: {count}" for label, count in zip(labels, counts) if count
+                )
+                lines.append(
+                    f"{operation}: {calls} calls, avg {average_ms:.1f}ms ({buckets})"
+                )
+        return "\n".join(lines)
+
+
+class DatabaseWorker:
+    """Runs database work on a dedicated thread with its own connection.
+
+    connect() is called on that thread and what it returns (a connection or
+    a SnippetStore, anything with rollback() and close()) is passed to each
+    request. Work is submitted as func(conn, *args) and comes back as a
+    concurrent.futures.Future, so the Tk thread never waits on the database.
+    Requests run one at a time in submission order.
+    """
+
+    def __init__(self, connect):
+        self.connect = connect
+        self.requests = queue.Queue()
+        self.histogram = LatencyHistogram()
+        self.thread = threading.Thread(
+            target=self._run, name="snipstudio-db", daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, operation, func, *args):
+        """Queues func(conn, *args) and returns a Future for its result."""
+        future = Future()
+        self.requests.put((operation, func, args, future))
+        return future
+
+    def close(self, timeout=None):
+        """Finishes the queued work, then closes the worker's connection."""
+        self.requests.put(None)
+        self.thread.join(timeout)
+
+    def _run(self):
+        try:
+            conn = self.connect()
+        except sqlite3.Error as e:
+            self._fail_requests(e)
+            return
+        try:
+            while True:
+                request = self.requests.get()
+                if request is None:
+                    break
+                operation, func, args, future = request
+                if not future.set_running_or_notify_cancel():
+                    continue
+                start = time.perf_counter()
+                try:
+                    result = func(conn, *args)
+                except Exception as e:
+                    # Don't leave a half-done write transaction open for the next request
+                    conn.rollback()
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+                finally:
+                    self.histogram.record(operation, time.perf_counter() - start)
+        finally:
+            conn.close()
+
+    def _fail_requests(self, error):
+        """Fails every request with the error that kept the connection from opening."""
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+            future = request[3]
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)